@@ -1,9 +1,23 @@
+import contextvars
+import json
 import logging
-from dataclasses import asdict
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import asdict, replace
+from typing import Any, Callable, Tuple
+
+from prometheus_client import Counter
 
 from models import *
 from utils import get_storage_class, get_api_class, get_router_class
-from llm.openai_client import OpenAIClient
+from llm.openai_client import OpenAIClient, IntentResult, ResolvedOrder, LLM_ADMISSION
+from routers.naive_router import NaiveRouter
+from observability import span
+from observability.llm_usage import intent_scope, set_intent, summarize, usage_ledger
+from observability.startup import STARTUP
+from offload import OFFLOAD
+from resilience import CircuitOpenError, DeadlineExceeded, allows_optional, current_deadline, current_ticket
 from config import ORDER_ID_RE
 from config.settings import settings
 
@@ -18,24 +32,136 @@ cfg = settings
 # )
 
 
-# modules
+# modules: only the configured backends are imported, when first built (see ensure_components)
 knowledge_base_cls = get_storage_class(cfg.modules.kb_name)
 order_api_cls = get_api_class(cfg.modules.order_api_name)
 router_cls = get_router_class(cfg.modules.router_name)
 
-kb = knowledge_base_cls()
-order_api = order_api_cls()
-router = router_cls()
+kb: Any = None
+order_api: Any = None
+router: Any = None
+_fallback_router = None
+_components_lock = threading.Lock()
+
+
+def ensure_components() -> None:
+    """Build the KB (indexing the FAQ), the order API client and the router, once.
+
+    Normally done by warmup at startup; the first request builds them otherwise.
+    """
+    global kb, order_api, router
+    if router is not None:
+        return
+    with _components_lock:
+        if router is not None:
+            return
+        with STARTUP.phase("kb"):
+            kb = knowledge_base_cls()
+        with STARTUP.phase("order_api"):
+            order_api = order_api_cls()
+        with STARTUP.phase("router"):
+            built = router_cls()
+        router = built  # set last: a router means every component is ready
+
+
+def warm_up() -> None:
+    """Build every component a turn may need, including the fallback router of LLM routers."""
+    ensure_components()
+    if getattr(router, "uses_llm", False) and cfg.admission.enabled:
+        with STARTUP.phase("fallback_router"):
+            fallback_router()
+    with STARTUP.phase("prefetch_pool"):
+        _prefetch_pool.submit(lambda: None).result()
+    if OFFLOAD.enabled:
+        with STARTUP.phase("offload_pool"):
+            OFFLOAD.start([r for r in (router, _fallback_router) if getattr(r, "cpu_bound", False)])
+
+PREFETCH_COUNTER = Counter(
+    "order_prefetch_total",
+    "Speculative order API lookups started while routing, by whether a sub-agent used them",
+    ["call", "outcome"],
+)
+_prefetch_pool = ThreadPoolExecutor(max_workers=cfg.orchestrator.prefetch_max_workers,
+                                    thread_name_prefix="order-prefetch")
+
+
+def _new_prefetch_pool() -> None:
+    # A forked child (gunicorn --preload) inherits the pool without its threads: start afresh.
+    global _prefetch_pool
+    _prefetch_pool = ThreadPoolExecutor(max_workers=cfg.orchestrator.prefetch_max_workers,
+                                        thread_name_prefix="order-prefetch")
+
+
+os.register_at_fork(after_in_child=_new_prefetch_pool)
+
+
+class OrderPrefetch:
+    """Order API lookups started speculatively, before the router has picked an intent."""
+
+    def __init__(self):
+        self._futures: Dict[Tuple[str, str], Future] = {}
+
+    def start(self, call: str, order_id: str) -> None:
+        # Run in a copy of the caller's context so the lookup's span joins the request trace.
+        self._futures[(call, order_id)] = _prefetch_pool.submit(
+            contextvars.copy_context().run, getattr(order_api, call), order_id)
+
+    def has(self, call: str, order_id: str) -> bool:
+        return (call, order_id) in self._futures
+
+    def take(self, call: str, order_id: str) -> Optional[Future]:
+        return self._futures.pop((call, order_id), None)
+
+    def settle(self) -> None:
+        """Count (and cancel, if not yet running) every lookup no sub-agent asked for."""
+        for (call, _), fut in self._futures.items():
+            fut.cancel()
+            PREFETCH_COUNTER.labels(call=call, outcome="unused").inc()
+        self._futures.clear()
+
+
+# Stream event emitted for a tool call, by tool name (see Agent.emit); anything else is a "tool_call".
+STAGE_EVENTS = {"Router": "router", "LLMContextResolver": "resolver"}
+
+EventListener = Callable[[str, Dict[str, Any]], None]
 
 
 class Agent:
     name = "Agent"
 
-    def __init__(self, state: Dict[str, Any]):
+    def __init__(self, state: Dict[str, Any], prefetch: Optional[OrderPrefetch] = None,
+                 on_event: Optional[EventListener] = None):
         self.state = state
+        self.prefetch = prefetch
+        self.on_event = on_event
         self.tool_calls: List[Dict[str, Any]] = []
         self.logger = logging.getLogger("app")
 
+    def emit(self, event: str, data: Dict[str, Any]) -> None:
+        """Report a finished stage to the streaming listener, if any.
+
+        Events are "router", "resolver", "tool_call" and, for generated answers, "token".
+        """
+        if self.on_event is not None:
+            self.on_event(event, data)
+
+    def add_tool_call(self, tool_call: Dict[str, Any]) -> None:
+        self.tool_calls.append(tool_call)
+        self.emit(STAGE_EVENTS.get(tool_call["tool"], "tool_call"), tool_call)
+
+    def order_call(self, call: str, order_id: str) -> Any:
+        """Call `order_api.<call>(order_id)`, reusing a speculative lookup when one was started."""
+        fut = self.prefetch.take(call, order_id) if self.prefetch else None
+        if fut is not None:
+            try:
+                result = fut.result()
+                PREFETCH_COUNTER.labels(call=call, outcome="used").inc()
+                return result
+            except Exception as e:
+                PREFETCH_COUNTER.labels(call=call, outcome="failed").inc()
+                self.logger.warning(f"Prefetched {call}({order_id}) failed: {e}; calling again")
+        return getattr(order_api, call)(order_id)
+
     def log(self, request_id: str, session_id: str, msg: str, level: str = "info"):
         extra = {'extra_data': {"request_id": request_id, "session_id": session_id, "agent": self.name}}
         getattr(self.logger, level)(msg, extra=extra)
@@ -65,21 +191,24 @@ class OrderCancellationAgent(Agent):
             self.log(request_id, session_id, f"Malformed order_id {order_id}")
             return self.respond("That doesn’t look right. Your order ID should look like ORD-1234.", "OrchestratorAgent")
 
-        order = order_api.get_order(order_id)
-        if not order:
+        # Perform cancellation via tool
+        if self.prefetch and self.prefetch.has("get_order", order_id):
+            # The lookup already ran alongside routing, so only the cancel call is left.
+            order = self.order_call("get_order", order_id)
+            result = replace(order_api.cancel_order(order_id), order=order) if order else None
+        else:
+            result = order_api.cancel_order_fast(order_id)
+        if result is not None:
+            self.add_tool_call({
+                "tool": "OrderCancellationAPI",
+                "input": {"orderId": order_id},
+                "result": {'status': asdict(result)}})
+
+        if result is None or result.status == "not_found":
             msg = f"couldn’t find {order_id}. Please double‑check the ID."
             self.log(request_id, session_id, msg)
             return self.respond(f"I couldn’t find {order_id}. Please double‑check the ID.", "OrchestratorAgent")
-
-        # Perform cancellation via tool
-        result = order_api.cancel_order(order_id)
-        print('result', result)
-        self.tool_calls.append({
-            "tool": "OrderCancellationAPI",
-            "input": {"orderId": order_id},
-            "result": {'status': asdict(result)}})
-
-        if result.status == "cancelled":
+        elif result.status == "cancelled":
             self.state["last_order_id"] = order_id
             self.log(request_id, session_id, f'{order_id} is cancelled.')
             return self.respond(f"✅ Done! {order_id} is cancelled and your payment will be refunded.", "OrchestratorAgent")
@@ -95,6 +224,10 @@ class OrderTrackingAgent(Agent):
     name = "OrderTrackingAgent"
 
     def handle(self, request_id: str, session_id: str, message: str) -> ChatResponse:
+        order_ids = list(dict.fromkeys(ORDER_ID_RE.findall(message)))[:cfg.orchestrator.max_orders_per_turn]
+        if len(order_ids) > 1:
+            return self.handle_many(request_id, session_id, order_ids)
+
         order_id = resolve_order_id_from_context(self.state, message)
         if not order_id:
             self.log(request_id, session_id, f'Missing order ID.')
@@ -102,8 +235,8 @@ class OrderTrackingAgent(Agent):
         if not ORDER_ID_RE.match(order_id):
             self.log(request_id, session_id, f'Invalid order ID.')
             return self.respond("Please provide a valid order ID like ORD-1234.", "OrchestratorAgent")
-        result = order_api.track_order(order_id)
-        self.tool_calls.append({"tool": "OrderTrackingAPI", "input": {"orderId": order_id}, "result": result})
+        result = self.order_call("track_order", order_id)
+        self.add_tool_call({"tool": "OrderTrackingAPI", "input": {"orderId": order_id}, "result": result})
         if result.get("status") == "not_found":
             self.log(request_id, session_id, f"I couldn't find {order_id}.")
             return self.respond(f"I couldn't find {order_id}.", "OrchestratorAgent")
@@ -114,13 +247,42 @@ class OrderTrackingAgent(Agent):
             "OrchestratorAgent",
         )
 
+    def handle_many(self, request_id: str, session_id: str, order_ids: List[str]) -> ChatResponse:
+        """Track every order ID in the message with one batched lookup and answer them together."""
+        results: Dict[str, Dict[str, Any]] = {}
+        pending = []
+        for order_id in order_ids:
+            if self.prefetch and self.prefetch.has("track_order", order_id):
+                results[order_id] = self.order_call("track_order", order_id)
+            else:
+                pending.append(order_id)
+        if pending:
+            results.update(order_api.track_orders(pending))
+
+        lines = []
+        for order_id in order_ids:
+            result = results[order_id]
+            self.add_tool_call({"tool": "OrderTrackingAPI", "input": {"orderId": order_id}, "result": result})
+            status = result.get("status")
+            if status == "not_found":
+                lines.append(f"- {order_id}: I couldn't find this order.")
+            elif status == "error":
+                lines.append(f"- {order_id}: I couldn't get its status right now.")
+            else:
+                self.state["last_order_id"] = order_id
+                lines.append(f"- {order_id}: {status}. Estimated delivery: {result.get('eta')}.")
+        self.log(request_id, session_id, f"Tracked {len(order_ids)} orders: {', '.join(order_ids)}")
+        return self.respond("Here’s the latest on your orders:\n" + "\n".join(lines), "OrchestratorAgent")
+
 
 class ProductQAAgent(Agent):
     name = "ProductQAAgent"
 
     def handle(self, request_id: str, session_id: str, message: str) -> ChatResponse:
         self.state["last_product_context"] = message
-        ans = kb.search(message) or (
+        with span("kb.search", component=cfg.modules.kb_name):
+            ans = kb.search(message)
+        ans = ans or (
             "Here’s what I found: our standard return window is 30 days. "
             "Shipping is usually 3–5 business days. For specifics, ask about a product feature."
         )
@@ -131,26 +293,74 @@ class ProductQAAgent(Agent):
 class OrchestratorAgent(Agent):
     name = "OrchestratorAgent"
 
-    def __init__(self, state: Dict[str, Any]):
-        super().__init__(state)
+    def __init__(self, state: Dict[str, Any], on_event: Optional[EventListener] = None):
+        super().__init__(state, on_event=on_event)
+        ensure_components()
         self.router = router
 
-    def handle(self, request_id: str, session_id: str, message: str) -> ChatResponse:
-        intent_result = self.router.route(message)
+    @staticmethod
+    def start_prefetch(message: str) -> Optional[OrderPrefetch]:
+        """Kick off the order lookup the sub-agent will most likely need, while routing runs."""
+        if not cfg.orchestrator.enable_order_prefetch:
+            return None
+        m = ORDER_ID_RE.search(message)
+        if not m:
+            return None
+        # A keyword guess is enough here: a wrong guess only costs one unused lookup.
+        likely_intent, _, _ = NaiveRouter.route(message)
+        prefetch = OrderPrefetch()
+        prefetch.start("get_order" if likely_intent == "order_cancellation" else "track_order", m.group(0))
+        return prefetch
+
+    def handle(self, request_id: str, session_id: str, message: str,
+               intent_result: Optional[IntentResult] = None) -> ChatResponse:
+        """`intent_result` may be passed in when routing was already done, e.g. batched."""
+        prefetch = self.start_prefetch(message) if intent_result is None else None
+        try:
+            with usage_ledger() as ledger, intent_scope():
+                resp = self._handle(request_id, session_id, message, prefetch, intent_result)
+        finally:
+            if prefetch:
+                prefetch.settle()
+        if ledger:
+            # Per-request LLM token, retry and cost accounting
+            resp.tool_calls.append(ToolCall(tool="LLMUsage", input={}, result=summarize(ledger)))
+        ticket = current_ticket()
+        if ticket is not None and ticket.degraded:
+            # LLM stages that admission control replaced with their non-LLM fallback
+            resp.tool_calls.append(ToolCall(tool="Admission", input={}, result={"degraded": ticket.degraded}))
+        deadline = current_deadline()
+        if deadline is not None and deadline.notes:
+            # Stages skipped or cut short to stay within the request deadline
+            resp.tool_calls.append(ToolCall(tool="Deadline", input={"budget_seconds": deadline.budget}, result={
+                "remaining_ms": round(deadline.remaining() * 1000, 1),
+                "skipped": [n for n in deadline.notes if n["action"] == "skipped"],
+                "truncated": [n for n in deadline.notes if n["action"] == "truncated"],
+            }))
+        return resp
+
+    def _handle(self, request_id: str, session_id: str, message: str,
+                prefetch: Optional[OrderPrefetch], intent_result: Optional[IntentResult]) -> ChatResponse:
+        router_mode = cfg.modules.router_name
+        if intent_result is None:
+            router_mode, intent_result = route_message(self.router, message)
         intent = intent_result.intent
+        set_intent(intent)
         self.log(msg=f'Routing message: {message} -> {intent}', request_id=request_id, session_id=session_id)
 
         # Emit a Router tool call for observability
-        self.tool_calls.append({
+        self.add_tool_call({
             "tool": "Router",
-            "input": {"mode": cfg.modules.router_name, "text": message},
+            "input": {"mode": router_mode, "text": message},
             "result": intent_result.model_dump()
         })
 
         # Call the resolver before routing to prefill last_order_id if message has no explicit ID and contains pronouns
         low = message.lower()
+        res = None
         if not ORDER_ID_RE.search(message) and any(p in low for p in ["it", "that", "this", "same"]):
-            res = OpenAIClient().resolve_order_id(message, self.state)
+            res = resolve_with_admission(message, self.state)
+        if res is not None:
             if res.id and res.confidence >= cfg.openai.resolver_min_conf:
                 self.log(msg=f'Resolving order_id from message with resolver"{message}" -> {res.id}',
                          request_id=request_id,
@@ -158,7 +368,7 @@ class OrchestratorAgent(Agent):
                 self.state["last_order_id"] = res.id
 
             # Emit a resolver call for observability
-            self.tool_calls.append({
+            self.add_tool_call({
                 "tool": "LLMContextResolver",
                 "input": {"text": message, 'history': self.state['history'][-5:]},
                 "result": {
@@ -169,29 +379,107 @@ class OrchestratorAgent(Agent):
             })
 
         if intent == "order_cancellation":
-            agent = OrderCancellationAgent(self.state)
+            agent = OrderCancellationAgent(self.state, prefetch, self.on_event)
         elif intent == "order_tracking":
-            agent = OrderTrackingAgent(self.state)
+            agent = OrderTrackingAgent(self.state, prefetch, self.on_event)
         else:
-            agent = ProductQAAgent(self.state)
-
-        resp = agent.handle(request_id, session_id, message)
+            agent = ProductQAAgent(self.state, prefetch, self.on_event)
+
+        try:
+            resp = agent.handle(request_id, session_id, message)
+        except CircuitOpenError as e:
+            # The order service is known to be down: answer right away instead of waiting on retries.
+            self.log(request_id, session_id, f"{agent.name} short-circuited: {e}", level="warning")
+            resp = agent.respond(
+                "Sorry—our order service is temporarily unavailable. Please try again in a few minutes.",
+                "OrchestratorAgent",
+            )
+        except DeadlineExceeded as e:
+            self.log(request_id, session_id, f"{agent.name} ran out of time: {e}", level="warning")
+            resp = agent.respond(
+                "Sorry—this is taking longer than expected. Please try again in a moment.",
+                "OrchestratorAgent",
+            )
         # Append our router call to the child response
         resp.tool_calls = [ToolCall(**tc) for tc in (self.tool_calls + [c.model_dump() for c in resp.tool_calls])]
         resp.handover = f"OrchestratorAgent({cfg.modules.router_name}) → {agent.name}"
         return resp
 
 
+def to_intent_result(result: Any) -> IntentResult:
+    """Normalize router output: LLMRouter returns an IntentResult, the local routers an (intent, conf, meta) tuple."""
+    if isinstance(result, IntentResult):
+        return result
+    intent, confidence, meta = result
+    return IntentResult(intent=intent, confidence=confidence, rationale=json.dumps(meta))
+
+
+def fallback_router():
+    """Router used instead of an LLM router while admission control is degrading LLM stages."""
+    global _fallback_router
+    if _fallback_router is None:
+        try:
+            _fallback_router = get_router_class(cfg.admission.fallback_router)()
+        except RuntimeError:  # e.g. scikit-learn missing for IntentMLRouter
+            _fallback_router = NaiveRouter()
+    return _fallback_router
+
+
+def route_message(r: Any, message: str) -> Tuple[str, IntentResult]:
+    """Route with `r`, or with the fallback router when `r` needs the LLM and admission control
+    degrades it, the OpenAI breaker is open or the request deadline is nearly spent; returns the name of
+    the router used and its result."""
+    if getattr(r, "uses_llm", False):
+        if OpenAIClient.available() and allows_optional("router", cfg.deadline.optional_stage_min_seconds):
+            with LLM_ADMISSION.stage("router") as admitted:
+                if admitted:
+                    with span("router.route", component=cfg.modules.router_name):
+                        result = to_intent_result(r.route(message))
+                    if OpenAIClient.upstream_failed(result.err):
+                        admitted.failed()
+                    return cfg.modules.router_name, result
+        r = fallback_router()
+        name = type(r).__name__
+    else:
+        name = cfg.modules.router_name
+    with span("router.route", component=name):
+        return name, to_intent_result(OFFLOAD.route(r, message))
+
+
+def route_batch(messages: List[str]) -> List[Optional[IntentResult]]:
+    """Route many messages at once through the router's batch path. Without one (e.g. LLMRouter)
+    every result is None: each turn then routes itself, under its own deadline and admission stage."""
+    ensure_components()
+    if getattr(router, "route_batch", None) is None:
+        return [None] * len(messages)
+    with span("router.route_batch", component=cfg.modules.router_name, batch_size=len(messages)):
+        results = OFFLOAD.route_batch(router, messages)
+    return [to_intent_result(r) for r in results]
+
+
+def resolve_with_admission(message: str, state: dict) -> Optional[ResolvedOrder]:
+    """LLM resolver result, or None while the OpenAI breaker is open, admission control degrades it
+    or too little of the request deadline is left."""
+    if not OpenAIClient.available() or not allows_optional("resolver", cfg.deadline.optional_stage_min_seconds):
+        return None
+    with LLM_ADMISSION.stage("resolver") as admitted:
+        if not admitted:
+            return None
+        res = OpenAIClient().resolve_order_id(message, state)
+        if OpenAIClient.upstream_failed(res.err):
+            admitted.failed()
+        return res
+
+
 def resolve_order_id_from_context(state: dict, message: str) -> Optional[str]:
     # 1) Check explicit ORD-XXXX
     m = ORDER_ID_RE.search(message)
     if m:
         return m.group(0)
 
-    # 2) Try LLM resolver
-    resolver = OpenAIClient()
-    res = resolver.resolve_order_id(message, state)
-    if res.id and res.confidence >= cfg.openai.resolver_min_conf:
+    # 2) Try LLM resolver (skipped while the OpenAI breaker is open or LLM stages are degraded)
+    res = resolve_with_admission(message, state)
+    if res is not None and res.id and res.confidence >= cfg.openai.resolver_min_conf:
         return res.id
 
     # 3) Fallback to last_order_id
@@ -1,45 +1,85 @@
 import os
 import httpx
 import logging
-import time
+import weakref
 from typing import Any, Dict, Optional
 
 from base import OrderAPIBase
 from models import OrderCancellationResult
 from config.settings import settings
+from observability import traced
+from observability.traffic_recorder import taped
+from resilience import coalesce, CircuitBreaker, CircuitOpenError, DeadlineExceeded
+from resilience import cap_timeout, configured_hedger, deadline_expired, hedged, sleep_before_retry
 
 cfg = settings.order_api
 
+ORDER_API_BREAKER = CircuitBreaker(
+    "order_api",
+    failure_threshold=cfg.breaker_failure_threshold,
+    reset_timeout=cfg.breaker_reset_seconds,
+)
+
+
+_instances: "weakref.WeakSet[OrderAPIBeeceptorClient]" = weakref.WeakSet()
+
+
+def _new_http_clients() -> None:
+    # A forked worker (gunicorn --preload) must not share the parent's pooled connections.
+    for c in list(_instances):
+        c.client = httpx.Client(timeout=cfg.timeout_seconds)
+
+
+os.register_at_fork(after_in_child=_new_http_clients)
+
 
 class OrderAPIBeeceptorClient(OrderAPIBase):
     def __init__(self):
         self.base = cfg.base_url
         self.client = httpx.Client(timeout=cfg.timeout_seconds)
         self.logger = logging.getLogger("app")
+        _instances.add(self)
 
     def _url(self, path: str) -> str:
         return f"{self.base}{path}"
 
     def _retry_request(self, method: str, path: str) -> Optional[httpx.Response]:
+        """Returns None once retries are exhausted (or cut short by the request deadline); raises
+        CircuitOpenError while the breaker is open and DeadlineExceeded once the deadline has passed."""
         delay = cfg.backoff_factor
         last_exc = None
         for attempt in range(1, cfg.max_retries + 1):
+            timeout = cap_timeout(cfg.timeout_seconds, "order_api")  # before allow(): may raise
+            if not ORDER_API_BREAKER.allow():
+                raise CircuitOpenError(ORDER_API_BREAKER.name)
             try:
                 if method == 'GET':
-                    resp = self.client.get(self._url(path))
+                    resp = self.client.get(self._url(path), timeout=timeout)
                 else:
-                    resp = self.client.post(self._url(path))
+                    resp = self.client.post(self._url(path), timeout=timeout)
                 if resp.status_code >= 500:
                     raise httpx.HTTPStatusError(f"Server error {resp.status_code}", request=resp.request, response=resp)
+                ORDER_API_BREAKER.record_success()
                 return resp
             except Exception as e:
+                if isinstance(e, httpx.TimeoutException) and deadline_expired():
+                    ORDER_API_BREAKER.release()
+                    raise DeadlineExceeded("order_api") from e
+                ORDER_API_BREAKER.record_failure()
                 last_exc = e
+                if ORDER_API_BREAKER.is_open():
+                    raise CircuitOpenError(ORDER_API_BREAKER.name) from e
+                if attempt == cfg.max_retries or not sleep_before_retry(delay, "order_api"):
+                    break
                 self.logger.warning(f"Attempt {attempt} failed for {path}: {e}. Retrying in {delay:.1f}s...")
-                time.sleep(delay)
                 delay *= 2
         self.logger.error(f"All {cfg.max_retries} attempts failed for {path}: {last_exc}")
         return None
 
+    @traced("order_api.get_order")
+    @taped("order_api.get_order")
+    @coalesce("order_api.get_order")
+    @hedged(configured_hedger("order_api.get_order", settings.hedging))
     def get_order(self, order_id: str) -> Optional[Dict[str, Any]]:
         resp = self._retry_request('GET', f"/orders/{order_id}")
         if not resp:
@@ -48,6 +88,8 @@ class OrderAPIBeeceptorClient(OrderAPIBase):
             return None
         return resp.json()
 
+    @traced("order_api.cancel_order")
+    @taped("order_api.cancel_order", OrderCancellationResult)
     def cancel_order(self, order_id: str) -> OrderCancellationResult:
         resp = self._retry_request('POST', f"/orders/{order_id}/cancel")
         if not resp:
@@ -57,6 +99,25 @@ class OrderAPIBeeceptorClient(OrderAPIBase):
             return OrderCancellationResult.failure(status=result['status'], reason=result['reason'])
         return OrderCancellationResult.success(status=result['status'], refunded=result['refunded'])
 
+    @traced("order_api.cancel_order_fast")
+    @taped("order_api.cancel_order_fast", OrderCancellationResult)
+    def cancel_order_fast(self, order_id: str) -> OrderCancellationResult:
+        # The cancel endpoint answers 404 for unknown orders, so no get_order round trip is needed.
+        resp = self._retry_request('POST', f"/orders/{order_id}/cancel")
+        if not resp:
+            return OrderCancellationResult.failure(status="error", reason="empty response")
+        if resp.status_code == 404:
+            return OrderCancellationResult.failure(status="not_found", reason="order not found")
+        result = resp.json()
+        order = result.get('order')
+        if result['status'] != 'cancelled':
+            return OrderCancellationResult.failure(status=result['status'], reason=result.get('reason'), order=order)
+        return OrderCancellationResult.success(status=result['status'], refunded=result.get('refunded'), order=order)
+
+    @traced("order_api.track_order")
+    @taped("order_api.track_order")
+    @coalesce("order_api.track_order")
+    @hedged(configured_hedger("order_api.track_order", settings.hedging))
     def track_order(self, order_id: str) -> Dict[str, Any]:
         resp = self._retry_request('GET', f"/orders/{order_id}/track")
 
@@ -1,9 +1,13 @@
+from dataclasses import replace
 from datetime import datetime, timedelta, timezone
 from typing import Any, Dict, List, Optional, Tuple, Callable
 
 from models import OrderCancellationResult
 from base import OrderAPIBase
 from config import UTC
+from observability import traced
+from observability.traffic_recorder import taped
+from resilience import coalesce
 
 
 class OrderAPILocalClient(OrderAPIBase):
@@ -26,9 +30,14 @@ class OrderAPILocalClient(OrderAPIBase):
             },
         }
 
+    @traced("order_api.get_order")
+    @taped("order_api.get_order")
+    @coalesce("order_api.get_order")
     def get_order(self, order_id: str) -> Optional[Dict[str, Any]]:
         return self._orders.get(order_id)
 
+    @traced("order_api.cancel_order")
+    @taped("order_api.cancel_order", OrderCancellationResult)
     def cancel_order(self, order_id: str) -> OrderCancellationResult:
         order = self._orders.get(order_id)
         if not order:
@@ -38,8 +47,25 @@ class OrderAPILocalClient(OrderAPIBase):
             return OrderCancellationResult.failure(status="ineligible", reason=">24h window")
         return OrderCancellationResult.success(status="cancelled", refunded=True)
 
+    @traced("order_api.cancel_order_fast")
+    @taped("order_api.cancel_order_fast", OrderCancellationResult)
+    def cancel_order_fast(self, order_id: str) -> OrderCancellationResult:
+        return replace(self.cancel_order(order_id), order=self._orders.get(order_id))
+
+    @traced("order_api.track_order")
+    @taped("order_api.track_order")
+    @coalesce("order_api.track_order")
     def track_order(self, order_id: str) -> Dict[str, Any]:
         order = self._orders.get(order_id)
         if not order:
             return {"status": "not_found"}
-        return {"status": order["status"], "eta": order["eta"]}
\ No newline at end of file
+        return {"status": order["status"], "eta": order["eta"]}
+
+    @traced("order_api.track_orders")
+    @taped("order_api.track_orders")
+    def track_orders(self, order_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        results = {}
+        for order_id in order_ids:
+            order = self._orders.get(order_id)
+            results[order_id] = {"status": order["status"], "eta": order["eta"]} if order else {"status": "not_found"}
+        return results
\ No newline at end of file
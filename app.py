@@ -1,41 +1,42 @@
+import gc
 import os
 import json
+import queue
+import threading
 import time
 import logging
 import uuid
-from typing import Optional
-from fastapi import FastAPI, Request
-from fastapi.responses import JSONResponse, PlainTextResponse
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import FastAPI, HTTPException, Request, WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from prometheus_client import Counter, Histogram, generate_latest, CONTENT_TYPE_LATEST, REGISTRY
+from prometheus_client import CollectorRegistry, multiprocess
 
 # from config import LOG_LEVEL
-from models import ChatResponse, ChatRequest
-from agent import OrchestratorAgent
+from models import ChatResponse, ChatRequest, ChatBatchRequest, ChatBatchItem, ChatBatchResponse
+import agent
+from agent import OrchestratorAgent, EventListener, route_batch
+from llm.openai_client import IntentResult, LLM_ADMISSION
 from memory.redis_impl import SessionStore
 from config.settings import settings
+from observability import span, start_trace
+from observability.log_pipeline import setup_logging
+from observability.memory import MemoryCollector, TracemallocSnapshots
+from observability.profiling import RequestProfiler, profile_process
+from observability.startup import STARTUP
+from offload import OFFLOAD
+from observability.traffic_recorder import TrafficRecorder
+from resilience import deadline_scope
+from resilience.singleflight import GROUPS as SINGLEFLIGHT_GROUPS
 
 cfg = settings
 
 
-class JsonFormatter(logging.Formatter):
-    def format(self, record: logging.LogRecord) -> str:
-        base = {
-            "level": record.levelname,
-            "ts": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(record.created)),
-            "msg": record.getMessage(),
-            "logger": record.name,
-        }
-        if hasattr(record, "extra_data"):
-            base.update(getattr(record, "extra_data"))
-        return json.dumps(base)
-
-
-handler = logging.StreamHandler()
-handler.setFormatter(JsonFormatter())
 logger = logging.getLogger("app")
-logger.setLevel(cfg.logging.level)
-logger.addHandler(handler)
-logger.propagate = False
+log_listener = setup_logging(logger, cfg.logging)
 
 REQUEST_COUNTER: Optional[Counter] = None
 REQUEST_LATENCY: Optional[Histogram] = None
@@ -59,7 +60,67 @@ def init_metrics(registry=REGISTRY) -> None:
 
 
 store = SessionStore()
-app = FastAPI(title="E‑commerce Multi‑Agent CS System", version="1.0.0")
+recorder = TrafficRecorder(cfg.recorder)
+
+memory_collector = MemoryCollector(cfg.memory.gauge_min_interval_seconds, cfg.memory.sample_items,
+                                   cfg.memory.max_objects)
+memory_collector.track("kb", lambda: agent.kb)
+memory_collector.track("router", lambda: agent.router)
+memory_collector.track("order_api", lambda: agent.order_api)
+if not store._use_redis:
+    memory_collector.track("sessions", lambda: store._mem)
+    memory_collector.track_entries("sessions", lambda: len(store._mem))
+memory_collector.track_entries("kb_rows", lambda: len(getattr(agent.kb, "qa", ())))
+memory_collector.track_entries("singleflight_in_flight", lambda: sum(g.in_flight() for g in list(SINGLEFLIGHT_GROUPS)))
+if log_listener is not None:
+    memory_collector.track_entries("log_queue", log_listener.queue.qsize)
+if cfg.memory.gauges:
+    REGISTRY.register(memory_collector)
+tracemalloc_snapshots = TracemallocSnapshots(cfg.memory.tracemalloc_frames, cfg.memory.max_snapshots)
+
+if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+    # Several workers: /metrics aggregates every worker's metric files (plus this worker's memory gauges).
+    METRICS_REGISTRY = CollectorRegistry()
+    multiprocess.MultiProcessCollector(METRICS_REGISTRY)
+    if cfg.memory.gauges:
+        METRICS_REGISTRY.register(memory_collector)
+else:
+    METRICS_REGISTRY = REGISTRY
+
+
+def warm_up() -> None:
+    """Build the KB, order API client, router and pools, recording each phase; never raises."""
+    try:
+        agent.warm_up()
+        STARTUP.mark_ready()
+        logger.info("Warmup complete", extra={"extra_data": {"request_id": "-", "session_id": "-", "agent": "system",
+                                                             "phases": STARTUP.status()["phases"]}})
+    except Exception as e:
+        STARTUP.mark_failed(e)
+        logger.exception("Warmup failed", extra={"extra_data": {"request_id": "-", "session_id": "-", "agent": "system"}})
+
+
+@asynccontextmanager
+async def lifespan(_: FastAPI):
+    if cfg.startup.warmup:
+        if cfg.startup.background:
+            threading.Thread(target=warm_up, name="warmup", daemon=True).start()
+        else:
+            await run_in_threadpool(warm_up)
+    else:
+        STARTUP.mark_ready()  # components are built by the first request
+    yield
+    OFFLOAD.shutdown()
+
+
+if cfg.preload.enabled:
+    # Imported once in the master before workers fork: build everything now, then keep the
+    # collector from touching (and so unsharing) these long-lived objects' pages.
+    warm_up()
+    OFFLOAD.shutdown()  # each worker starts its own process pool
+    gc.freeze()
+
+app = FastAPI(title="E‑commerce Multi‑Agent CS System", version="1.0.0", lifespan=lifespan)
 
 
 @app.get("/healthz", response_class=PlainTextResponse)
@@ -67,28 +128,198 @@ def healthz():
     return "ok"
 
 
+@app.get("/readyz")
+def readyz():
+    """200 once warmup has built every component, else 503; both with the phase timings."""
+    status = STARTUP.status()
+    return JSONResponse(status_code=200 if status["ready"] else 503, content=status)
+
+
 @app.get("/metrics")
 def metrics():
-    return PlainTextResponse(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+    return PlainTextResponse(generate_latest(METRICS_REGISTRY), media_type=CONTENT_TYPE_LATEST)
 
 
-@app.post("/chat", response_model=ChatResponse)
-def chat(req: ChatRequest, request: Request):
-    init_metrics()
+_process_profile_lock = threading.Lock()
+
+
+@app.get("/admin/profile", response_class=PlainTextResponse)
+def admin_profile(request: Request, seconds: float = 10.0, interval_ms: Optional[float] = None):
+    """Sample every thread for `seconds` and return collapsed stacks (flamegraph.pl / speedscope input)."""
+    if not cfg.profiling.enabled:
+        raise HTTPException(status_code=404, detail="Not Found")
+    require_admin(request)
+    if not 0 < seconds <= cfg.profiling.max_seconds:
+        raise HTTPException(status_code=422, detail=f"seconds must be in (0, {cfg.profiling.max_seconds}]")
+    if not _process_profile_lock.acquire(blocking=False):
+        raise HTTPException(status_code=409, detail="a process profile is already running")
+    try:
+        sampler = profile_process(seconds, (interval_ms or cfg.profiling.process_sample_interval_ms) / 1000)
+    finally:
+        _process_profile_lock.release()
+    return PlainTextResponse(sampler.collapsed(), headers={"X-Profile-Samples": str(sampler.samples)})
+
+
+def require_memory_admin(request: Request) -> None:
+    if not cfg.memory.admin_enabled:
+        raise HTTPException(status_code=404, detail="Not Found")
+    require_admin(request)
+
+
+@app.get("/admin/memory")
+def admin_memory(request: Request):
+    """Current component sizes and cache entry counts (freshly computed), plus tracemalloc status."""
+    require_memory_admin(request)
+    return {**memory_collector.snapshot(force=True), "tracemalloc": tracemalloc_snapshots.status()}
+
+
+@app.post("/admin/memory/snapshots")
+def admin_memory_snapshot(request: Request):
+    """Take a tracemalloc snapshot (starting tracemalloc on the first call); returns its id."""
+    require_memory_admin(request)
+    return tracemalloc_snapshots.take()
+
+
+@app.get("/admin/memory/diff")
+def admin_memory_diff(request: Request, since: int, until: Optional[int] = None, limit: int = 25,
+                      group_by: str = "lineno"):
+    """Top allocation sites by growth between two snapshots (`until` omitted: a new snapshot now)."""
+    require_memory_admin(request)
+    if group_by not in ("lineno", "filename", "traceback"):
+        raise HTTPException(status_code=422, detail="group_by must be lineno, filename or traceback")
+    try:
+        return {"since": since, "until": until,
+                "top": tracemalloc_snapshots.diff(since, until, limit=limit, group_by=group_by)}
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e.args[0]))
+
+
+@app.delete("/admin/memory/snapshots")
+def admin_memory_reset(request: Request):
+    """Drop all snapshots and stop tracemalloc, returning to zero overhead."""
+    require_memory_admin(request)
+    tracemalloc_snapshots.reset()
+    return tracemalloc_snapshots.status()
+
+
+def debug_requested(request: Request) -> bool:
+    return request.headers.get(cfg.tracing.debug_header, "").lower() in ("1", "true", "yes")
+
+
+def admin_caller(request: Request) -> bool:
+    if request.client is not None and request.client.host in cfg.admin.allowed_callers:
+        return True
+    return bool(cfg.admin.token) and request.headers.get("X-Admin-Token") == cfg.admin.token
+
+
+def require_admin(request: Request) -> None:
+    if not admin_caller(request):
+        raise HTTPException(status_code=403, detail="not an allowed admin caller")
+
+
+def profile_requested(request: Request) -> Optional[str]:
+    """Profiler mode asked for by an allow-listed caller, else None. Free when profiling is disabled."""
+    if not cfg.profiling.enabled:
+        return None
+    value = request.headers.get(cfg.profiling.header, "").lower()
+    if not value or value in ("0", "false", "no") or not admin_caller(request):
+        return None
+    return "sample" if value == "sample" else "cprofile"
+
+
+def requested_deadline(request: Request) -> Optional[float]:
+    """Time budget (seconds) asked for in the deadline header, capped at `deadline.max_seconds`;
+    None (the configured default) when absent or not a positive number."""
+    try:
+        seconds = float(request.headers.get(cfg.deadline.header, ""))
+    except ValueError:
+        return None
+    if not seconds > 0:
+        return None
+    return min(seconds, cfg.deadline.max_seconds)
+
+
+def handle_chat(req: ChatRequest, on_event: Optional[EventListener] = None,
+                intent_result: Optional[IntentResult] = None, debug: bool = False,
+                deadline: Optional[float] = None) -> Tuple[int, Dict[str, Any]]:
+    """Run one chat turn end to end; returns (status_code, response payload)."""
     request_id = str(uuid.uuid4())
-    session_id = req.session_id
+    with start_trace(uuid.UUID(request_id).hex) as trace:
+        # Load session
+        state = store.get(req.session_id)
+        status, content = run_turn(state, req.session_id, req.message, on_event=on_event,
+                                   intent_result=intent_result, persist=lambda: store.set(req.session_id, state),
+                                   request_id=request_id, deadline=deadline)
+    spans = trace.export()
+    if cfg.tracing.log_spans:
+        logger.info("Trace", extra={"extra_data": {"request_id": request_id, "session_id": req.session_id,
+                                                   "agent": content.get("agent"), "spans": spans}})
+    if debug:
+        content["spans"] = spans
+    return status, content
+
+
+def run_turn(state: Dict[str, Any], session_id: str, message: str,
+             on_event: Optional[EventListener] = None,
+             intent_result: Optional[IntentResult] = None,
+             persist: Optional[Callable[[], None]] = None,
+             request_id: Optional[str] = None,
+             deadline: Optional[float] = None) -> Tuple[int, Dict[str, Any]]:
+    """Run one turn against an already loaded session `state`; `persist` saves it (None: caller saves).
+
+    Every stage of the turn shares a `deadline` second budget (None: `deadline.default_seconds`).
+    """
+    request_id = request_id or str(uuid.uuid4())
+    start = time.perf_counter()
+    with LLM_ADMISSION.request() as ticket:
+        if ticket is None:
+            return shed_turn(request_id, session_id)
+        with deadline_scope(deadline or cfg.deadline.default_seconds), \
+                span("chat.turn", session_id=session_id), recorder.recording(session_id) as tape:
+            status, content = _run_turn(state, session_id, message, on_event, intent_result, persist, request_id)
+    if tape is not None:
+        recorder.write(tape, request_id, session_id, message, status, content,
+                       (time.perf_counter() - start) * 1000)
+    return status, content
+
+
+def shed_turn(request_id: str, session_id: str) -> Tuple[int, Dict[str, Any]]:
+    """503 payload for a turn refused at the admission hard limit; the session is left untouched."""
+    init_metrics()
+    REQUEST_COUNTER.labels(agent="shed", status="503").inc()
+    logger.warning("Shed chat turn at admission hard limit",
+                   extra={"extra_data": {"request_id": request_id, "session_id": session_id, "agent": "OrchestratorAgent"}})
+    return 503, {
+        "response": "Sorry—we're very busy right now. Please try again in a moment.",
+        "agent": "OrchestratorAgent",
+        "tool_calls": [],
+        "handover": "OrchestratorAgent",
+        "error": "overloaded",
+        "retry_after": LLM_ADMISSION.retry_after,
+    }
+
+
+def chat_response(status: int, content: Dict[str, Any]) -> JSONResponse:
+    headers = {"Retry-After": str(content["retry_after"])} if status == 503 else None
+    return JSONResponse(status_code=status, content=content, headers=headers)
+
+
+def _run_turn(state: Dict[str, Any], session_id: str, message: str,
+              on_event: Optional[EventListener], intent_result: Optional[IntentResult],
+              persist: Optional[Callable[[], None]], request_id: str) -> Tuple[int, Dict[str, Any]]:
+    init_metrics()
     start = time.time()
 
-    # Load and update session
-    state = store.get(session_id)
-    state.setdefault("history", []).append({"role": "user", "content": req.message})
+    # Update session
+    state.setdefault("history", []).append({"role": "user", "content": message})
 
     # Orchestrate
-    orch = OrchestratorAgent(state)
+    orch = OrchestratorAgent(state, on_event=on_event)
     try:
-        resp: ChatResponse = orch.handle(request_id, session_id, req.message)
+        resp: ChatResponse = orch.handle(request_id, session_id, message, intent_result=intent_result)
         # Persist state
-        store.set(session_id, state)
+        if persist is not None:
+            persist()
         # Record in history
         state["history"].append({"role": "assistant", "content": resp.response, "agent": resp.agent})
         # Metrics
@@ -100,15 +331,164 @@ def chat(req: ChatRequest, request: Request):
             "Handled chat",
             extra={"extra_data": {"request_id": request_id, "session_id": session_id, "agent": resp.agent}}
         )
-        return JSONResponse(status_code=200, content=json.loads(resp.model_dump_json()))
+        return 200, json.loads(resp.model_dump_json())
     except Exception as e:
         REQUEST_COUNTER.labels(agent="error", status="500").inc()
         logger.exception("Chat error",
                          extra={"extra_data": {"request_id": request_id, "session_id": session_id, "agent": "OrchestratorAgent"}})
-        return JSONResponse(status_code=500, content={
+        return 500, {
             "response": "Sorry—something went wrong.",
             "agent": "OrchestratorAgent",
             "tool_calls": [],
             "handover": "OrchestratorAgent",
             "error": str(e),
-        })
+        }
+
+
+@app.post("/chat", response_model=ChatResponse)
+def chat(req: ChatRequest, request: Request):
+    mode = profile_requested(request)
+    deadline = requested_deadline(request)
+    if mode is None:
+        status, content = handle_chat(req, debug=debug_requested(request), deadline=deadline)
+        return chat_response(status, content)
+    profiler = RequestProfiler(mode, interval=cfg.profiling.request_sample_interval_ms / 1000,
+                               top=cfg.profiling.top, store_dir=cfg.profiling.store_dir).start()
+    try:
+        status, content = handle_chat(req, debug=debug_requested(request), deadline=deadline)
+    finally:
+        profiler.stop()
+    content["profile"] = profiler.result()
+    return chat_response(status, content)
+
+
+def _sse(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+
+@app.post("/chat/stream")
+def chat_stream(req: ChatRequest, request: Request):
+    """Server-sent events for one chat turn.
+
+    Emits `router`, `resolver` and `tool_call` events as each stage finishes (and `token`
+    events for generated answers), then a `final` event carrying the same payload as
+    POST /chat, or an `error` event with the /chat error payload.
+    """
+    events: "queue.Queue[Optional[Tuple[str, Dict[str, Any]]]]" = queue.Queue()
+    debug = debug_requested(request)
+    deadline = requested_deadline(request)
+
+    def run() -> None:
+        try:
+            status, content = handle_chat(req, on_event=lambda event, data: events.put((event, data)), debug=debug,
+                                          deadline=deadline)
+            events.put(("final" if status == 200 else "error", content))
+        finally:
+            events.put(None)
+
+    threading.Thread(target=run, name="chat-stream", daemon=True).start()
+
+    def stream() -> Iterator[str]:
+        while True:
+            item = events.get()
+            if item is None:
+                return
+            yield _sse(*item)
+
+    return StreamingResponse(stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+
+@app.post("/chat/batch", response_model=ChatBatchResponse)
+def chat_batch(batch: ChatBatchRequest, request: Request):
+    """Process many turns in one call: sessions run concurrently, turns within a session in order.
+
+    Results come back in request order, each with its own status, error and latency.
+    """
+    items = batch.items
+    deadline = requested_deadline(request)  # per item
+    if len(items) > cfg.batch.max_items:
+        raise HTTPException(status_code=413, detail=f"batch too large: {len(items)} > {cfg.batch.max_items} items")
+
+    # Routing depends only on the message, so it can go through the router's batch path up front
+    # (None per item when the router has none: each turn routes itself).
+    try:
+        intents: List[Optional[IntentResult]] = route_batch([it.message for it in items])
+    except Exception:
+        logger.exception("Batch routing failed; routing per item",
+                         extra={"extra_data": {"request_id": "-", "session_id": "-", "agent": "OrchestratorAgent"}})
+        intents = [None] * len(items)
+
+    sessions: Dict[str, List[int]] = {}
+    for i, it in enumerate(items):
+        sessions.setdefault(it.session_id, []).append(i)
+
+    results: List[Optional[ChatBatchItem]] = [None] * len(items)
+
+    def run_session(indexes: List[int]) -> None:
+        for i in indexes:
+            it = items[i]
+            start = time.perf_counter()
+            try:
+                status, content = handle_chat(it, intent_result=intents[i], deadline=deadline)
+            except Exception as e:
+                status, content = 500, {"error": str(e)}
+            latency_ms = round((time.perf_counter() - start) * 1000, 3)
+            results[i] = ChatBatchItem(
+                index=i,
+                session_id=it.session_id,
+                status=status,
+                latency_ms=latency_ms,
+                response=ChatResponse.model_validate(content) if status == 200 else None,
+                error=content.get("error") if status != 200 else None,
+            )
+
+    if sessions:
+        with ThreadPoolExecutor(max_workers=min(cfg.batch.max_concurrency, len(sessions)),
+                                thread_name_prefix="chat-batch") as pool:
+            list(pool.map(run_session, sessions.values()))
+    return ChatBatchResponse(results=results)
+
+
+
+@app.websocket("/chat/ws")
+async def chat_ws(websocket: WebSocket, session_id: str):
+    """One long-lived connection per client: the session is loaded once and kept in memory.
+
+    Each inbound frame is `{"message": "..."}`; each reply frame is the /chat payload (or its
+    error payload). The session is saved every `websocket.persist_every_turns` turns, at most
+    `websocket.persist_interval_seconds` apart, and when the connection closes.
+    """
+    await websocket.accept()
+    state = await run_in_threadpool(store.get, session_id)
+    unsaved_turns = 0
+    last_saved = time.monotonic()
+
+    async def persist() -> None:
+        nonlocal unsaved_turns, last_saved
+        await run_in_threadpool(store.set, session_id, state)
+        unsaved_turns = 0
+        last_saved = time.monotonic()
+
+    try:
+        while True:
+            try:
+                frame = json.loads(await websocket.receive_text())
+            except json.JSONDecodeError:
+                frame = None
+            message = frame.get("message") if isinstance(frame, dict) else None
+            if not isinstance(message, str) or not message:
+                await websocket.send_json({"error": "expected a frame like {\"message\": \"...\"}"})
+                continue
+            _, content = await run_in_threadpool(run_turn, state, session_id, message)
+            await websocket.send_json(content)
+            unsaved_turns += 1
+            if (unsaved_turns >= cfg.websocket.persist_every_turns
+                    or time.monotonic() - last_saved >= cfg.websocket.persist_interval_seconds):
+                await persist()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        if unsaved_turns:
+            await persist()
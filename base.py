@@ -1,12 +1,16 @@
-from dataclasses import dataclass
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, replace
 from abc import ABC, abstractmethod
 from typing import (
     Any,
     Dict,
+    List,
     Optional
 )
 
 from models import OrderCancellationResult
+from observability import traced
 
 class BaseKVStorage(ABC):
 
@@ -29,6 +33,32 @@ class OrderAPIBase(ABC):
     def track_order(self, order_id: str) -> Dict[str, Any]:
         """Track order"""
 
+    @traced("order_api.cancel_order_fast")
+    def cancel_order_fast(self, order_id: str) -> OrderCancellationResult:
+        """Look up and cancel in one round trip: status is not_found, ineligible or cancelled, with order details.
+
+        Backends whose cancel endpoint reports unknown orders itself should override this;
+        the default falls back to get_order followed by cancel_order.
+        """
+        order = self.get_order(order_id)
+        if not order:
+            return OrderCancellationResult.failure(status="not_found", reason="order not found")
+        return replace(self.cancel_order(order_id), order=order)
+
+    @traced("order_api.track_orders")
+    def track_orders(self, order_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Track several orders at once, keyed by order ID in input order.
+
+        The default fans out one concurrent track_order call per ID; backends with a
+        batch lookup should override it.
+        """
+        if len(order_ids) <= 1:
+            return {order_id: self.track_order(order_id) for order_id in order_ids}
+        with ThreadPoolExecutor(max_workers=len(order_ids)) as pool:
+            futures = [pool.submit(contextvars.copy_context().run, self.track_order, order_id) for order_id in order_ids]
+            results = [f.result() for f in futures]
+        return dict(zip(order_ids, results))
+
 
 # class RouterBase(ABC):
 #
@@ -0,0 +1,62 @@
+"""Synthetic, seeded data for the micro-benchmarks."""
+import random
+import zlib
+from datetime import datetime, timezone
+from typing import Any, Dict, List
+
+VOCAB = (
+    "return policy shipping times bluetooth headphones battery warranty refund exchange size guide "
+    "charger cable wireless earbuds noise cancelling speaker delivery express international customs "
+    "gift card discount coupon account password invoice receipt tracking damaged missing replacement"
+).split()
+
+MESSAGES = [
+    "Please cancel ORD-4567",
+    "Where is my package ORD-1234?",
+    "What's the ETA for my order?",
+    "Tell me about your return policy",
+    "How long does the bluetooth headphones battery last?",
+    "Cancel it please",
+    "Do you ship internationally?",
+    "I want a refund for this order",
+]
+
+
+def faq_rows(n: int, seed: int = 0) -> List[Dict[str, str]]:
+    rng = random.Random(seed)
+    return [
+        {"q": " ".join(rng.sample(VOCAB, rng.randint(2, 4))) + f" {i}",
+         "a": " ".join(rng.choices(VOCAB, k=rng.randint(8, 20))) + "."}
+        for i in range(n)
+    ]
+
+
+def queries(rows: List[Dict[str, str]], n: int = 64, seed: int = 1) -> List[str]:
+    """Half the queries contain a stored question (hits), half are random text (misses)."""
+    rng = random.Random(seed)
+    out = []
+    for i in range(n):
+        if i % 2 == 0 and rows:
+            out.append(f"tell me about {rng.choice(rows)['q']} please")
+        else:
+            out.append(" ".join(rng.choices(VOCAB, k=6)))
+    return out
+
+
+def session_state(turns: int, seed: int = 0) -> Dict[str, Any]:
+    rng = random.Random(seed)
+    history = []
+    for i in range(turns):
+        history.append({"role": "user", "content": rng.choice(MESSAGES)})
+        history.append({"role": "assistant", "agent": "OrderTrackingAgent",
+                        "content": " ".join(rng.choices(VOCAB, k=rng.randint(10, 40)))})
+    now = datetime.now(timezone.utc).isoformat()
+    return {"session_id": f"bench-{turns}", "history": history, "last_order_id": "ORD-1234",
+            "last_product_context": rng.choice(MESSAGES), "created_at": now, "updated_at": now}
+
+
+def embedding(text: str, dim: int = 64) -> List[float]:
+    rng = random.Random(zlib.crc32(text.encode()))  # not hash(): salted per process
+    vec = [rng.gauss(0.0, 1.0) for _ in range(dim)]
+    norm = sum(v * v for v in vec) ** 0.5 or 1.0
+    return [v / norm for v in vec]
@@ -0,0 +1,277 @@
+"""Micro-benchmarks for the per-turn hot path, with a baseline gate for CI.
+
+Covers the routers that run without an LLM (NaiveRouter, IntentMLRouter), the knowledge
+bases over synthetic FAQ sets from a few rows up to a million (JsonKV lexical scan,
+Chroma vector search when chromadb is installed), SessionStore get/set with short and
+long histories, and ChatResponse/ToolCall construction and serialization.
+
+    python -m benchmarks.run --out bench.json                         # default sizes
+    python -m benchmarks.run --kb-sizes 10,1000,100000,1000000 --only kb
+    python -m benchmarks.run --save-baseline benchmarks/baseline.json  # on the reference machine
+    python -m benchmarks.run --baseline benchmarks/baseline.json --threshold 0.25
+        # exits 1 if any benchmark's median is more than 25% slower than the baseline
+
+Timings are per operation: each benchmark is calibrated so a round takes at least
+`--min-time` seconds, then repeated `--repeat` times; median, min and stdev are over rounds.
+Baselines are machine-specific, so compare only against one recorded on the same hardware.
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from benchmarks import datagen
+
+Case = Tuple[str, Callable[[], Any]]
+
+
+def measure(fn: Callable[[], Any], min_time: float, repeat: int) -> Dict[str, float]:
+    number = 1
+    while True:
+        elapsed = _timed(fn, number)
+        if elapsed >= min_time or number >= 1 << 24:
+            break
+        number *= 2 if elapsed <= 0 else max(2, min(10, int(min_time / elapsed) + 1))
+    rounds = [elapsed / number] + [_timed(fn, number) / number for _ in range(repeat - 1)]
+    median = statistics.median(rounds)
+    return {
+        "median_us": round(median * 1e6, 3),
+        "min_us": round(min(rounds) * 1e6, 3),
+        "stdev_us": round(statistics.pstdev(rounds) * 1e6, 3),
+        "ops_per_sec": round(1.0 / median, 1) if median > 0 else None,
+        "iterations": number,
+        "rounds": repeat,
+    }
+
+
+def _timed(fn: Callable[[], Any], number: int) -> float:
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        return time.perf_counter() - start
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+
+def _cycle(items: List[Any]) -> Callable[[], Any]:
+    """Next item on each call, so a benchmark walks the whole input set instead of one input."""
+    state = {"i": 0}
+
+    def nxt() -> Any:
+        i = state["i"]
+        state["i"] = (i + 1) % len(items)
+        return items[i]
+    return nxt
+
+
+def router_cases(args) -> Iterator[Case]:
+    from routers.naive_router import NaiveRouter
+    nxt = _cycle(datagen.MESSAGES)
+    yield "router.naive.route", lambda: NaiveRouter.route(nxt())
+    try:
+        from routers.intent_ml_router import IntentMLRouter
+        ml = IntentMLRouter()
+    except RuntimeError as e:
+        print(f"skipping router.intent_ml: {e}", file=sys.stderr)
+        return
+    yield "router.intent_ml.route", lambda: ml.route(nxt())
+    yield "router.intent_ml.route_batch_32", lambda: ml.route_batch(datagen.MESSAGES * 4)
+
+
+def kb_cases(args) -> Iterator[Case]:
+    from kb.json_kv_impl import JsonKVKnowledgeBase
+    for n in args.kb_sizes:
+        rows = datagen.faq_rows(n)
+        nxt = _cycle(datagen.queries(rows))
+        kb = JsonKVKnowledgeBase()
+        kb.qa = rows
+        yield f"kb.json_kv.search.{n}", lambda kb=kb, nxt=nxt: kb.search(nxt())
+        if n <= args.chroma_max_size:
+            chroma = _chroma_kb(rows)
+            if chroma is not None:
+                yield f"kb.chroma.search.{n}", lambda kb=chroma, nxt=nxt: kb.search(nxt())
+                matrix = _matrix_kb(chroma, rows)
+                yield f"kb.chroma_matrix.search.{n}", lambda kb=matrix, nxt=nxt: kb.search(nxt())
+
+
+class _StubEmbedder:
+    """Deterministic local embeddings, so the vector path is measured without network calls."""
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        return [datagen.embedding(t) for t in texts]
+
+
+def _chroma_kb(rows: List[Dict[str, str]]):
+    try:
+        import chromadb
+        from kb.chroma_impl import ChromaKnowledgeBase
+    except ImportError:
+        print("skipping kb.chroma: chromadb not installed", file=sys.stderr)
+        return None
+    import logging
+    # Built by hand: the constructor reads the bundled faq.json and embeds it through OpenAI.
+    kb = ChromaKnowledgeBase.__new__(ChromaKnowledgeBase)
+    kb.qa = rows
+    kb.use_vectors = True
+    kb.embedder = _StubEmbedder()
+    kb.logger = logging.getLogger("app")
+    kb.matrix = None
+    kb.client = chromadb.EphemeralClient()
+    name = f"bench_{len(rows)}"
+    try:
+        kb.client.delete_collection(name)
+    except Exception:
+        pass
+    kb.collection = kb.client.create_collection(name=name, metadata={"hnsw:space": "cosine"})
+    batch = 5000
+    for start in range(0, len(rows), batch):
+        chunk = rows[start:start + batch]
+        kb.collection.add(
+            ids=[f"kb:{start + i}" for i in range(len(chunk))],
+            embeddings=kb.embedder.embed([r["q"] for r in chunk]),
+            documents=[r["q"] for r in chunk],
+            metadatas=chunk,
+        )
+    return kb
+
+
+def _matrix_kb(chroma, rows: List[Dict[str, str]]):
+    """The same KB searching an in-memory embedding matrix instead of its Chroma collection."""
+    import copy
+    from kb.matrix import normalize
+    kb = copy.copy(chroma)
+    kb.collection = None
+    kb.matrix = normalize(kb.embedder.embed([r["q"] for r in rows]))
+    return kb
+
+
+def session_cases(args) -> Iterator[Case]:
+    from memory.redis_impl import SessionStore
+    store = SessionStore()
+    for label, turns in (("short", 2), ("long", args.long_history_turns)):
+        state = datagen.session_state(turns)
+        sid = state["session_id"]
+        store.set(sid, state)
+        yield f"session_store.get.{label}", lambda sid=sid: store.get(sid)
+        yield f"session_store.set.{label}", lambda sid=sid, state=state: store.set(sid, state)
+        # What the Redis-backed store pays per turn regardless of the network.
+        yield f"session_state.json_roundtrip.{label}", lambda state=state: json.loads(json.dumps(state))
+
+
+def model_cases(args) -> Iterator[Case]:
+    from models import ChatResponse, ToolCall
+    order = {"order_id": "ORD-1234", "status": "shipped", "carrier": "UPS", "eta": "2025-01-01",
+             "items": [{"sku": "BT-HEADPHONES", "qty": 1}], "total": "79.99"}
+    calls = [
+        {"tool": "Router", "input": {"text": "Where is my package ORD-1234?"},
+         "result": {"intent": "order_tracking", "confidence": 0.97, "meta": {"model": "gpt-4o-mini"}}},
+        {"tool": "OrderAPI.track_order", "input": {"order_id": "ORD-1234"}, "result": order},
+        {"tool": "LLMUsage", "input": {}, "result": {"calls": 1, "tokens": {"prompt": 412, "completion": 9}}},
+    ]
+    yield "models.tool_call.construct", lambda: ToolCall(**calls[1])
+    yield "models.chat_response.construct", lambda: ChatResponse(
+        response="Your order ORD-1234 is shipped via UPS, ETA 2025-01-01.", agent="OrderTrackingAgent",
+        tool_calls=[ToolCall(**c) for c in calls], handover="OrderTrackingAgent")
+    resp = ChatResponse(response="Your order ORD-1234 is shipped.", agent="OrderTrackingAgent",
+                        tool_calls=[ToolCall(**c) for c in calls], handover="OrderTrackingAgent")
+    yield "models.chat_response.model_dump_json", resp.model_dump_json
+    # The /chat handler's path from response model to JSONResponse content.
+    yield "models.chat_response.to_content", lambda: json.loads(resp.model_dump_json())
+
+
+GROUPS: Dict[str, Callable[[Any], Iterator[Case]]] = {
+    "router": router_cases,
+    "kb": kb_cases,
+    "session": session_cases,
+    "models": model_cases,
+}
+
+
+def run(args) -> Dict[str, Any]:
+    results: Dict[str, Dict[str, float]] = {}
+    for group in args.only:
+        for name, fn in GROUPS[group](args):
+            if args.filter and args.filter not in name:
+                continue
+            results[name] = measure(fn, args.min_time, args.repeat)
+            print(f"{name:45s} {results[name]['median_us']:>14.3f} us", file=sys.stderr)
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "implementation": platform.python_implementation(),
+            "machine": platform.machine(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        },
+        "results": results,
+    }
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[Dict[str, Any]]:
+    """One row per benchmark present in both reports; `regressed` when slower by more than `threshold`."""
+    rows = []
+    for name, cur in current["results"].items():
+        base = baseline.get("results", {}).get(name)
+        if not base or not base.get("median_us"):
+            continue
+        ratio = cur["median_us"] / base["median_us"]
+        rows.append({"name": name, "baseline_us": base["median_us"], "current_us": cur["median_us"],
+                     "ratio": round(ratio, 3), "regressed": ratio > 1.0 + threshold})
+    return rows
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--only", default=",".join(GROUPS), help=f"comma-separated groups: {', '.join(GROUPS)}")
+    p.add_argument("--filter", default="", help="run only benchmarks whose name contains this")
+    p.add_argument("--kb-sizes", default="10,1000,100000", help="FAQ row counts, e.g. 10,1000,100000,1000000")
+    p.add_argument("--chroma-max-size", type=int, default=100000, help="skip Chroma above this many rows")
+    p.add_argument("--long-history-turns", type=int, default=200)
+    p.add_argument("--min-time", type=float, default=0.05, help="minimum seconds per round")
+    p.add_argument("--repeat", type=int, default=5)
+    p.add_argument("--out", help="write the JSON report here (default: stdout)")
+    p.add_argument("--baseline", help="compare against this report")
+    p.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown vs baseline (0.25 = 25%%)")
+    p.add_argument("--save-baseline", help="also write the report here as the new baseline")
+    args = p.parse_args(argv)
+    args.only = [g.strip() for g in args.only.split(",") if g.strip()]
+    unknown = [g for g in args.only if g not in GROUPS]
+    if unknown:
+        p.error(f"unknown groups: {', '.join(unknown)}")
+    args.kb_sizes = [int(n) for n in args.kb_sizes.split(",") if n.strip()]
+
+    report = run(args)
+    exit_code = 0
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            rows = compare(report, json.load(f), args.threshold)
+        report["comparison"] = {"baseline": args.baseline, "threshold": args.threshold, "benchmarks": rows}
+        regressed = [r["name"] for r in rows if r["regressed"]]
+        if regressed:
+            print(f"REGRESSION vs {args.baseline}: {', '.join(regressed)}", file=sys.stderr)
+            exit_code = 1
+
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            f.write(json.dumps({"meta": report["meta"], "results": report["results"]}, indent=2) + "\n")
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,8 +1,8 @@
 # config/settings.py
 
-from typing import Literal, Optional
+from typing import Dict, List, Literal, Optional
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, model_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -13,6 +13,8 @@ class OrderAPIConfig(BaseModel):
     timeout_seconds: float = 5.0
     max_retries: int = 3
     backoff_factor: float = 0.5  # e.g. for tenacity: 0.5, 1, 2...
+    breaker_failure_threshold: int = 5  # consecutive failed attempts before the breaker opens
+    breaker_reset_seconds: float = 30.0  # how long the breaker stays open before a half-open probe
 
 
 class OpenAIConfig(BaseModel):
@@ -26,6 +28,29 @@ class OpenAIConfig(BaseModel):
     temperature: float = 0.1
     backoff_factor: float = 0.5
     resolver_min_conf: float = 0.6
+    # Context-resolver prompt: the last `resolver_history_turns` turns are considered; kept are the
+    # last `resolver_user_turns` user turns, the latest assistant reply and turns naming an order ID,
+    # each cut to `resolver_max_turn_chars`; older turns are dropped to fit the token budget.
+    resolver_prompt_token_budget: int = 600
+    resolver_history_turns: int = 10
+    resolver_user_turns: int = 3
+    resolver_max_turn_chars: int = 240
+    resolver_full_prompt_sample_rate: float = 0.01  # share of calls also sizing the uncompacted prompt
+    # USD per 1M tokens as [input, output], for the llm_cost_usd_total estimate
+    token_prices_per_million: Dict[str, List[float]] = {
+        "gpt-4.1-mini": [0.40, 1.60],
+        "gpt-4o-mini": [0.15, 0.60],
+        "text-embedding-3-small": [0.02, 0.0],
+        "text-embedding-3-large": [0.13, 0.0],
+    }
+    breaker_failure_threshold: int = 5
+    breaker_reset_seconds: float = 30.0
+    # Client-side quota budgets per model as [requests per minute, tokens per minute] (0: unlimited),
+    # e.g. {"gpt-4.1-mini": [500, 200000]}; models not listed are not throttled.
+    rate_limits: Dict[str, List[int]] = {}
+    rate_limit_max_wait_seconds: float = 10.0  # queue this long for capacity, then fail the attempt
+    rate_limit_completion_reserve: int = 64  # tokens budgeted for each chat/responses completion
+    rate_limit_shared: bool = True  # share budgets across workers through Redis (REDIS_URL) when available
 
 
 class VectorDBConfig(BaseModel):
@@ -39,6 +64,9 @@ class VectorDBConfig(BaseModel):
     use_openai_embeddings: bool = True
     kb_top_k: int = 3
     kb_min_score: float = 0.35
+    # Memory-mapped FAQ embedding matrix (.npy) searched instead of a per-process Chroma index;
+    # built on first start, then shared by every worker through the page cache.
+    matrix_path: Optional[str] = None
 
 
 class OrchestratorConfig(BaseModel):
@@ -47,6 +75,30 @@ class OrchestratorConfig(BaseModel):
     max_history_turns: int = 8
     enable_tools: bool = True
     trace_logging: bool = False  # enable for deep debugging
+    enable_order_prefetch: bool = True  # start order lookups while routing when an ORD-XXXX is present
+    prefetch_max_workers: int = 8
+    max_orders_per_turn: int = 10  # cap on order IDs tracked from a single message
+
+
+class BatchConfig(BaseModel):
+    """Config for POST /chat/batch."""
+
+    max_items: int = 1000
+    max_concurrency: int = 8  # sessions processed in parallel; turns within a session stay sequential
+
+
+class WebSocketConfig(BaseModel):
+    """Config for the /chat/ws connection-resident sessions."""
+
+    persist_every_turns: int = 5
+    persist_interval_seconds: float = 30.0
+
+
+class TracingConfig(BaseModel):
+    """Per-stage span instrumentation."""
+
+    log_spans: bool = False  # emit each request's spans (OpenTelemetry JSON) in the structured logs
+    debug_header: str = "X-Debug-Trace"  # when this request header is truthy, spans are returned in the response
 
 
 class LoggingConfig(BaseModel):
@@ -54,6 +106,119 @@ class LoggingConfig(BaseModel):
 
     level: Literal["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"] = "INFO"
     json_logging: bool = False
+    async_logging: bool = True  # encode and write log lines on a background thread
+    queue_size: int = 10000  # records beyond this are dropped (log_records_dropped_total)
+    sample_rates: Dict[str, float] = {}  # per-level keep ratio, e.g. {"INFO": 0.1}; missing levels keep all
+
+
+class RecorderConfig(BaseModel):
+    """Opt-in production traffic recording for offline replay (loadtest.replay)."""
+
+    enabled: bool = False
+    sample_rate: float = 0.01  # share of sessions recorded; sampling keeps whole conversations
+    path: str = "recordings/traffic.jsonl"
+    pii_fields: List[str] = ["name", "first_name", "last_name", "customer_name", "email", "phone",
+                             "address", "shipping_address", "billing_address", "card_number"]
+
+
+class AdminConfig(BaseModel):
+    """Who may call the /admin endpoints and use diagnostic request headers."""
+
+    allowed_callers: List[str] = ["127.0.0.1", "::1"]  # client addresses
+    token: Optional[str] = None  # when set, an X-Admin-Token header with this value also grants access
+
+
+class ProfilingConfig(BaseModel):
+    """On-demand CPU profiling (X-Profile header, /admin/profile); off by default."""
+
+    enabled: bool = False
+    header: str = "X-Profile"  # "1"/"cprofile" for a deterministic profile, "sample" for stack samples
+    request_sample_interval_ms: float = 1.0
+    process_sample_interval_ms: float = 5.0
+    max_seconds: float = 60.0  # cap for /admin/profile?seconds=
+    top: int = 30  # functions listed in a cProfile result
+    store_dir: Optional[str] = None  # also write each request profile here (.prof / .collapsed)
+
+
+class MemoryConfig(BaseModel):
+    """Per-component memory gauges and the /admin/memory endpoints."""
+
+    gauges: bool = True  # computed on /metrics scrapes only
+    gauge_min_interval_seconds: float = 15.0  # scrapes within this window reuse the last values
+    sample_items: int = 200  # larger containers are sampled when estimating sizes
+    max_objects: int = 200000  # per-component cap on objects walked
+    admin_enabled: bool = False  # /admin/memory endpoints (tracemalloc starts with the first snapshot)
+    tracemalloc_frames: int = 1
+    max_snapshots: int = 10
+
+
+class AdmissionConfig(BaseModel):
+    """Adaptive admission control for LLM-bound stages (router, resolver, embeddings)."""
+
+    enabled: bool = True
+    initial_limit: int = 32  # concurrent LLM calls; adapted by AIMD between min_limit and max_limit
+    min_limit: int = 2
+    max_limit: int = 256
+    latency_target_seconds: float = 5.0  # slower LLM calls shrink the limit
+    backoff: float = 0.9  # multiplicative decrease on a slow or failed call
+    queue_depth_target: int = 64  # requests in flight beyond which LLM stages take their fallback
+    max_in_flight_requests: int = 256  # hard limit: 503 with Retry-After beyond this
+    retry_after_seconds: int = 1
+    fallback_router: str = "NaiveRouter"  # used instead of an LLM router when degraded (e.g. IntentMLRouter)
+
+
+class DeadlineConfig(BaseModel):
+    """Per-request time budget shared by every stage (upstream timeouts, retries, optional stages)."""
+
+    default_seconds: float = 15.0
+    max_seconds: float = 60.0  # cap on budgets asked for through the header
+    header: str = "X-Request-Timeout"  # per-request budget in seconds
+    optional_stage_min_seconds: float = 3.0  # optional stages (LLM resolver) are skipped with less left
+
+
+class HedgingConfig(BaseModel):
+    """Hedged requests: a second attempt of an idempotent upstream call once the first is slow."""
+
+    enabled: bool = False
+    calls: List[str] = ["openai.route", "openai.resolve_order_id", "openai.embed",
+                        "order_api.get_order", "order_api.track_order"]
+    percentile: float = 95.0  # hedge once the first attempt is slower than this percentile of recent calls
+    min_delay_ms: float = 50.0
+    max_hedge_percent: float = 5.0  # of the last `window` calls per call site
+    window: int = 500
+    min_samples: int = 50  # no hedging until this many latencies have been seen
+    max_workers: int = 64  # shared pool running hedgeable attempts
+
+
+class StartupConfig(BaseModel):
+    """Warmup of heavy components (KB index, router model, clients) under the app lifespan."""
+
+    warmup: bool = True  # False: components are built by the first request instead
+    background: bool = True  # serve /healthz while warming up; /readyz turns 200 when done
+
+
+class PreloadConfig(BaseModel):
+    """Build components once when the app is imported, before workers fork (gunicorn.conf.py),
+    so workers share the router model, FAQ rows and KB matrix copy-on-write.
+
+    Requires `vectordb.matrix_path`: a Chroma client's sqlite handles must not cross a fork.
+    """
+
+    enabled: bool = False
+
+
+class OffloadConfig(BaseModel):
+    """Process pool for CPU-bound stages (IntentMLRouter, large KB matrix searches)."""
+
+    enabled: bool = False
+    max_workers: int = 2
+    start_method: Literal["forkserver", "spawn", "fork"] = "forkserver"
+    max_batch: int = 64  # route calls per pool task
+    batch_window_ms: float = 0.0  # extra wait to fill a batch; 0: batch what queued while workers were busy
+    max_pending: int = 1024  # queued route calls beyond this run inline (backpressure)
+    min_matrix_cells: int = 2_000_000  # smaller KB matrices are searched inline
+    min_route_chars: int = 512  # shorter messages (or batches, in total) are routed inline
+    task_timeout_seconds: float = 5.0  # then the work is redone inline
 
 
 class ModulesConfig(BaseModel):
@@ -74,6 +239,19 @@ class Settings(BaseSettings):
     openai: OpenAIConfig
     vectordb: VectorDBConfig = VectorDBConfig()
     orchestrator: OrchestratorConfig = OrchestratorConfig()
+    batch: BatchConfig = BatchConfig()
+    websocket: WebSocketConfig = WebSocketConfig()
+    tracing: TracingConfig = TracingConfig()
+    recorder: RecorderConfig = RecorderConfig()
+    admin: AdminConfig = AdminConfig()
+    profiling: ProfilingConfig = ProfilingConfig()
+    memory: MemoryConfig = MemoryConfig()
+    admission: AdmissionConfig = AdmissionConfig()
+    deadline: DeadlineConfig = DeadlineConfig()
+    hedging: HedgingConfig = HedgingConfig()
+    startup: StartupConfig = StartupConfig()
+    preload: PreloadConfig = PreloadConfig()
+    offload: OffloadConfig = OffloadConfig()
     logging: LoggingConfig = LoggingConfig()
 
     # pydantic-settings v2 config
@@ -84,8 +262,13 @@ class Settings(BaseSettings):
         case_sensitive=False,
     )
 
+    @model_validator(mode="after")
+    def _preload_needs_kb_matrix(self) -> "Settings":
+        if self.preload.enabled and not self.vectordb.matrix_path:
+            raise ValueError("preload.enabled requires vectordb.matrix_path (APP_VECTORDB__MATRIX_PATH): "
+                             "a Chroma client built before the fork would be shared by every worker")
+        return self
+
 
 # Single global instance you import everywhere
 settings = Settings()
-
-print(settings)
@@ -0,0 +1,25 @@
+"""Multi-worker serving: `gunicorn -c gunicorn.conf.py app:app`.
+
+The app is imported and warmed up once in the master (APP_PRELOAD__ENABLED), so workers share
+the router model, FAQ rows and KB matrix copy-on-write. Metrics from every worker are written
+to PROMETHEUS_MULTIPROC_DIR and aggregated by /metrics.
+"""
+import os
+import shutil
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", "4"))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+
+os.environ.setdefault("APP_PRELOAD__ENABLED", "true")
+os.environ.setdefault("APP_VECTORDB__MATRIX_PATH", "./data/faq_embeddings.npy")  # required by preload
+os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", "/tmp/prometheus-multiproc")
+# Cleared before the app is imported: files left by a previous run would be summed into this one.
+shutil.rmtree(os.environ["PROMETHEUS_MULTIPROC_DIR"], ignore_errors=True)
+os.makedirs(os.environ["PROMETHEUS_MULTIPROC_DIR"], exist_ok=True)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
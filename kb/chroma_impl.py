@@ -1,13 +1,17 @@
+import hashlib
 import os
 import json
 import numpy as np
 import chromadb
 from chromadb.config import Settings
-from typing import List, Dict
+from typing import List, Dict, Optional, Tuple
 import logging
 
-from llm.openai_client import OpenAIClient
+from llm.openai_client import OpenAIClient, LLM_ADMISSION
+from resilience import CircuitOpenError, DeadlineExceeded, allows_optional
 from base import BaseKVStorage
+from kb.matrix import normalize
+from offload import OFFLOAD
 # from config import (
 #     USE_OPENAI_EMBEDDINGS,
 #     CHROMA_DIR,
@@ -29,12 +33,15 @@ class ChromaKnowledgeBase(BaseKVStorage):
             self.qa: List[Dict[str, str]] = json.load(f)
         self.use_vectors = os.getenv("ENABLE_EMBEDDINGS", "false").lower() == "true"
         self.collection = None
+        self.matrix: Optional[np.ndarray] = None
         self.embedder = OpenAIClient() if (self.use_vectors and cfg.use_openai_embeddings) else None
         self.logger = logging.getLogger("app")
 
-        if self.use_vectors and self.embedder:
-            self.client = chromadb.PersistentClient(path=CHROMA_DIR, settings=Settings(allow_reset=True))
-            self.collection = self.client.get_or_create_collection(name=CHROMA_COLLECTION, metadata={"hnsw:space": "cosine"})
+        if self.use_vectors and self.embedder and cfg.matrix_path:
+            self.matrix = self._load_matrix(cfg.matrix_path)
+        elif self.use_vectors and self.embedder:
+            self.client = chromadb.PersistentClient(path=cfg.persist_directory, settings=Settings(allow_reset=True))
+            self.collection = self.client.get_or_create_collection(name=cfg.collection_name, metadata={"hnsw:space": "cosine"})
             self._bootstrap_if_empty()
 
     def _bootstrap_if_empty(self):
@@ -46,6 +53,37 @@ class ChromaKnowledgeBase(BaseKVStorage):
         embs = self.embedder.embed(texts)
         self.collection.add(ids=ids, embeddings=embs, documents=texts, metadatas=metas)
 
+    def _load_matrix(self, path: str) -> np.ndarray:
+        """Unit-normalized FAQ question embeddings, memory-mapped read-only so that every worker
+        shares one copy through the page cache. Embedded (and saved) only when `path` is missing
+        or was built from other questions or another embedding model."""
+        texts = [row["q"].strip() for row in self.qa]
+        fingerprint = hashlib.sha256("\n".join([settings.openai.embedding_model] + texts).encode()).hexdigest()
+        meta_path = f"{path}.json"
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                if json.load(f).get("fingerprint") == fingerprint:
+                    return np.load(path, mmap_mode="r")
+        except (OSError, ValueError):
+            pass
+        embs = normalize(self.embedder.embed(texts))
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        # Written aside and renamed, so concurrent workers never map a partial file.
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            np.save(f, embs)
+        os.replace(tmp, path)
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"fingerprint": fingerprint, "rows": len(texts)}, f)
+        os.replace(tmp, meta_path)
+        self.logger.info(f"Saved KB embedding matrix {embs.shape} to {path}")
+        return np.load(path, mmap_mode="r")
+
+    def _matrix_hits(self, qv: List[float]) -> List[Tuple[str, str, float]]:
+        # Large matrices are searched in the offload process pool, small ones inline.
+        top = OFFLOAD.top_k(self.matrix, qv, cfg.kb_top_k)
+        return [(self.qa[i]["q"].strip(), self.qa[i]["a"], max(0.0, sim)) for i, sim in top]
+
     def _fallback_search(self, query: str):
         q = query.lower()
         for item in self.qa:
@@ -54,23 +92,33 @@ class ChromaKnowledgeBase(BaseKVStorage):
         return None, []
 
     def search_with_citations(self, query: str):
-        if not self.use_vectors or not self.collection or not self.embedder:
+        if not self.use_vectors or not self.embedder or (self.collection is None and self.matrix is None):
+            return self._fallback_search(query)
+        if not allows_optional("embed", settings.deadline.optional_stage_min_seconds):
+            return self._fallback_search(query)
+        try:
+            with LLM_ADMISSION.stage("embed") as admitted:
+                if not admitted:
+                    return self._fallback_search(query)
+                qv = self.embedder.embed([query])[0]
+        except (CircuitOpenError, DeadlineExceeded):
             return self._fallback_search(query)
-        qv = self.embedder.embed([query])[0]
-        res = self.collection.query(query_embeddings=[qv], n_results=KB_TOP_K, include=["metadatas", "distances", "documents"])
-        distances = (res or {}).get("distances", [[]])[0]
-        metas = (res or {}).get("metadatas", [[]])[0]
-        docs = (res or {}).get("documents", [[]])[0]
+        if self.matrix is not None:
+            hits = self._matrix_hits(qv)
+        else:
+            res = self.collection.query(query_embeddings=[qv], n_results=cfg.kb_top_k, include=["metadatas", "distances", "documents"])
+            distances = (res or {}).get("distances", [[]])[0]
+            metas = (res or {}).get("metadatas", [[]])[0]
+            docs = (res or {}).get("documents", [[]])[0]
+            hits = [(docs[i], metas[i].get("a"), max(0.0, 1.0 - float(d))) for i, d in enumerate(distances)]
         self.logger.info(f'Searched database with query: {query}')
-        if not distances:
+        if not hits:
             return None, []
-        sims = [max(0.0, 1.0 - float(d)) for d in distances]
-        best_idx = int(np.argmax(sims))
-        best_sim = float(sims[best_idx])
-        citations = [{"q": docs[i], "a": metas[i].get("a"), "similarity": round(sims[i], 4)} for i in range(len(sims))]
-        if best_sim < KB_MIN_SCORE:
+        best_answer, best_sim = max(((a, s) for _, a, s in hits), key=lambda h: h[1])
+        citations = [{"q": q, "a": a, "similarity": round(s, 4)} for q, a, s in hits]
+        if best_sim < cfg.kb_min_score:
             return None, citations
-        return metas[best_idx].get("a"), citations
+        return best_answer, citations
 
     def search(self, query: str):
         return self.search_with_citations(query)[0]
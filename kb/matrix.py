@@ -0,0 +1,24 @@
+"""Cosine search over a matrix of unit-normalized embeddings (the KB matrix, see ChromaKnowledgeBase).
+
+Kept free of the KB's heavier imports so offload pool workers can use it too.
+"""
+from typing import List, Sequence, Tuple
+
+import numpy as np
+
+
+def normalize(vectors: Sequence[Sequence[float]]) -> np.ndarray:
+    """float32 rows scaled to unit length (all-zero rows stay zero)."""
+    m = np.asarray(vectors, dtype=np.float32)
+    return m / np.maximum(np.linalg.norm(m, axis=-1, keepdims=True), 1e-12)
+
+
+def top_k(matrix: np.ndarray, vector: Sequence[float], k: int) -> List[Tuple[int, float]]:
+    """(row, cosine similarity) of the `k` rows most similar to `vector`, best first."""
+    sims = matrix @ normalize(vector)
+    k = min(k, len(sims))
+    if k <= 0:
+        return []
+    top = np.argpartition(-sims, k - 1)[:k]
+    top = top[np.argsort(-sims[top])]
+    return [(int(i), float(sims[i])) for i in top]
@@ -1,17 +1,65 @@
 import os
-import time
 import logging
-import json
-from typing import List, Optional
+import weakref
+from typing import Any, Callable, List, Optional
 from openai import OpenAI
 from pydantic import BaseModel, Field
 
 from prompts import PROMPTS
 from routers import INTENT_LIST
 from config.settings import settings
+from observability import traced
+from observability.llm_usage import accounted, current_llm_call
+from observability.traffic_recorder import taped
+from resilience import coalesce, AdaptiveLimiter, AdmissionController, CircuitBreaker, CircuitOpenError, RateLimiter
+from resilience import RateLimitTimeout
+from resilience import DeadlineExceeded, cap_timeout, deadline_expired, sleep_before_retry
+from resilience import configured_hedger, hedged
+from llm.resolver_prompt import build_resolver_prompt
+from llm.structured import RESOLVED_ORDER_SCHEMA, StructuredOutputError, parse_structured
+from llm.tokens import estimate_request_tokens
+from config import REDIS_URL
+
+try:
+    import redis
+except Exception:
+    redis = None
 
 openai_cfg = settings.openai
 
+# Shared by every OpenAIClient instance: chat, responses and embeddings fail together.
+OPENAI_BREAKER = CircuitBreaker(
+    "openai",
+    failure_threshold=openai_cfg.breaker_failure_threshold,
+    reset_timeout=openai_cfg.breaker_reset_seconds,
+)
+
+# RPM/TPM budgets per model, shared by every worker through Redis when it is configured.
+OPENAI_RATE_LIMITER = RateLimiter(
+    "openai",
+    {model: tuple(limits) for model, limits in openai_cfg.rate_limits.items()},
+    client=redis.Redis(host=REDIS_URL, port=6379, db=0, socket_timeout=0.5, socket_connect_timeout=0.5)
+    if (openai_cfg.rate_limit_shared and REDIS_URL and redis is not None) else None,
+)
+
+# Shared admission control for LLM-bound stages: degrade to non-LLM fallbacks, or shed, under load.
+_admission_cfg = settings.admission
+LLM_ADMISSION = AdmissionController(
+    "llm",
+    AdaptiveLimiter(
+        "llm",
+        initial=_admission_cfg.initial_limit,
+        min_limit=_admission_cfg.min_limit,
+        max_limit=_admission_cfg.max_limit,
+        latency_target=_admission_cfg.latency_target_seconds,
+        backoff=_admission_cfg.backoff,
+    ),
+    queue_depth_target=_admission_cfg.queue_depth_target,
+    max_in_flight=_admission_cfg.max_in_flight_requests,
+    retry_after=_admission_cfg.retry_after_seconds,
+    enabled=_admission_cfg.enabled,
+)
+
 
 class ResolvedOrder(BaseModel):
     id: Optional[str] = None
@@ -27,63 +75,144 @@ class IntentResult(BaseModel):
     err: Optional[str] = None
 
 
+_instances: "weakref.WeakSet[OpenAIClient]" = weakref.WeakSet()
+
+
+def _new_http_clients() -> None:
+    # A forked worker (gunicorn --preload) must not share the parent's pooled connections.
+    for c in list(_instances):
+        c.client = OpenAI(api_key=openai_cfg.api_key)
+
+
+os.register_at_fork(after_in_child=_new_http_clients)
+
+
 class OpenAIClient:
     def __init__(self):
         # self.client = completion_with_backoff
         self.client = OpenAI(api_key=openai_cfg.api_key)
         self.logger = logging.getLogger("app")
+        _instances.add(self)
+
+    @staticmethod
+    def available() -> bool:
+        """False while the OpenAI breaker is open; callers should take their non-LLM path."""
+        return not OPENAI_BREAKER.is_open()
+
+    @staticmethod
+    def upstream_failed(err: Optional[str]) -> bool:
+        """True for an error result from a failed upstream call, False for none or a breaker rejection
+        (nothing was sent, so it says nothing about LLM capacity)."""
+        return bool(err) and str(CircuitOpenError(OPENAI_BREAKER.name)) not in err
+
+    @staticmethod
+    def _guarded(create: Callable[..., Any], **kwargs: Any) -> Any:
+        """Make one upstream attempt, report it to the OpenAI breaker and account its token usage.
 
+        The attempt first queues for the model's rate-limit budget (one request, plus the prompt
+        tokens estimated from the formatted request and a completion reserve). The wait and the
+        request timeout are capped by the request deadline (DeadlineExceeded once it has passed).
+        """
+        model = kwargs.get("model", "")
+        reserve = 0 if model == openai_cfg.embedding_model else openai_cfg.rate_limit_completion_reserve
+        try:
+            OPENAI_RATE_LIMITER.acquire(model, estimate_request_tokens(kwargs) + reserve,
+                                        cap_timeout(openai_cfg.rate_limit_max_wait_seconds, "openai"))
+            kwargs["timeout"] = cap_timeout(kwargs.get("timeout", openai_cfg.request_timeout_seconds), "openai")
+        except (DeadlineExceeded, RateLimitTimeout):
+            OPENAI_BREAKER.release()  # nothing was sent: hand back a half-open probe
+            raise
+        call = current_llm_call()
+        if call is not None:
+            call.attempts += 1
+        try:
+            resp = create(**kwargs)
+        except Exception as e:
+            if deadline_expired():
+                # Cut off by our own (capped) timeout: not a sign of an unhealthy upstream.
+                OPENAI_BREAKER.release()
+                raise DeadlineExceeded("openai") from e
+            OPENAI_BREAKER.record_failure()
+            raise
+        OPENAI_BREAKER.record_success()
+        if call is not None:
+            call.add_usage(getattr(resp, "usage", None))
+        return resp
+
+    @traced("openai.embed")
+    @taped("openai.embed")
+    @coalesce("openai.embed")
+    @hedged(configured_hedger("openai.embed", settings.hedging))
+    @accounted("embed", openai_cfg.embedding_model)
     def embed(self, texts: List[str]) -> List[List[float]]:
         delay = openai_cfg.backoff_factor
         last_exc = None
         for attempt in range(1, openai_cfg.max_retries + 1):
+            if not OPENAI_BREAKER.allow():
+                raise CircuitOpenError(OPENAI_BREAKER.name)
             try:
-                resp = self.client.embeddings.create(model=openai_cfg.embedding_model, input=texts, timeout=openai_cfg.request_timeout_seconds)
+                resp = self._guarded(self.client.embeddings.create, model=openai_cfg.embedding_model, input=texts, timeout=openai_cfg.request_timeout_seconds)
                 return [d.embedding for d in resp.data]
             except Exception as e:
                 last_exc = e
+                if OPENAI_BREAKER.is_open():
+                    break
+                if attempt == openai_cfg.max_retries or not sleep_before_retry(delay, "openai.embed"):
+                    break
                 self.logger.warning(f"Embedding attempt {attempt} failed: {e}. Retrying in {delay:.1f}s...")
-                time.sleep(delay)
                 delay *= 2
         self.logger.error(f"All {openai_cfg.max_retries} embedding attempts failed: {last_exc}")
         raise last_exc
 
+    @traced("openai.resolve_order_id")
+    @taped("openai.resolve_order_id", ResolvedOrder, key_args=1)
+    @hedged(configured_hedger("openai.resolve_order_id", settings.hedging))
+    @accounted("resolve_order_id", openai_cfg.chat_model)
     def resolve_order_id(self, message: str, state: dict) -> ResolvedOrder:
         """Return {resolved_order_id, confidence, reasoning}"""
-        history = state.get("history", [])[-5:]
-        last_order_id = state.get("last_order_id")
-        last_product_context = state.get("last_product_context")
-        prompt = PROMPTS['context_resolver'].format(
-            history=json.dumps(history, indent=2),
-            last_order_id=last_order_id,
-            last_product_context=last_product_context,
-            message=message,
-        )
+        prompt, tokens = build_resolver_prompt(message, state, openai_cfg)
+        call = current_llm_call()
+        if call is not None:
+            call.estimated_prompt_tokens = tokens
         delay = openai_cfg.backoff_factor
         last_exc = None
         for attempt in range(1, openai_cfg.max_retries + 1):
+            if not OPENAI_BREAKER.allow():
+                return ResolvedOrder(err=str(CircuitOpenError(OPENAI_BREAKER.name)))
             try:
-                resp = self.client.responses.create(
+                resp = self._guarded(
+                    self.client.responses.create,
                     model=openai_cfg.chat_model,
                     input=prompt,
-                    temperature=0.0
+                    temperature=0.0,
+                    text={"format": {
+                        "type": "json_schema",
+                        "name": "resolved_order",
+                        "schema": RESOLVED_ORDER_SCHEMA,
+                        "strict": True,
+                    }},
                 )
-                raw = resp.output[0].content[0].text
-                try:
-                    data = json.loads(raw)
-                except json.JSONDecodeError as json_decode_error:
-                    self.logger.error(f'Context Resolver JSON Decode Error: {json_decode_error}')
-                resolved_order = ResolvedOrder.model_validate(data)
-                return resolved_order
+                return parse_structured(resp.output[0].content[0].text, ResolvedOrder, "resolve_order_id")
             except Exception as e:
                 last_exc = e
+                if OPENAI_BREAKER.is_open() or attempt == openai_cfg.max_retries:
+                    break
+                if isinstance(e, StructuredOutputError):
+                    # The call itself worked: backing off would not make the next reply better formed.
+                    self.logger.warning(f"LLM resolver attempt {attempt} returned unusable output: {e}. Retrying")
+                    continue
+                if not sleep_before_retry(delay, "openai.resolve_order_id"):
+                    break
                 self.logger.warning(f"LLM resolver attempt {attempt} failed: {e}. Retrying in {delay:.1f}s...")
-                time.sleep(delay)
                 delay *= 2
         self.logger.error(f"All {openai_cfg.max_retries} LLM attempts failed: {last_exc}")
 
-        return ResolvedOrder(err=last_exc)
+        return ResolvedOrder(err=str(last_exc))
 
+    @traced("openai.route")
+    @taped("openai.route", IntentResult)
+    @hedged(configured_hedger("openai.route", settings.hedging))
+    @accounted("route", openai_cfg.chat_model)
     def route(self, text: str) -> IntentResult:
         sys = (
             "You are an intent router. Classify the user message into exactly one of: "
@@ -94,8 +223,11 @@ class OpenAIClient:
         delay = openai_cfg.backoff_factor
         last_exc = None
         for attempt in range(1, openai_cfg.max_retries + 1):
+            if not OPENAI_BREAKER.allow():
+                return IntentResult(err=str(CircuitOpenError(OPENAI_BREAKER.name)))
             try:
-                resp = self.client.chat.completions.create(
+                resp = self._guarded(
+                    self.client.chat.completions.create,
                     model=openai_cfg.chat_model,
                     temperature=0.0,
                     messages=[
@@ -120,18 +252,17 @@ class OpenAIClient:
                         },
                     },
                 )
-                content = resp.choices[0].message.content
-                try:
-                    data = json.loads(content)
-                except json.JSONDecodeError as json_decode_error:
-                    self.logger.error(f'LLM Router JSON Decode Error: {json_decode_error}')
-
-                intent_result = IntentResult.model_validate(data)
-                return intent_result
+                return parse_structured(resp.choices[0].message.content, IntentResult, "route")
             except Exception as e:
                 last_exc = e
+                if OPENAI_BREAKER.is_open() or attempt == openai_cfg.max_retries:
+                    break
+                if isinstance(e, StructuredOutputError):
+                    self.logger.warning(f"LLM router attempt {attempt} returned unusable output: {e}. Retrying")
+                    continue
+                if not sleep_before_retry(delay, "openai.route"):
+                    break
                 self.logger.warning(f"LLM router attempt {attempt} failed: {e}. Retrying in {delay:.1f}s...")
-                time.sleep(delay)
                 delay *= 2
         self.logger.error(f"All {openai_cfg.max_retries} LLM attempts failed: {last_exc}")
         return IntentResult(err=str(last_exc))
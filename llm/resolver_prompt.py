@@ -0,0 +1,78 @@
+"""Compact context-resolver prompts under a token budget.
+
+Only what helps resolve an order reference goes in: the last few user turns, the latest
+assistant reply and any turn mentioning an order ID, each squeezed to one line and trimmed.
+Turns without an order ID are dropped first (oldest first) until the prompt fits the budget.
+"""
+import json
+import random
+import re
+from typing import Any, Dict, List, Tuple
+
+from prometheus_client import Histogram
+
+from config import ORDER_ID_RE
+from llm.tokens import estimate_tokens
+from prompts import PROMPTS
+
+RESOLVER_PROMPT_TOKENS = Histogram(
+    "resolver_prompt_tokens",
+    "Estimated context-resolver prompt tokens, as sent (compact) and, for a sample of calls, as the "
+    "full history would have been (full)",
+    ["kind"],
+    buckets=(100, 200, 300, 400, 600, 800, 1200, 1600, 2400, 3200, 6400),
+)
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+")
+
+
+def snippet(text: str, max_chars: int) -> str:
+    """`text` on one line; just its sentences naming order IDs when it has any; at most `max_chars`."""
+    text = " ".join(text.split())
+    if ORDER_ID_RE.search(text):
+        text = " … ".join(s for s in _SENTENCE_RE.split(text) if ORDER_ID_RE.search(s))
+    return text if len(text) <= max_chars else text[:max_chars - 1].rstrip() + "…"
+
+
+def compact_history(history: List[Dict[str, Any]], message: str, turns: int, user_turns: int,
+                    max_chars: int) -> List[str]:
+    """One `role: text` line per kept turn of the last `turns`, oldest first."""
+    recent = history[-turns:] if turns > 0 else []
+    if recent and recent[-1].get("role") == "user" and recent[-1].get("content") == message:
+        recent = recent[:-1]  # the current message is in the prompt on its own
+    users = [i for i, t in enumerate(recent) if t.get("role") == "user"]
+    assistants = [i for i, t in enumerate(recent) if t.get("role") == "assistant"]
+    keep = set(users[-user_turns:] if user_turns > 0 else []) | set(assistants[-1:])
+    lines = []
+    for i, turn in enumerate(recent):
+        content = str(turn.get("content") or "")
+        if i in keep or ORDER_ID_RE.search(content):
+            lines.append(f"{turn.get('role')}: {snippet(content, max_chars)}")
+    return lines
+
+
+def build_resolver_prompt(message: str, state: Dict[str, Any], cfg: Any) -> Tuple[str, int]:
+    """The context-resolver prompt for `message` and its estimated tokens, per OpenAIConfig `cfg`."""
+    history = state.get("history", [])
+
+    def render(history_text: str) -> str:
+        return PROMPTS["context_resolver"].format(
+            history=history_text,
+            last_order_id=state.get("last_order_id"),
+            last_product_context=state.get("last_product_context"),
+            message=message,
+        )
+
+    lines = compact_history(history, message, cfg.resolver_history_turns, cfg.resolver_user_turns,
+                            cfg.resolver_max_turn_chars)
+    prompt = render("\n".join(lines) or "(none)")
+    tokens = estimate_tokens(prompt, cfg.chat_model)
+    while tokens > cfg.resolver_prompt_token_budget and lines:
+        drop = next((i for i, line in enumerate(lines) if not ORDER_ID_RE.search(line)), 0)
+        del lines[drop]
+        prompt = render("\n".join(lines) or "(none)")
+        tokens = estimate_tokens(prompt, cfg.chat_model)
+    RESOLVER_PROMPT_TOKENS.labels(kind="compact").observe(tokens)
+    if random.random() < cfg.resolver_full_prompt_sample_rate:  # an extra render + tokenize: sampled
+        RESOLVER_PROMPT_TOKENS.labels(kind="full").observe(
+            estimate_tokens(render(json.dumps(history[-5:], indent=2)), cfg.chat_model))
+    return prompt, tokens
@@ -0,0 +1,90 @@
+"""Structured (JSON) LLM output: response schemas and a tolerant local parser.
+
+Schema-constrained output should always be valid JSON, but a truncated or fenced reply is
+still repaired locally rather than costing another round trip.
+"""
+import ast
+import json
+import re
+from typing import Any, Dict, Optional, Tuple, Type
+
+from prometheus_client import Counter
+from pydantic import BaseModel, ValidationError
+
+LLM_STRUCTURED_OUTPUT = Counter(
+    "llm_structured_output_total",
+    "Structured LLM replies by call site and parse outcome (parsed; repaired: recovered from "
+    "almost-valid output; failed: unusable, the attempt is retried)",
+    ["call_site", "outcome"],
+)
+
+RESOLVED_ORDER_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "id": {"type": ["string", "null"]},
+        "confidence": {"type": "number"},
+        "reasoning": {"type": "string"},
+    },
+    "required": ["id", "confidence", "reasoning"],
+    "additionalProperties": False,
+}
+
+_FENCE_RE = re.compile(r"^```(?:json)?\s*|\s*```$", re.IGNORECASE)
+_TRAILING_COMMA_RE = re.compile(r",\s*([}\]])")
+_FIELD_RE = re.compile(r'"(\w+)"\s*:\s*("(?:[^"\\]|\\.)*"|-?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?|true|false|null)')
+
+
+class StructuredOutputError(ValueError):
+    """An LLM reply that could not be turned into the expected object."""
+
+
+def _repair(raw: str) -> Optional[Dict[str, Any]]:
+    text = _FENCE_RE.sub("", raw.strip())
+    start, end = text.find("{"), text.rfind("}")
+    if start != -1 and end > start:
+        body = _TRAILING_COMMA_RE.sub(r"\1", text[start:end + 1])
+        try:
+            data = json.loads(body)
+        except json.JSONDecodeError:
+            try:
+                data = ast.literal_eval(body)  # single quotes, True/None
+            except (ValueError, SyntaxError, MemoryError, RecursionError):
+                data = None
+        if isinstance(data, dict):
+            return data
+    # Truncated or otherwise broken: keep whichever complete "key": value pairs there are.
+    fields = {}
+    for key, value in _FIELD_RE.findall(text):
+        try:
+            fields[key] = json.loads(value)
+        except json.JSONDecodeError:
+            continue
+    return fields or None
+
+
+def parse_json_object(raw: Optional[str]) -> Tuple[Optional[Dict[str, Any]], bool]:
+    """(object, repaired) from an LLM reply; the object is None when nothing usable is found."""
+    if not raw:
+        return None, False
+    try:
+        data = json.loads(raw)
+        if isinstance(data, dict):
+            return data, False
+    except json.JSONDecodeError:
+        pass
+    return _repair(raw), True
+
+
+def parse_structured(raw: Optional[str], model: Type[BaseModel], call_site: str) -> Any:
+    """`raw` validated as `model`, repairing almost-valid JSON; raises StructuredOutputError."""
+    data, repaired = parse_json_object(raw)
+    if data is None:
+        LLM_STRUCTURED_OUTPUT.labels(call_site=call_site, outcome="failed").inc()
+        raise StructuredOutputError(f"no JSON object in {call_site} reply: {(raw or '')[:200]!r}")
+    try:
+        result = model.model_validate(data)
+    except ValidationError as e:
+        LLM_STRUCTURED_OUTPUT.labels(call_site=call_site, outcome="failed").inc()
+        raise StructuredOutputError(f"invalid {call_site} reply: {e}") from e
+    LLM_STRUCTURED_OUTPUT.labels(call_site=call_site, outcome="repaired" if repaired else "parsed").inc()
+    return result
@@ -0,0 +1,50 @@
+"""Local prompt-token estimates, used to budget OpenAI calls before they are sent.
+
+Uses tiktoken when it is installed; otherwise a character/word heuristic that errs high for
+English text (≈4 characters per token, never fewer tokens than words and symbols).
+"""
+import math
+import re
+from functools import lru_cache
+from typing import Any, Dict, Iterable
+
+try:
+    import tiktoken
+except Exception:
+    tiktoken = None
+
+# Per-message framing tokens in the chat format (role, separators).
+MESSAGE_OVERHEAD = 4
+_PIECES_RE = re.compile(r"\w+|[^\w\s]")
+
+
+@lru_cache(maxsize=16)
+def _encoding(model: str):
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("o200k_base")
+
+
+def estimate_tokens(text: str, model: str = "") -> int:
+    if not text:
+        return 0
+    if tiktoken is not None:
+        return len(_encoding(model).encode(text))
+    return max(math.ceil(len(text) / 4), len(_PIECES_RE.findall(text)))
+
+
+def estimate_request_tokens(kwargs: Dict[str, Any]) -> int:
+    """Prompt tokens of an OpenAI request, from its `messages` (chat), `input` (responses,
+    embeddings) and `instructions` arguments."""
+    model = kwargs.get("model", "")
+    total = 0
+    for message in kwargs.get("messages") or ():
+        total += MESSAGE_OVERHEAD + estimate_tokens(str(message.get("content") or ""), model)
+    inputs = kwargs.get("input")
+    if isinstance(inputs, str):
+        total += estimate_tokens(inputs, model)
+    elif isinstance(inputs, Iterable):
+        total += sum(estimate_tokens(i if isinstance(i, str) else str(i), model) for i in inputs)
+    total += estimate_tokens(kwargs.get("instructions") or "", model)
+    return total
@@ -0,0 +1,207 @@
+"""Replay recorded production traffic against one or more configurations, offline.
+
+Input is the JSONL written by the traffic recorder (`recorder.enabled`). Each configuration
+runs in its own process with a fresh in-memory session store; every turn's LLM and order
+API calls are answered from that turn's record, so no network is needed and turns run as
+fast as the service allows (or at the recorded pace divided by --speed). The report is JSON:
+latency percentiles per configuration, and decision differences (intent, agent, tool
+sequence, reply, status) against the recording and against the first configuration.
+
+    python -m loadtest.replay --log recordings/traffic.jsonl --out replay.json
+    python -m loadtest.replay --log traffic.jsonl --configs loadtest/configs.example.json --speed 20
+
+A configuration that makes an upstream call the recording lacks (e.g. LLMRouter replayed
+over a NaiveRouter recording) gets an error for that turn, counted under `upstream.misses`;
+--on-miss live sends such calls to the real upstream instead.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Optional
+
+from loadtest.run import BASE_ENV, REPO_ROOT, percentile
+
+# Upstreams are never contacted unless --on-miss live; sessions and recording stay local.
+REPLAY_ENV = {
+    "REDIS_URL": "",
+    "APP_RECORDER__ENABLED": "false",
+    "APP_LOGGING__LEVEL": "WARNING",
+}
+OFFLINE_DEFAULTS = {
+    "APP_ORDER_API__BASE_URL": "http://127.0.0.1:9",
+    "OPENAI_BASE_URL": "http://127.0.0.1:9/v1",
+}
+DECISION_FIELDS = ("intent", "agent", "tools", "response", "status")
+
+
+def load_records(path: str) -> List[Dict[str, Any]]:
+    with open(path, "r", encoding="utf-8") as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    return sorted(records, key=lambda r: r.get("ts", 0.0))
+
+
+def decision(status: int, content: Dict[str, Any]) -> Dict[str, Any]:
+    tool_calls = content.get("tool_calls") or []
+    router = next((tc.get("result") or {} for tc in tool_calls if tc.get("tool") == "Router"), {})
+    return {
+        "intent": router.get("intent"),
+        "agent": content.get("agent"),
+        "tools": [tc.get("tool") for tc in tool_calls if tc.get("tool") != "LLMUsage"],
+        "response": content.get("response"),
+        "status": status,
+    }
+
+
+def recorded_decision(record: Dict[str, Any]) -> Dict[str, Any]:
+    return decision(record.get("status", 200), record)
+
+
+def replay_records(records: List[Dict[str, Any]], speed: float = 0.0, live: bool = False) -> List[Dict[str, Any]]:
+    """Run every record through this process's configuration; one result per record, in order."""
+    import app as service
+    from models import ChatRequest
+    from observability.traffic_recorder import Cassette, replaying
+
+    delay_scale = 1.0 / speed if speed > 0 else 0.0
+    results = []
+    prev_ts = None
+    for record in records:
+        if delay_scale and prev_ts is not None:
+            time.sleep(max(0.0, record.get("ts", prev_ts) - prev_ts) * delay_scale)
+        prev_ts = record.get("ts", prev_ts)
+        cassette = Cassette(record.get("upstream", []), delay_scale=delay_scale, live=live)
+        start = time.perf_counter()
+        with replaying(cassette):
+            status, content = service.handle_chat(
+                ChatRequest(session_id=record["session_id"], message=record["message"]))
+        results.append({
+            "session_id": record["session_id"],
+            "message": record["message"],
+            "latency_ms": round((time.perf_counter() - start) * 1000, 3),
+            "decision": decision(status, content),
+            "upstream": cassette.stats(),
+        })
+    return results
+
+
+def diff(a: List[Dict[str, Any]], b: List[Dict[str, Any]], examples: int) -> Dict[str, Any]:
+    """Field-by-field decision differences between two equally long, aligned result lists."""
+    by_field = {f: 0 for f in DECISION_FIELDS}
+    changed, samples = 0, []
+    for i, (x, y) in enumerate(zip(a, b)):
+        fields = [f for f in DECISION_FIELDS if x["decision"].get(f) != y["decision"].get(f)]
+        if not fields:
+            continue
+        changed += 1
+        for f in fields:
+            by_field[f] += 1
+        if len(samples) < examples:
+            samples.append({"index": i, "session_id": x["session_id"], "message": x["message"],
+                            **{f: [x["decision"].get(f), y["decision"].get(f)] for f in fields}})
+    return {"turns": len(a), "changed": changed, "by_field": by_field, "examples": samples}
+
+
+def latency_summary(latencies: List[float]) -> Dict[str, float]:
+    latencies = sorted(latencies)
+    return {
+        "p50": round(percentile(latencies, 50), 3),
+        "p95": round(percentile(latencies, 95), 3),
+        "p99": round(percentile(latencies, 99), 3),
+        "max": round(latencies[-1], 3) if latencies else 0.0,
+        "mean": round(sum(latencies) / len(latencies), 3) if latencies else 0.0,
+    }
+
+
+def summarize(name: str, env: Dict[str, str], results: List[Dict[str, Any]],
+              recorded: List[Dict[str, Any]], examples: int) -> Dict[str, Any]:
+    statuses: Dict[str, int] = {}
+    for r in results:
+        key = str(r["decision"]["status"])
+        statuses[key] = statuses.get(key, 0) + 1
+    return {
+        "name": name,
+        "env": env,
+        "turns": len(results),
+        "statuses": statuses,
+        "latency_ms": latency_summary([r["latency_ms"] for r in results]),
+        "upstream": {k: sum(r["upstream"][k] for r in results) for k in ("hits", "misses", "unused")},
+        "vs_recorded": diff(recorded, results, examples),
+    }
+
+
+def run_config(config: Dict[str, Any], args: argparse.Namespace) -> List[Dict[str, Any]]:
+    env = {**BASE_ENV, **os.environ}
+    for k, v in OFFLINE_DEFAULTS.items():
+        env.setdefault(k, v)
+    env.update(REPLAY_ENV)
+    env.update(config.get("env", {}))
+    with tempfile.TemporaryDirectory() as tmp:
+        out = os.path.join(tmp, "results.json")
+        cmd = [sys.executable, "-m", "loadtest.replay", "--worker", "--log", args.log,
+               "--speed", str(args.speed), "--on-miss", args.on_miss, "--out", out]
+        subprocess.run(cmd, cwd=REPO_ROOT, env=env, check=True)
+        with open(out, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--log", required=True, help="traffic recorder JSONL")
+    p.add_argument("--configs", help="JSON list of {name, env}, as for loadtest.run (default: current env)")
+    p.add_argument("--speed", type=float, default=0.0,
+                   help="replay at recorded pace divided by this, upstream delays included (0: no waiting)")
+    p.add_argument("--on-miss", choices=["error", "live"], default="error",
+                   help="what to do with upstream calls the recording lacks")
+    p.add_argument("--examples", type=int, default=10, help="differing turns to include per comparison")
+    p.add_argument("--out", help="write the JSON report here (default: stdout)")
+    p.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = p.parse_args(argv)
+
+    abs_log = os.path.abspath(args.log)
+    if args.worker:
+        results = replay_records(load_records(abs_log), speed=args.speed, live=args.on_miss == "live")
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(results, f)
+        return 0
+
+    args.log = abs_log
+    records = load_records(abs_log)
+    recorded = [{"session_id": r["session_id"], "message": r["message"], "decision": recorded_decision(r)}
+                for r in records]
+    configs = [{"name": "current", "env": {}}]
+    if args.configs:
+        with open(args.configs, "r", encoding="utf-8") as f:
+            configs = json.load(f)
+
+    reports, runs = [], []
+    for config in configs:
+        results = run_config(config, args)
+        runs.append(results)
+        reports.append(summarize(config["name"], config.get("env", {}), results, recorded, args.examples))
+        print(f"{config['name']}: p50={reports[-1]['latency_ms']['p50']}ms "
+              f"changed={reports[-1]['vs_recorded']['changed']}/{len(records)}", file=sys.stderr)
+
+    report = {
+        "log": abs_log,
+        "turns": len(records),
+        "speed": args.speed,
+        "recorded": {"latency_ms": latency_summary([r.get("latency_ms", 0.0) for r in records])},
+        "configs": reports,
+        # Every configuration against the first one.
+        "vs_baseline": {c["name"]: diff(runs[0], run, args.examples) for c, run in zip(configs[1:], runs[1:])},
+    }
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
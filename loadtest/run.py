@@ -0,0 +1,248 @@
+"""Load-test the /chat service against local OpenAI and order API stubs.
+
+Each configuration (router / KB / order API settings as env vars, plus stub behaviour)
+gets its own stubs and its own app process, then is driven either closed-loop (N
+concurrent conversations back to back) or open-loop at a fixed request rate. The report
+is JSON: p50/p95/p99 latency, throughput and error rate per configuration.
+
+    python -m loadtest.run --mode closed --concurrency 16 --duration 30 --out loadtest.json
+    python -m loadtest.run --configs loadtest/configs.example.json --mode qps --qps 50 \
+        --max-p99-ms 500 --max-error-rate 0.01   # non-zero exit on breach, for CI
+"""
+import argparse
+import json
+import math
+import os
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+
+from loadtest.scenarios import ConversationMix
+from loadtest.stubs import (
+    LatencySpec,
+    StubBehavior,
+    StubServer,
+    create_openai_stub,
+    create_order_api_stub,
+    free_port,
+)
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+BASE_ENV = {
+    "APP_OPENAI__API_KEY": "sk-loadtest",
+    "APP_MODULES__ROUTER_NAME": "LLMRouter",
+    "APP_MODULES__KB_NAME": "JsonKVKnowledgeBase",
+    "APP_MODULES__ORDER_API_NAME": "OrderAPIBeeceptorClient",
+    "APP_LOGGING__LEVEL": "WARNING",
+}
+
+DEFAULT_CONFIGS = [
+    {"name": "naive-json-local", "env": {"APP_MODULES__ROUTER_NAME": "NaiveRouter",
+                                         "APP_MODULES__ORDER_API_NAME": "OrderAPILocalClient"}},
+    {"name": "ml-json-beeceptor", "env": {"APP_MODULES__ROUTER_NAME": "IntentMLRouter"}},
+    {"name": "llm-json-beeceptor", "env": {"APP_MODULES__ROUTER_NAME": "LLMRouter"}},
+]
+
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    k = max(0, min(len(sorted_values) - 1, math.ceil(p / 100.0 * len(sorted_values)) - 1))
+    return sorted_values[k]
+
+
+def _behavior(spec: Dict[str, Any], default: StubBehavior) -> StubBehavior:
+    if not spec:
+        return default
+    latency = LatencySpec(**spec.get("latency", {})) if "latency" in spec else default.latency
+    return StubBehavior(latency=latency,
+                        error_rate=spec.get("error_rate", default.error_rate),
+                        error_status=spec.get("error_status", default.error_status),
+                        seed=spec.get("seed", default.seed))
+
+
+class AppProcess:
+    """The service under test, as a uvicorn subprocess configured through env vars."""
+
+    def __init__(self, env: Dict[str, str], workers: int = 1):
+        self.port = free_port()
+        self.url = f"http://127.0.0.1:{self.port}"
+        self._env = {**os.environ, **env}
+        self._cmd = [sys.executable, "-m", "uvicorn", "app:app", "--host", "127.0.0.1",
+                     "--port", str(self.port), "--log-level", "warning", "--workers", str(workers)]
+        self._proc: Optional[subprocess.Popen] = None
+
+    def __enter__(self) -> "AppProcess":
+        self._proc = subprocess.Popen(self._cmd, cwd=REPO_ROOT, env=self._env)
+        deadline = time.monotonic() + 60
+        while time.monotonic() < deadline:
+            if self._proc.poll() is not None:
+                raise RuntimeError(f"app exited with code {self._proc.returncode}")
+            try:
+                # /readyz, not /healthz: warmup builds the components after the port opens, and
+                # that cold start must not land in the measured requests.
+                if httpx.get(f"{self.url}/readyz", timeout=1).status_code == 200:
+                    return self
+            except httpx.HTTPError:
+                pass
+            time.sleep(0.1)
+        raise RuntimeError("app did not become ready within 60s")
+
+    def __exit__(self, *exc: Any) -> None:
+        if self._proc and self._proc.poll() is None:
+            self._proc.terminate()
+            try:
+                self._proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self._proc.kill()
+
+
+class Recorder:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples: List[Tuple[float, float, bool]] = []  # (finished_at, latency_s, ok)
+
+    def add(self, latency: float, ok: bool) -> None:
+        with self._lock:
+            self.samples.append((time.monotonic(), latency, ok))
+
+
+def _converse(client: httpx.Client, url: str, turns: List[str], recorder: Recorder, stop_at: float) -> None:
+    session_id = f"lt-{uuid.uuid4().hex[:12]}"
+    for message in turns:
+        if time.monotonic() >= stop_at:
+            return
+        start = time.perf_counter()
+        try:
+            ok = client.post(f"{url}/chat", json={"session_id": session_id, "message": message}).status_code == 200
+        except httpx.HTTPError:
+            ok = False
+        recorder.add(time.perf_counter() - start, ok)
+
+
+def drive(url: str, mode: str, duration: float, concurrency: int, qps: float, seed: int) -> Recorder:
+    recorder = Recorder()
+    mix = ConversationMix(seed=seed)
+    mix_lock = threading.Lock()
+    stop_at = time.monotonic() + duration
+    limits = httpx.Limits(max_connections=max(concurrency, 64), max_keepalive_connections=max(concurrency, 64))
+    with httpx.Client(timeout=30, limits=limits) as client:
+        if mode == "closed":
+            def worker() -> None:
+                while time.monotonic() < stop_at:
+                    with mix_lock:
+                        _, turns = mix.next()
+                    _converse(client, url, turns, recorder, stop_at)
+
+            threads = [threading.Thread(target=worker, daemon=True) for _ in range(concurrency)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+        else:
+            # Open loop: conversations start on a fixed schedule so that turns arrive at ~qps overall.
+            interval = mix.mean_turns() / qps
+            with ThreadPoolExecutor(max_workers=max(concurrency, 256), thread_name_prefix="loadtest") as pool:
+                next_start = time.monotonic()
+                while next_start < stop_at:
+                    time.sleep(max(0.0, next_start - time.monotonic()))
+                    _, turns = mix.next()
+                    pool.submit(_converse, client, url, turns, recorder, stop_at)
+                    next_start += interval
+    return recorder
+
+
+def summarize(name: str, recorder: Recorder, started: float, warmup: float, env: Dict[str, str]) -> Dict[str, Any]:
+    samples = [s for s in recorder.samples if s[0] >= started + warmup]
+    latencies = sorted(lat * 1000 for _, lat, _ in samples)
+    errors = sum(1 for _, _, ok in samples if not ok)
+    window = (max(s[0] for s in samples) - (started + warmup)) if samples else 0.0
+    return {
+        "name": name,
+        "env": env,
+        "requests": len(samples),
+        "errors": errors,
+        "error_rate": round(errors / len(samples), 6) if samples else 0.0,
+        "throughput_rps": round(len(samples) / window, 3) if window > 0 else 0.0,
+        "latency_ms": {
+            "p50": round(percentile(latencies, 50), 3),
+            "p95": round(percentile(latencies, 95), 3),
+            "p99": round(percentile(latencies, 99), 3),
+            "max": round(latencies[-1], 3) if latencies else 0.0,
+            "mean": round(sum(latencies) / len(latencies), 3) if latencies else 0.0,
+        },
+    }
+
+
+def run_config(config: Dict[str, Any], args: argparse.Namespace) -> Dict[str, Any]:
+    default_openai = StubBehavior(LatencySpec(median_ms=args.openai_latency_ms, sigma=args.latency_sigma),
+                                  error_rate=args.openai_error_rate, seed=args.seed)
+    default_orders = StubBehavior(LatencySpec(median_ms=args.order_latency_ms, sigma=args.latency_sigma),
+                                  error_rate=args.order_error_rate, seed=args.seed)
+    openai_stub = create_openai_stub(_behavior(config.get("openai", {}), default_openai))
+    order_stub = create_order_api_stub(_behavior(config.get("order_api", {}), default_orders))
+    with StubServer(openai_stub) as openai_srv, StubServer(order_stub) as order_srv:
+        env = {**BASE_ENV, **config.get("env", {}),
+               "OPENAI_BASE_URL": f"{openai_srv.url}/v1",
+               "APP_ORDER_API__BASE_URL": order_srv.url}
+        with AppProcess(env, workers=config.get("workers", 1)) as app_proc:
+            started = time.monotonic()
+            recorder = drive(app_proc.url, args.mode, args.duration + args.warmup,
+                             args.concurrency, args.qps, args.seed)
+    report = summarize(config["name"], recorder, started, args.warmup, config.get("env", {}))
+    report.update({"mode": args.mode, "concurrency": args.concurrency if args.mode == "closed" else None,
+                   "target_qps": args.qps if args.mode == "qps" else None})
+    return report
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--configs", help="JSON file with a list of {name, env, openai, order_api, workers}")
+    parser.add_argument("--mode", choices=["closed", "qps"], default="closed")
+    parser.add_argument("--concurrency", type=int, default=8, help="concurrent conversations (closed loop)")
+    parser.add_argument("--qps", type=float, default=20.0, help="target request rate (open loop)")
+    parser.add_argument("--duration", type=float, default=20.0, help="measured seconds per configuration")
+    parser.add_argument("--warmup", type=float, default=3.0, help="seconds discarded before measuring")
+    parser.add_argument("--openai-latency-ms", type=float, default=300.0)
+    parser.add_argument("--order-latency-ms", type=float, default=40.0)
+    parser.add_argument("--latency-sigma", type=float, default=0.5, help="lognormal sigma for stub latency")
+    parser.add_argument("--openai-error-rate", type=float, default=0.0)
+    parser.add_argument("--order-error-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="write the JSON report here as well as to stdout")
+    parser.add_argument("--max-p99-ms", type=float, help="fail if any configuration's p99 exceeds this")
+    parser.add_argument("--max-error-rate", type=float, help="fail if any configuration's error rate exceeds this")
+    args = parser.parse_args(argv)
+
+    configs = DEFAULT_CONFIGS
+    if args.configs:
+        with open(args.configs, "r", encoding="utf-8") as f:
+            configs = json.load(f)
+
+    results = [run_config(c, args) for c in configs]
+    report = {"generated_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()), "results": results}
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text)
+
+    failed = [r["name"] for r in results
+              if (args.max_p99_ms is not None and r["latency_ms"]["p99"] > args.max_p99_ms)
+              or (args.max_error_rate is not None and r["error_rate"] > args.max_error_rate)]
+    if failed:
+        print(f"Thresholds exceeded for: {', '.join(failed)}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
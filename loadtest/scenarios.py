@@ -0,0 +1,34 @@
+"""Multi-turn conversation mix used to drive the load test."""
+import random
+from typing import List, Tuple
+
+# (name, weight, turns); {oid}/{oid2} are filled with orders known to the order API stub.
+CONVERSATIONS: List[Tuple[str, float, List[str]]] = [
+    ("track_then_cancel", 0.25, ["Where is my order {oid}?", "Cancel it please"]),
+    ("cancel_direct", 0.15, ["Please cancel {oid}"]),
+    ("track_direct", 0.15, ["Track {oid}"]),
+    ("product_qa", 0.25, ["What is your return policy?", "And what about shipping times?"]),
+    ("multi_order", 0.08, ["Where are {oid} and {oid2}?"]),
+    ("missing_id", 0.07, ["I want to cancel my order", "It's {oid}"]),
+    ("unknown_order", 0.05, ["Track ORD-0001"]),
+]
+
+
+class ConversationMix:
+    def __init__(self, seed: int = 0, order_count: int = 1000):
+        self._rng = random.Random(seed)
+        self._order_count = order_count
+        self._weights = [w for _, w, _ in CONVERSATIONS]
+
+    def _order_id(self) -> str:
+        return f"ORD-{1000 + self._rng.randrange(self._order_count):04d}"
+
+    def next(self) -> Tuple[str, List[str]]:
+        name, _, turns = self._rng.choices(CONVERSATIONS, weights=self._weights)[0]
+        oid, oid2 = self._order_id(), self._order_id()
+        return name, [t.format(oid=oid, oid2=oid2) for t in turns]
+
+    @staticmethod
+    def mean_turns() -> float:
+        total = sum(w for _, w, _ in CONVERSATIONS)
+        return sum(w * len(turns) for _, w, turns in CONVERSATIONS) / total
@@ -0,0 +1,241 @@
+"""Local stand-ins for the OpenAI API and the Beeceptor order API.
+
+Both are small FastAPI apps with a configurable latency distribution and error rate, run
+in-process with uvicorn so the app under test talks to them over real HTTP.
+"""
+import asyncio
+import hashlib
+import math
+import random
+import re
+import socket
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+from routers.naive_router import NaiveRouter
+
+ORDER_ID_RE = re.compile(r"ORD-\d{4}")
+
+
+@dataclass
+class LatencySpec:
+    """Per-request latency: `fixed` (median_ms), `uniform` (min_ms..max_ms) or `lognormal` (median_ms, sigma)."""
+
+    kind: str = "lognormal"
+    median_ms: float = 50.0
+    sigma: float = 0.5
+    min_ms: float = 0.0
+    max_ms: float = 0.0
+
+    def sample_seconds(self, rng: random.Random) -> float:
+        if self.kind == "fixed":
+            ms = self.median_ms
+        elif self.kind == "uniform":
+            ms = rng.uniform(self.min_ms, self.max_ms)
+        elif self.kind == "lognormal":
+            ms = rng.lognormvariate(math.log(max(self.median_ms, 1e-3)), self.sigma)
+        else:
+            raise ValueError(f"unknown latency kind: {self.kind}")
+        return max(0.0, ms) / 1000.0
+
+
+@dataclass
+class StubBehavior:
+    latency: LatencySpec = field(default_factory=LatencySpec)
+    error_rate: float = 0.0  # fraction of requests answered with `error_status`
+    error_status: int = 500
+    seed: Optional[int] = None
+
+    def __post_init__(self):
+        self._rng = random.Random(self.seed)
+
+    async def apply(self) -> Optional[JSONResponse]:
+        """Sleep for a sampled latency; return an error response for a sampled fraction of calls."""
+        await asyncio.sleep(self.latency.sample_seconds(self._rng))
+        if self.error_rate and self._rng.random() < self.error_rate:
+            return JSONResponse(status_code=self.error_status,
+                                content={"error": {"message": "injected failure", "type": "stub_error"}})
+        return None
+
+
+def _tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+def _embedding(text: str, dim: int) -> List[float]:
+    # Deterministic pseudo-embedding: identical texts map to identical unit vectors.
+    seed = int.from_bytes(hashlib.sha256(text.encode()).digest()[:8], "big")
+    rng = random.Random(seed)
+    vec = [rng.gauss(0.0, 1.0) for _ in range(dim)]
+    norm = math.sqrt(sum(v * v for v in vec)) or 1.0
+    return [v / norm for v in vec]
+
+
+def create_openai_stub(behavior: StubBehavior, embedding_dim: int = 64) -> FastAPI:
+    stub = FastAPI(title="OpenAI stub")
+    stub.state.calls = {"chat": 0, "responses": 0, "embeddings": 0}
+
+    @stub.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        stub.state.calls["chat"] += 1
+        body = await request.json()
+        if (err := await behavior.apply()) is not None:
+            return err
+        user_text = " ".join(m.get("content", "") for m in body.get("messages", []) if m.get("role") == "user")
+        message = user_text.split("Message:", 1)[-1].split("Rules:", 1)[0]
+        intent, _, _ = NaiveRouter.route(message)
+        prompt_tokens = _tokens(" ".join(m.get("content", "") for m in body.get("messages", [])))
+        return {
+            "id": "chatcmpl-stub",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": f'{{"intent": "{intent}"}}'},
+                "finish_reason": "stop",
+            }],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": 6, "total_tokens": prompt_tokens + 6},
+        }
+
+    @stub.post("/v1/responses")
+    async def responses(request: Request):
+        stub.state.calls["responses"] += 1
+        body = await request.json()
+        if (err := await behavior.apply()) is not None:
+            return err
+        prompt = body.get("input") if isinstance(body.get("input"), str) else str(body.get("input"))
+        ids = ORDER_ID_RE.findall(prompt)
+        resolved = ids[-1] if ids else None
+        text = (f'{{"id": "{resolved}", "confidence": 0.9, "reasoning": "stub: latest order id in context"}}'
+                if resolved else '{"id": null, "confidence": 0.0, "reasoning": "stub: no order in context"}')
+        input_tokens = _tokens(prompt)
+        return {
+            "id": "resp-stub",
+            "object": "response",
+            "created_at": int(time.time()),
+            "model": body.get("model"),
+            "status": "completed",
+            "output": [{
+                "type": "message",
+                "id": "msg-stub",
+                "role": "assistant",
+                "status": "completed",
+                "content": [{"type": "output_text", "text": text, "annotations": []}],
+            }],
+            "usage": {
+                "input_tokens": input_tokens,
+                "output_tokens": _tokens(text),
+                "total_tokens": input_tokens + _tokens(text),
+                "input_tokens_details": {"cached_tokens": 0},
+                "output_tokens_details": {"reasoning_tokens": 0},
+            },
+        }
+
+    @stub.post("/v1/embeddings")
+    async def embeddings(request: Request):
+        stub.state.calls["embeddings"] += 1
+        body = await request.json()
+        if (err := await behavior.apply()) is not None:
+            return err
+        texts = body.get("input")
+        texts = [texts] if isinstance(texts, str) else list(texts)
+        tokens = sum(_tokens(t) for t in texts)
+        return {
+            "object": "list",
+            "model": body.get("model"),
+            "data": [{"object": "embedding", "index": i, "embedding": _embedding(t, embedding_dim)}
+                     for i, t in enumerate(texts)],
+            "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+        }
+
+    return stub
+
+
+def seed_orders(n: int = 1000) -> Dict[str, Dict[str, Any]]:
+    """ORD-1000.. with a mix of recent (cancellable) and older orders in several states."""
+    now = datetime.now(timezone.utc)
+    statuses = ["processing", "shipped", "out_for_delivery", "delivered"]
+    orders = {}
+    for i in range(n):
+        order_id = f"ORD-{1000 + i:04d}"
+        placed = now - (timedelta(hours=2) if i % 3 == 0 else timedelta(days=2))
+        orders[order_id] = {
+            "orderId": order_id,
+            "placed_at": placed.isoformat(),
+            "status": statuses[i % len(statuses)],
+            "eta": (now + timedelta(days=1 + i % 4)).date().isoformat(),
+        }
+    return orders
+
+
+def create_order_api_stub(behavior: StubBehavior, orders: Optional[Dict[str, Dict[str, Any]]] = None) -> FastAPI:
+    stub = FastAPI(title="Order API stub")
+    orders = orders if orders is not None else seed_orders()
+    not_found = {"status": "not_found", "reason": "order not found"}
+
+    @stub.get("/orders/{order_id}")
+    async def get_order(order_id: str):
+        if (err := await behavior.apply()) is not None:
+            return err
+        order = orders.get(order_id)
+        return order if order else JSONResponse(status_code=404, content=not_found)
+
+    @stub.get("/orders/{order_id}/track")
+    async def track_order(order_id: str):
+        if (err := await behavior.apply()) is not None:
+            return err
+        order = orders.get(order_id)
+        if not order:
+            return JSONResponse(status_code=404, content=not_found)
+        return {"status": order["status"], "eta": order["eta"]}
+
+    @stub.post("/orders/{order_id}/cancel")
+    async def cancel_order(order_id: str):
+        if (err := await behavior.apply()) is not None:
+            return err
+        order = orders.get(order_id)
+        if not order:
+            return JSONResponse(status_code=404, content=not_found)
+        placed_at = datetime.fromisoformat(order["placed_at"])
+        if datetime.now(timezone.utc) - placed_at > timedelta(hours=24):
+            return {"status": "ineligible", "reason": ">24h window", "order": order}
+        return {"status": "cancelled", "refunded": True, "order": order}
+
+    return stub
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class StubServer:
+    """Runs an ASGI app with uvicorn on a background thread."""
+
+    def __init__(self, app: FastAPI, port: Optional[int] = None):
+        self.port = port or free_port()
+        self.url = f"http://127.0.0.1:{self.port}"
+        self._server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=self.port, log_level="warning"))
+        self._thread = threading.Thread(target=self._server.run, name=f"stub-{self.port}", daemon=True)
+
+    def __enter__(self) -> "StubServer":
+        self._thread.start()
+        deadline = time.monotonic() + 10
+        while not self._server.started:
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"stub server on port {self.port} did not start")
+            time.sleep(0.01)
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self._server.should_exit = True
+        self._thread.join(timeout=5)
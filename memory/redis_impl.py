@@ -10,6 +10,7 @@ except Exception:
     redis = None
 
 from config import UTC, REDIS_URL
+from observability import traced
 
 
 class SessionStore:
@@ -31,6 +32,7 @@ class SessionStore:
         else:
             self._mem: Dict[str, Dict[str, Any]] = {}
 
+    @traced("session_store.get")
     def get(self, session_id: str) -> Dict[str, Any]:
         if self._use_redis:
             raw = self._r.get(f"sess:{session_id}")
@@ -44,6 +46,7 @@ class SessionStore:
                 self._mem[session_id] = {"session_id": session_id, "history": [], "created_at": datetime.now(UTC).isoformat()}
             return self._mem[session_id]
 
+    @traced("session_store.set")
     def set(self, session_id: str, state: Dict[str, Any]) -> None:
         state["updated_at"] = datetime.now(UTC).isoformat()
         if self._use_redis:
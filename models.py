@@ -21,16 +21,34 @@ class ChatResponse(BaseModel):
     handover: str
 
 
+class ChatBatchRequest(BaseModel):
+    items: List[ChatRequest] = Field(..., description="Turns to process; order is kept within each session")
+
+
+class ChatBatchItem(BaseModel):
+    index: int
+    session_id: str
+    status: int
+    latency_ms: float
+    response: Optional[ChatResponse] = None
+    error: Optional[str] = None
+
+
+class ChatBatchResponse(BaseModel):
+    results: List[ChatBatchItem]
+
+
 @dataclass(frozen=True)
 class OrderCancellationResult:
     status: str
     refunded: Optional[str] = None
     reason: Optional[str] = None
+    order: Optional[Dict[str, Any]] = None
 
     @staticmethod
-    def success(status: str, refunded: str) -> "OrderCancellationResult":
-        return OrderCancellationResult(status=status, refunded=refunded, reason=None)
+    def success(status: str, refunded: str, order: Optional[Dict[str, Any]] = None) -> "OrderCancellationResult":
+        return OrderCancellationResult(status=status, refunded=refunded, reason=None, order=order)
 
     @staticmethod
-    def failure(status: str, reason: str) -> "OrderCancellationResult":
-        return OrderCancellationResult(status=status, refunded=None, reason=reason)
+    def failure(status: str, reason: str, order: Optional[Dict[str, Any]] = None) -> "OrderCancellationResult":
+        return OrderCancellationResult(status=status, refunded=None, reason=reason, order=order)
@@ -0,0 +1 @@
+from observability.tracing import span, traced, start_trace, current_trace, Trace
@@ -0,0 +1,179 @@
+import functools
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from prometheus_client import Counter
+
+from config.settings import settings
+
+openai_cfg = settings.openai
+
+LLM_CALLS = Counter(
+    "llm_calls_total",
+    "Logical LLM calls (after retries), by call site, model, intent and outcome",
+    ["call_site", "model", "intent", "outcome"],
+)
+LLM_TOKENS = Counter(
+    "llm_tokens_total",
+    "Tokens billed by OpenAI, by call site, model, intent and kind (prompt, completion, embedding)",
+    ["call_site", "model", "intent", "kind"],
+)
+LLM_RETRIES = Counter(
+    "llm_retries_total",
+    "Extra attempts made after a failed LLM attempt",
+    ["call_site", "model", "intent"],
+)
+LLM_COST = Counter(
+    "llm_cost_usd_total",
+    "Estimated LLM spend in USD from openai.token_prices_per_million",
+    ["call_site", "model", "intent"],
+)
+
+_current_intent: ContextVar[Optional[str]] = ContextVar("llm_intent", default=None)
+_current_call: ContextVar[Optional["LLMCall"]] = ContextVar("llm_call", default=None)
+_current_ledger: ContextVar[Optional[List[Dict[str, Any]]]] = ContextVar("llm_ledger", default=None)
+
+
+def estimate_cost(model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    input_price, output_price = (list(openai_cfg.token_prices_per_million.get(model, [])) + [0.0, 0.0])[:2]
+    return (prompt_tokens * input_price + completion_tokens * output_price) / 1_000_000
+
+
+class LLMCall:
+    """Token, retry and outcome accounting for one logical LLM call (all of its attempts)."""
+
+    def __init__(self, call_site: str, model: str):
+        self.call_site = call_site
+        self.model = model
+        self.intent: Optional[str] = _current_intent.get()
+        self.attempts = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.embedding_tokens = 0
+        self.estimated_prompt_tokens: Optional[int] = None  # local estimate of the prompt as built
+        self.outcome = "error"
+
+    def add_usage(self, usage: Any) -> None:
+        """Add one API response's `usage` block (chat, responses and embeddings shapes)."""
+        if usage is None:
+            return
+        prompt = getattr(usage, "prompt_tokens", None)
+        if prompt is None:
+            prompt = getattr(usage, "input_tokens", 0)
+        completion = getattr(usage, "completion_tokens", None)
+        if completion is None:
+            completion = getattr(usage, "output_tokens", 0)
+        if self.call_site == "embed":
+            self.embedding_tokens += prompt or 0
+        else:
+            self.prompt_tokens += prompt or 0
+            self.completion_tokens += completion or 0
+
+    @property
+    def retries(self) -> int:
+        return max(0, self.attempts - 1)
+
+    @property
+    def cost_usd(self) -> float:
+        return estimate_cost(self.model, self.prompt_tokens + self.embedding_tokens, self.completion_tokens)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "call_site": self.call_site,
+            "model": self.model,
+            "intent": self.intent,
+            "outcome": self.outcome,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "embedding_tokens": self.embedding_tokens,
+            "estimated_prompt_tokens": self.estimated_prompt_tokens,
+            "retries": self.retries,
+            "cost_usd": round(self.cost_usd, 8),
+        }
+
+    def record(self) -> None:
+        labels = {"call_site": self.call_site, "model": self.model, "intent": self.intent or "unknown"}
+        LLM_CALLS.labels(outcome=self.outcome, **labels).inc()
+        for kind, n in (("prompt", self.prompt_tokens), ("completion", self.completion_tokens),
+                        ("embedding", self.embedding_tokens)):
+            if n:
+                LLM_TOKENS.labels(kind=kind, **labels).inc(n)
+        if self.retries:
+            LLM_RETRIES.labels(**labels).inc(self.retries)
+        LLM_COST.labels(**labels).inc(self.cost_usd)
+        ledger = _current_ledger.get()
+        if ledger is not None:
+            ledger.append(self.as_dict())
+
+
+def current_llm_call() -> Optional[LLMCall]:
+    return _current_call.get()
+
+
+def accounted(call_site: str, model: str) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+    """Account every call of the decorated OpenAIClient method as one logical LLM call.
+
+    Attempts and token usage are added by the method through `current_llm_call()`. The
+    outcome is "error" when it raises or returns a result with `err` set, "rejected" when
+    no upstream attempt was made (e.g. the breaker was open), otherwise "ok".
+    """
+
+    def decorator(fn: Callable[..., Any]) -> Callable[..., Any]:
+        @functools.wraps(fn)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            call = LLMCall(call_site, model)
+            token = _current_call.set(call)
+            try:
+                result = fn(*args, **kwargs)
+                call.outcome = "error" if getattr(result, "err", None) else "ok"
+                call.intent = getattr(result, "intent", None) or call.intent
+                return result
+            except Exception:
+                call.outcome = "error"
+                raise
+            finally:
+                _current_call.reset(token)
+                if call.attempts == 0:
+                    call.outcome = "rejected"
+                call.record()
+
+        return wrapper
+
+    return decorator
+
+
+@contextmanager
+def usage_ledger() -> Iterator[List[Dict[str, Any]]]:
+    """Collect every LLM call made in this context, e.g. for one chat request."""
+    ledger: List[Dict[str, Any]] = []
+    token = _current_ledger.set(ledger)
+    try:
+        yield ledger
+    finally:
+        _current_ledger.reset(token)
+
+
+@contextmanager
+def intent_scope(intent: Optional[str] = None) -> Iterator[None]:
+    """Label LLM calls made in this context with the routed intent; `set_intent` updates it."""
+    token = _current_intent.set(intent)
+    try:
+        yield
+    finally:
+        _current_intent.reset(token)
+
+
+def set_intent(intent: Optional[str]) -> None:
+    _current_intent.set(intent)
+
+
+def summarize(ledger: List[Dict[str, Any]]) -> Dict[str, Any]:
+    return {
+        "calls": ledger,
+        "prompt_tokens": sum(c["prompt_tokens"] for c in ledger),
+        "completion_tokens": sum(c["completion_tokens"] for c in ledger),
+        "embedding_tokens": sum(c["embedding_tokens"] for c in ledger),
+        "retries": sum(c["retries"] for c in ledger),
+        "cost_usd": round(sum(c["cost_usd"] for c in ledger), 8),
+    }
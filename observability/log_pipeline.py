@@ -0,0 +1,105 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import time
+from typing import Dict, Optional
+
+from prometheus_client import Counter
+
+try:
+    import orjson
+except Exception:
+    orjson = None
+
+LOG_DROPPED = Counter(
+    "log_records_dropped_total",
+    "Log records dropped before being written, by level and reason (sampled, queue_full)",
+    ["level", "reason"],
+)
+
+
+def dumps(obj: Dict) -> str:
+    if orjson is not None:
+        return orjson.dumps(obj, default=str).decode()
+    return json.dumps(obj, default=str, separators=(",", ":"), ensure_ascii=False)
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        base = {
+            "level": record.levelname,
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(record.created)),
+            "msg": record.getMessage(),
+            "logger": record.name,
+        }
+        if hasattr(record, "extra_data"):
+            base.update(getattr(record, "extra_data"))
+        if record.exc_text:
+            base["exc"] = record.exc_text
+        elif record.exc_info:
+            base["exc"] = self.formatException(record.exc_info)
+        return dumps(base)
+
+
+class SamplingQueueHandler(logging.handlers.QueueHandler):
+    """Hands records to a background listener; never blocks the caller.
+
+    Records are sampled per level (`sample_rates`, default 1.0) and dropped — and counted —
+    when the bounded queue is full.
+    """
+
+    def __init__(self, log_queue: "queue.Queue[logging.LogRecord]", sample_rates: Optional[Dict[str, float]] = None):
+        super().__init__(log_queue)
+        self.sample_rates = {k.upper(): v for k, v in (sample_rates or {}).items()}
+
+    def emit(self, record: logging.LogRecord) -> None:
+        rate = self.sample_rates.get(record.levelname, 1.0)
+        if rate < 1.0 and random.random() >= rate:
+            LOG_DROPPED.labels(level=record.levelname, reason="sampled").inc()
+            return
+        super().emit(record)
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Only what can't safely cross threads is resolved here; JSON encoding happens in the listener.
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOG_DROPPED.labels(level=record.levelname, reason="queue_full").inc()
+
+
+def setup_logging(logger: logging.Logger, cfg) -> Optional[logging.handlers.QueueListener]:
+    """Attach JSON output to `logger`, through a queue and background listener when `cfg.async_logging`."""
+    stream_handler = logging.StreamHandler(sys.stderr)
+    stream_handler.setFormatter(JsonFormatter())
+    logger.setLevel(cfg.level)
+    logger.propagate = False
+    if not cfg.async_logging:
+        logger.addHandler(stream_handler)
+        return None
+
+    log_queue: "queue.Queue[logging.LogRecord]" = queue.Queue(maxsize=cfg.queue_size)
+    logger.addHandler(SamplingQueueHandler(log_queue, cfg.sample_rates))
+    listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+    # The listener thread does not survive a fork (gunicorn --preload): start a new one in the child.
+    os.register_at_fork(after_in_child=lambda: _restart(listener))
+    return listener
+
+
+def _restart(listener: logging.handlers.QueueListener) -> None:
+    listener._thread = None
+    listener.start()
@@ -0,0 +1,176 @@
+"""Approximate per-component memory gauges and tracemalloc snapshot diffs.
+
+Gauges are computed when /metrics is scraped (at most every `min_interval` seconds), so
+nothing runs per request. Sizes are estimates: a bounded walk of each component's object
+graph with `sys.getsizeof`, sampling large containers and extrapolating.
+"""
+import itertools
+import logging
+import sys
+import threading
+import time
+import tracemalloc
+import types
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from prometheus_client.core import GaugeMetricFamily
+
+# Shared by many objects, or not owned by the component pointing at them.
+_SKIP_TYPES = (type, types.ModuleType, types.FunctionType, types.BuiltinFunctionType, types.MethodType,
+               logging.Logger, type(threading.Lock()), threading.Thread, threading.Event)
+
+
+def approx_size(root: Any, sample_items: int = 200, max_objects: int = 200_000) -> int:
+    """Estimated bytes reachable from `root`, each object counted once.
+
+    Containers larger than `sample_items` are sampled evenly and their children weighted up;
+    the walk stops after `max_objects` objects.
+    """
+    seen = set()
+    total = 0.0
+    stack: List[Tuple[Any, float]] = [(root, 1.0)]
+    visited = 0
+    while stack and visited < max_objects:
+        obj, weight = stack.pop()
+        if id(obj) in seen or isinstance(obj, _SKIP_TYPES):
+            continue
+        seen.add(id(obj))
+        visited += 1
+        try:
+            total += sys.getsizeof(obj) * weight
+        except TypeError:
+            continue
+        if isinstance(obj, (str, bytes, bytearray, int, float, bool)) or obj is None:
+            continue
+        if hasattr(obj, "nbytes") and hasattr(obj, "dtype"):
+            continue  # numpy arrays: getsizeof already includes owned data
+        if isinstance(obj, dict):
+            children: List[Any] = list(itertools.chain.from_iterable(obj.items()))
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            children = list(obj)
+        else:
+            children = []
+            if hasattr(obj, "__dict__"):
+                children.append(obj.__dict__)
+            for slot in getattr(type(obj), "__slots__", ()):
+                if hasattr(obj, slot):
+                    children.append(getattr(obj, slot))
+        if len(children) > sample_items:
+            step = len(children) / sample_items
+            weight *= step
+            children = [children[int(i * step)] for i in range(sample_items)]
+        stack.extend((child, weight) for child in children)
+    return int(total)
+
+
+class MemoryCollector:
+    """Prometheus collector for component sizes, session count and cache entry counts."""
+
+    def __init__(self, min_interval: float = 15.0, sample_items: int = 200, max_objects: int = 200_000):
+        self.min_interval = min_interval
+        self.sample_items = sample_items
+        self.max_objects = max_objects
+        self._components: Dict[str, Callable[[], Any]] = {}
+        self._entries: Dict[str, Callable[[], int]] = {}
+        self._lock = threading.Lock()
+        self._cached: Optional[Dict[str, Any]] = None
+        self._cached_at = 0.0
+
+    def track(self, component: str, get_object: Callable[[], Any]) -> None:
+        """Report the approximate bytes reachable from `get_object()` as `component`."""
+        self._components[component] = get_object
+
+    def track_entries(self, cache: str, count: Callable[[], int]) -> None:
+        """Report `count()` as the number of entries held by `cache`."""
+        self._entries[cache] = count
+
+    def snapshot(self, force: bool = False) -> Dict[str, Any]:
+        with self._lock:
+            if not force and self._cached is not None and time.monotonic() - self._cached_at < self.min_interval:
+                return self._cached
+            start = time.perf_counter()
+            out: Dict[str, Any] = {"component_bytes": {}, "cache_entries": {}}
+            for name, get_object in self._components.items():
+                obj = get_object()
+                if obj is not None:
+                    out["component_bytes"][name] = approx_size(obj, self.sample_items, self.max_objects)
+            for name, count in self._entries.items():
+                out["cache_entries"][name] = int(count())
+            out["collect_seconds"] = round(time.perf_counter() - start, 6)
+            self._cached, self._cached_at = out, time.monotonic()
+            return out
+
+    def collect(self) -> Iterable[GaugeMetricFamily]:
+        snap = self.snapshot()
+        component_bytes = GaugeMetricFamily(
+            "app_memory_component_bytes", "Approximate bytes held by each component", labels=["component"])
+        for name, value in snap["component_bytes"].items():
+            component_bytes.add_metric([name], value)
+        yield component_bytes
+        cache_entries = GaugeMetricFamily(
+            "app_cache_entries", "Entries held by each cache, queue or in-memory store", labels=["cache"])
+        for name, value in snap["cache_entries"].items():
+            cache_entries.add_metric([name], value)
+        yield cache_entries
+        yield GaugeMetricFamily("app_memory_collect_seconds", "Time taken by the last memory gauge collection",
+                                value=snap["collect_seconds"])
+
+
+class TracemallocSnapshots:
+    """Numbered tracemalloc snapshots (tracing starts with the first one) and diffs between them."""
+
+    def __init__(self, frames: int = 1, max_snapshots: int = 10):
+        self.frames = frames
+        self.max_snapshots = max_snapshots
+        self._snapshots: Dict[int, Tuple[float, tracemalloc.Snapshot]] = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._started_here = False
+
+    def take(self) -> Dict[str, Any]:
+        with self._lock:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(self.frames)
+                self._started_here = True
+            snap = tracemalloc.take_snapshot().filter_traces((
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+                tracemalloc.Filter(False, "<unknown>"),
+            ))
+            snapshot_id = next(self._ids)
+            self._snapshots[snapshot_id] = (time.time(), snap)
+            while len(self._snapshots) > self.max_snapshots:
+                self._snapshots.pop(min(self._snapshots))
+            return {"id": snapshot_id, **self.status()}
+
+    def diff(self, since: int, until: Optional[int] = None, limit: int = 25,
+             group_by: str = "lineno") -> List[Dict[str, Any]]:
+        """Top allocation sites by growth from snapshot `since` to `until` (a new snapshot when None)."""
+        if until is None:
+            until = self.take()["id"]
+        with self._lock:
+            if since not in self._snapshots or until not in self._snapshots:
+                raise KeyError(f"unknown snapshot; have {sorted(self._snapshots)}")
+            old, new = self._snapshots[since][1], self._snapshots[until][1]
+        stats = new.compare_to(old, group_by)
+        return [{
+            "where": "\n".join(s.traceback.format()) if group_by == "traceback" else str(s.traceback),
+            "size_diff": s.size_diff,
+            "size": s.size,
+            "count_diff": s.count_diff,
+            "count": s.count,
+        } for s in stats[:limit]]
+
+    def status(self) -> Dict[str, Any]:
+        tracing = tracemalloc.is_tracing()
+        current, peak = tracemalloc.get_traced_memory() if tracing else (0, 0)
+        return {"tracing": tracing, "traced_bytes": current, "traced_peak_bytes": peak,
+                "snapshots": [{"id": i, "taken_at": ts} for i, (ts, _) in sorted(self._snapshots.items())]}
+
+    def reset(self) -> None:
+        """Drop all snapshots, and stop tracing if it was started here."""
+        with self._lock:
+            self._snapshots.clear()
+            if self._started_here and tracemalloc.is_tracing():
+                tracemalloc.stop()
+            self._started_here = False
@@ -0,0 +1,148 @@
+"""On-demand CPU profiling: one request (cProfile or stack sampling) or the whole process.
+
+Sampling reads `sys._current_frames()` from a background thread, so the profiled code runs
+unmodified; output is collapsed stacks (`root;caller;leaf count`), the input format of
+flamegraph.pl, speedscope and similar tools.
+"""
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+import uuid
+from collections import Counter as Tally
+from typing import Any, Dict, Iterable, Optional, Set
+
+from prometheus_client import Counter
+
+PROFILES = Counter(
+    "profiles_total",
+    "Profiles taken, by kind (request_cprofile, request_sample, process)",
+    ["kind"],
+)
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    """Samples the stacks of `thread_ids` (all other threads when None) every `interval` seconds,
+    starting right away: even a run shorter than `interval` gets one sample."""
+
+    def __init__(self, interval: float = 0.005, thread_ids: Optional[Iterable[int]] = None):
+        self.interval = interval
+        self.thread_ids: Optional[Set[int]] = set(thread_ids) if thread_ids is not None else None
+        self.stacks: Tally = Tally()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        while True:
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own or (self.thread_ids is not None and ident not in self.thread_ids):
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame))
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+            if self._stop.wait(self.interval):
+                break
+
+    def start(self) -> "StackSampler":
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+def profile_process(seconds: float, interval: float = 0.005) -> StackSampler:
+    """Sample every thread of this process for `seconds`; blocks the calling thread meanwhile."""
+    sampler = StackSampler(interval).start()
+    try:
+        time.sleep(seconds)
+    finally:
+        sampler.stop()
+    PROFILES.labels(kind="process").inc()
+    return sampler
+
+
+class RequestProfiler:
+    """Profiles the calling thread between start() and stop().
+
+    mode "cprofile" is deterministic (every call, noticeable overhead); "sample" takes stack
+    samples of this thread every `interval` seconds. cProfile cannot run while another
+    profiler is active in the process, in which case sampling is used instead.
+    """
+
+    def __init__(self, mode: str = "cprofile", interval: float = 0.001, top: int = 30,
+                 store_dir: Optional[str] = None):
+        self.mode = mode
+        self.interval = interval
+        self.top = top
+        self.store_dir = store_dir
+        self._profile: Optional[cProfile.Profile] = None
+        self._sampler: Optional[StackSampler] = None
+        self._started = 0.0
+        self._elapsed = 0.0
+
+    def start(self) -> "RequestProfiler":
+        self._started = time.perf_counter()
+        if self.mode == "cprofile":
+            try:
+                self._profile = cProfile.Profile()
+                self._profile.enable()
+                return self
+            except ValueError:
+                self._profile = None
+                self.mode = "sample"
+        self._sampler = StackSampler(self.interval, thread_ids=[threading.get_ident()]).start()
+        return self
+
+    def stop(self) -> None:
+        self._elapsed = time.perf_counter() - self._started
+        if self._profile is not None:
+            self._profile.disable()
+        if self._sampler is not None:
+            self._sampler.stop()
+        PROFILES.labels(kind=f"request_{self.mode}").inc()
+
+    def result(self) -> Dict[str, Any]:
+        """JSON-able profile; with `store_dir` the full profile is also written there."""
+        out: Dict[str, Any] = {"mode": self.mode, "elapsed_ms": round(self._elapsed * 1000, 3)}
+        path = os.path.join(self.store_dir, f"{uuid.uuid4().hex}") if self.store_dir else None
+        if path:
+            os.makedirs(self.store_dir, exist_ok=True)
+        if self._profile is not None:
+            buf = io.StringIO()
+            pstats.Stats(self._profile, stream=buf).sort_stats("cumulative").print_stats(self.top)
+            out["stats"] = buf.getvalue()
+            if path:
+                path += ".prof"
+                self._profile.dump_stats(path)
+        else:
+            out["samples"] = self._sampler.samples
+            out["collapsed"] = self._sampler.collapsed()
+            if path:
+                path += ".collapsed"
+                with open(path, "w", encoding="utf-8") as f:
+                    f.write(out["collapsed"])
+        if path:
+            out["path"] = path
+        return out
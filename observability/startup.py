@@ -0,0 +1,53 @@
+"""Startup warmup phases and readiness.
+
+Heavy components (KB index, router model, upstream clients) are built during warmup, each as
+a timed phase; /readyz reports ready only once every phase has finished.
+"""
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+
+from prometheus_client import Gauge
+
+STARTUP_PHASE_SECONDS = Gauge("app_startup_phase_seconds", "Time taken by each startup warmup phase", ["phase"])
+APP_READY = Gauge("app_ready", "1 once startup warmup has finished, else 0")
+
+
+class Readiness:
+    """Timings of the warmup phases run so far, and whether warmup has finished (or failed)."""
+
+    def __init__(self):
+        self.phases: Dict[str, float] = {}
+        self.ready = False
+        self.error: Optional[str] = None
+        self._started = time.perf_counter()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        yield
+        seconds = time.perf_counter() - start
+        with self._lock:
+            self.phases[name] = round(seconds, 6)
+        STARTUP_PHASE_SECONDS.labels(phase=name).set(seconds)
+
+    def mark_ready(self) -> None:
+        with self._lock:
+            self.ready, self.error = True, None
+            self.phases["total"] = round(time.perf_counter() - self._started, 6)
+        STARTUP_PHASE_SECONDS.labels(phase="total").set(self.phases["total"])
+        APP_READY.set(1)
+
+    def mark_failed(self, exc: BaseException) -> None:
+        with self._lock:
+            self.ready, self.error = False, f"{type(exc).__name__}: {exc}"
+        APP_READY.set(0)
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"ready": self.ready, "error": self.error, "phases": dict(self.phases)}
+
+
+STARTUP = Readiness()
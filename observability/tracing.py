@@ -0,0 +1,107 @@
+import functools
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from prometheus_client import Histogram
+
+# Sub-millisecond in-process work (routers, KB lookups, session store) up to slow LLM calls.
+STAGE_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+STAGE_LATENCY = Histogram(
+    "chat_stage_seconds",
+    "Latency of each /chat stage in seconds",
+    ["stage", "outcome"],
+    buckets=STAGE_BUCKETS,
+)
+
+_current_trace: ContextVar[Optional["Trace"]] = ContextVar("current_trace", default=None)
+_current_span: ContextVar[Optional[str]] = ContextVar("current_span", default=None)
+
+
+class Trace:
+    """Spans collected for one request, in OpenTelemetry JSON span shape."""
+
+    def __init__(self, trace_id: Optional[str] = None):
+        self.trace_id = trace_id or uuid.uuid4().hex
+        self._spans: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+
+    def add(self, span: Dict[str, Any]) -> None:
+        with self._lock:
+            self._spans.append(span)
+
+    def export(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return sorted(self._spans, key=lambda s: s["startTimeUnixNano"])
+
+
+@contextmanager
+def start_trace(trace_id: Optional[str] = None) -> Iterator[Trace]:
+    """Collect every span opened in this context (and contexts copied from it) into one Trace."""
+    trace = Trace(trace_id)
+    trace_token = _current_trace.set(trace)
+    span_token = _current_span.set(None)
+    try:
+        yield trace
+    finally:
+        _current_span.reset(span_token)
+        _current_trace.reset(trace_token)
+
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+
+@contextmanager
+def span(stage: str, **attributes: Any) -> Iterator[Dict[str, Any]]:
+    """Time a stage into `chat_stage_seconds` and, inside a trace, record it as a span.
+
+    The yielded dict is the span's attributes; callers may add to it.
+    """
+    span_id = os.urandom(8).hex()
+    parent_id = _current_span.get()
+    token = _current_span.set(span_id)
+    start_ns = time.time_ns()
+    t0 = time.perf_counter()
+    outcome = "ok"
+    try:
+        yield attributes
+    except BaseException:
+        outcome = "error"
+        raise
+    finally:
+        elapsed = time.perf_counter() - t0
+        _current_span.reset(token)
+        STAGE_LATENCY.labels(stage=stage, outcome=outcome).observe(elapsed)
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.add({
+                "traceId": trace.trace_id,
+                "spanId": span_id,
+                "parentSpanId": parent_id,
+                "name": stage,
+                "startTimeUnixNano": start_ns,
+                "endTimeUnixNano": start_ns + int(elapsed * 1e9),
+                "attributes": {k: v for k, v in attributes.items() if v is not None},
+                "status": {"code": "STATUS_CODE_ERROR" if outcome == "error" else "STATUS_CODE_OK"},
+            })
+
+
+def traced(stage: str) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+    """Decorator form of `span`; for methods the span records the implementing class."""
+
+    def decorator(fn: Callable[..., Any]) -> Callable[..., Any]:
+        @functools.wraps(fn)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            component = type(args[0]).__name__ if args and hasattr(args[0], fn.__name__) else None
+            with span(stage, component=component):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,243 @@
+"""Opt-in recording of sampled production turns, and the cassette that replays them.
+
+A recorded turn is one compact JSONL line: the PII-scrubbed message, the routing decision,
+tool calls and reply, plus every upstream response the turn saw (the LLM and order API
+methods decorated with @taped). `loadtest.replay` runs a log through any configuration with
+those upstream responses served from the record instead of the network.
+"""
+import dataclasses
+import functools
+import json
+import logging
+import os
+import re
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from prometheus_client import Counter
+from pydantic import BaseModel
+
+from resilience import CircuitOpenError
+
+TRAFFIC_RECORDS = Counter(
+    "traffic_records_total",
+    "Turns considered by the traffic recorder, by outcome (recorded, error)",
+    ["outcome"],
+)
+
+_EMAIL_RE = re.compile(r"[\w.+-]+@[\w-]+(?:\.[\w-]+)+")
+_CARD_RE = re.compile(r"\b\d(?:[ -]?\d){12,18}\b")
+_PHONE_RE = re.compile(r"(?<![\w-])\+?\d[\d ().-]{7,}\d\b")
+
+_tape: ContextVar[Optional["Tape"]] = ContextVar("traffic_tape", default=None)
+_cassette: ContextVar[Optional["Cassette"]] = ContextVar("traffic_cassette", default=None)
+
+
+def _mask_phone(m: "re.Match") -> str:
+    # Nine digits or more: shorter runs are dates, times and order numbers.
+    return "<phone>" if sum(c.isdigit() for c in m.group(0)) >= 9 else m.group(0)
+
+
+def scrub(value: Any, fields: frozenset = frozenset()) -> Any:
+    """Mask emails, card and phone numbers in strings, and whole values under keys in `fields`."""
+    if isinstance(value, str):
+        value = _EMAIL_RE.sub("<email>", value)
+        value = _CARD_RE.sub("<card>", value)
+        return _PHONE_RE.sub(_mask_phone, value)
+    if isinstance(value, dict):
+        return {k: "<redacted>" if str(k).lower() in fields else scrub(v, fields) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [scrub(v, fields) for v in value]
+    return value
+
+
+def call_key(args: tuple, kwargs: Dict[str, Any]) -> str:
+    """Stable key for an upstream call's arguments (scrubbed, so it matches a scrubbed replay)."""
+    return json.dumps(scrub([list(args), kwargs]), sort_keys=True, default=str, separators=(",", ":"))
+
+
+def _encode(value: Any) -> Any:
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    if dataclasses.is_dataclass(value) and not isinstance(value, type):
+        return dataclasses.asdict(value)
+    return value
+
+
+def _decode(value: Any, result_type: Optional[type]) -> Any:
+    if value is None or result_type is None:
+        return value
+    if issubclass(result_type, BaseModel):
+        return result_type.model_validate(value)
+    if dataclasses.is_dataclass(result_type):
+        return result_type(**value)
+    return value
+
+
+class ReplayMiss(LookupError):
+    """A replayed turn made an upstream call that is not in its record."""
+
+
+class ReplayedError(RuntimeError):
+    """An upstream error from the record, raised again during replay."""
+
+
+class Tape:
+    """Upstream calls made during one recorded turn; appended to from prefetch threads too."""
+
+    def __init__(self):
+        self.entries: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+
+    def add(self, entry: Dict[str, Any]) -> None:
+        with self._lock:
+            self.entries.append(entry)
+
+
+class Cassette:
+    """Serves one recorded turn's upstream responses, each at most once, matched on call and key.
+
+    `delay_scale` sleeps for the recorded upstream time multiplied by it (0: answer at once).
+    With `live=True` unmatched calls go to the real upstream instead of raising ReplayMiss.
+    """
+
+    def __init__(self, entries: List[Dict[str, Any]], delay_scale: float = 0.0, live: bool = False):
+        self._entries = list(entries)
+        self._used = [False] * len(self._entries)
+        self._lock = threading.Lock()
+        self.delay_scale = delay_scale
+        self.live = live
+        self.hits = 0
+        self.misses = 0
+
+    def take(self, call: str, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            for i, entry in enumerate(self._entries):
+                if not self._used[i] and entry["call"] == call and entry["key"] == key:
+                    self._used[i] = True
+                    self.hits += 1
+                    return entry
+            self.misses += 1
+            return None
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "unused": self._used.count(False)}
+
+
+def taped(call: str, result_type: Optional[type] = None, key_args: Optional[int] = None):
+    """Record this upstream method's responses while a turn is taped, and serve them during replay.
+
+    `result_type` (a pydantic model or dataclass) rebuilds the recorded JSON on replay.
+    `key_args` limits the match key to the first N positional arguments, for methods that also
+    take state which differs between configurations (e.g. the session passed to the resolver).
+    """
+    def decorator(fn: Callable[..., Any]) -> Callable[..., Any]:
+        @functools.wraps(fn)
+        def wrapper(self, *args: Any, **kwargs: Any) -> Any:
+            tape, cassette = _tape.get(), _cassette.get()
+            if tape is None and cassette is None:
+                return fn(self, *args, **kwargs)
+            key = call_key(args, kwargs) if key_args is None else call_key(args[:key_args], {})
+            if cassette is not None:
+                entry = cassette.take(call, key)
+                if entry is not None:
+                    if cassette.delay_scale:
+                        time.sleep(entry.get("ms", 0.0) / 1000.0 * cassette.delay_scale)
+                    err = entry.get("error")
+                    if err:
+                        exc = CircuitOpenError if err["type"] == "CircuitOpenError" else ReplayedError
+                        raise exc(err["message"])
+                    return _decode(entry.get("result"), result_type)
+                if not cassette.live:
+                    raise ReplayMiss(f"no recorded response for {call} {key}")
+                return fn(self, *args, **kwargs)
+
+            start = time.perf_counter()
+            entry: Dict[str, Any] = {"call": call, "key": key}
+            try:
+                result = fn(self, *args, **kwargs)
+                entry["result"] = _encode(result)
+                return result
+            except Exception as e:
+                entry["error"] = {"type": type(e).__name__, "message": str(e)}
+                raise
+            finally:
+                entry["ms"] = round((time.perf_counter() - start) * 1000, 3)
+                tape.add(entry)
+        return wrapper
+    return decorator
+
+
+@contextmanager
+def replaying(cassette: Cassette) -> Iterator[Cassette]:
+    token = _cassette.set(cassette)
+    try:
+        yield cassette
+    finally:
+        _cassette.reset(token)
+
+
+class TrafficRecorder:
+    """Writes sampled turns to `cfg.path` as JSONL. Sampling is per session, so whole conversations are kept."""
+
+    def __init__(self, cfg):
+        self.cfg = cfg
+        self.fields = frozenset(f.lower() for f in cfg.pii_fields)
+        self._lock = threading.Lock()
+        self._file = None
+
+    def sampled(self, session_id: str) -> bool:
+        if not self.cfg.enabled or self.cfg.sample_rate <= 0:
+            return False
+        return zlib.crc32(session_id.encode()) % 10000 < self.cfg.sample_rate * 10000
+
+    @contextmanager
+    def recording(self, session_id: str) -> Iterator[Optional[Tape]]:
+        """Tape the upstream calls of one turn; yields None when the session is not sampled."""
+        if _cassette.get() is not None or not self.sampled(session_id):
+            yield None
+            return
+        tape = Tape()
+        token = _tape.set(tape)
+        try:
+            yield tape
+        finally:
+            _tape.reset(token)
+
+    def write(self, tape: Tape, request_id: str, session_id: str, message: str,
+              status: int, content: Dict[str, Any], latency_ms: float) -> None:
+        router = next((tc["result"] for tc in content.get("tool_calls", []) if tc.get("tool") == "Router"), None)
+        record = scrub({
+            "v": 1,
+            "ts": round(time.time(), 3),
+            "request_id": request_id,
+            "session_id": session_id,
+            "message": message,
+            "status": status,
+            "latency_ms": round(latency_ms, 3),
+            "intent": router,
+            "agent": content.get("agent"),
+            "response": content.get("response"),
+            "tool_calls": content.get("tool_calls", []),
+            "error": content.get("error"),
+            "upstream": tape.entries,
+        }, self.fields)
+        line = json.dumps(record, ensure_ascii=False, default=str, separators=(",", ":"))
+        try:
+            with self._lock:
+                if self._file is None:
+                    os.makedirs(os.path.dirname(os.path.abspath(self.cfg.path)), exist_ok=True)
+                    self._file = open(self.cfg.path, "a", encoding="utf-8", buffering=1)
+                self._file.write(line + "\n")
+        except OSError:
+            # Recording is best effort: a full disk must not fail the turn.
+            TRAFFIC_RECORDS.labels(outcome="error").inc()
+            logging.getLogger("app").exception(
+                "Traffic record write failed",
+                extra={"extra_data": {"request_id": request_id, "session_id": session_id, "agent": "system"}})
+            return
+        TRAFFIC_RECORDS.labels(outcome="recorded").inc()
@@ -0,0 +1,233 @@
+"""Process pool for CPU-bound stages: ML routing and KB matrix search.
+
+Work runs in worker processes, so it neither holds the GIL nor stalls request threads. Each
+worker gets a pickled copy of the parent's fitted routers at start, so every process gives the
+same answer, and memory-maps the KB matrix file. Concurrent route calls are batched into one
+pool task. Work too small to repay the IPC, or arriving while the backlog is full, runs inline.
+"""
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import CancelledError, Future, ProcessPoolExecutor, TimeoutError as FutureTimeout
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from prometheus_client import Counter, Gauge, Histogram
+
+from config.settings import settings
+from kb.matrix import top_k
+
+OFFLOAD_TASKS = Counter(
+    "offload_tasks_total",
+    "CPU-bound work items by stage and where they ran (pool; inline: pool off or work too small; "
+    "overflow: backlog full; fallback: pool error or timeout)",
+    ["stage", "mode"],
+)
+OFFLOAD_BATCH = Histogram("offload_batch_size", "Work items per pool task", ["stage"],
+                          buckets=(1, 2, 4, 8, 16, 32, 64, 128))
+OFFLOAD_QUEUE = Gauge("offload_queue_depth", "Work items waiting for a pool worker", ["stage"])
+
+# ---- worker process side ----
+_worker_routers: Dict[str, Any] = {}
+_worker_matrix: Optional[np.ndarray] = None
+_worker_matrix_path: Optional[str] = None
+
+
+def _init_worker(routers: Dict[str, Any], matrix_path: Optional[str]) -> None:
+    global _worker_matrix_path
+    _worker_routers.update(routers)
+    _worker_matrix_path = matrix_path
+
+
+def _route_batch(router_name: str, texts: List[str]) -> List[Any]:
+    r = _worker_routers[router_name]
+    batch = getattr(r, "route_batch", None)
+    return batch(texts) if batch is not None else [r.route(t) for t in texts]
+
+
+def _top_k_batch(vectors: List[Sequence[float]], k: int) -> List[List[Tuple[int, float]]]:
+    global _worker_matrix
+    if _worker_matrix is None:
+        # Memory-mapped: every worker reads the same pages of the page cache.
+        _worker_matrix = np.load(_worker_matrix_path, mmap_mode="r")
+    return [top_k(_worker_matrix, v, k) for v in vectors]
+
+
+def _ping() -> int:
+    return os.getpid()
+
+
+# ---- request side ----
+class _Batcher:
+    """Feeds queued items to the pool in batches, one pool task per free worker.
+
+    While every worker is busy items queue up, so batches grow with load; at most
+    `max_pending` items wait (submit raises queue.Full beyond that).
+    """
+
+    def __init__(self, stage: str, run_batch: Callable[[List[Any]], Future], slots: int,
+                 max_batch: int, window: float, max_pending: int):
+        self.stage = stage
+        self._run_batch = run_batch
+        self._slots = threading.Semaphore(slots)
+        self.max_batch = max_batch
+        self.window = window
+        self._queue: "queue.Queue[Tuple[Any, Future]]" = queue.Queue(maxsize=max_pending)
+        threading.Thread(target=self._loop, name=f"offload-{stage}", daemon=True).start()
+
+    def submit(self, item: Any) -> Future:
+        fut: Future = Future()
+        self._queue.put_nowait((item, fut))
+        OFFLOAD_QUEUE.labels(stage=self.stage).set(self._queue.qsize())
+        return fut
+
+    def _loop(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            self._slots.acquire()
+            end = time.monotonic() + self.window
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self._queue.get(timeout=max(0.0, end - time.monotonic()))
+                                 if self.window else self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            OFFLOAD_QUEUE.labels(stage=self.stage).set(self._queue.qsize())
+            self._dispatch(batch)
+
+    def _dispatch(self, batch: List[Tuple[Any, Future]]) -> None:
+        OFFLOAD_BATCH.labels(stage=self.stage).observe(len(batch))
+        try:
+            task = self._run_batch([item for item, _ in batch])
+        except Exception as e:
+            self._slots.release()
+            for _, fut in batch:
+                fut.set_exception(e)
+            return
+
+        def done(task: Future) -> None:
+            self._slots.release()
+            try:
+                results = task.result()
+            except BaseException as e:
+                for _, fut in batch:
+                    fut.set_exception(e)
+                return
+            for (_, fut), result in zip(batch, results):
+                fut.set_result(result)
+
+        task.add_done_callback(done)
+
+
+class Offload:
+    """Runs CPU-bound stages in a process pool, falling back to inline execution."""
+
+    def __init__(self, cfg):
+        self.cfg = cfg
+        self.enabled = cfg.enabled
+        self.logger = logging.getLogger("app")
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._batchers: Dict[str, _Batcher] = {}
+        self._routers: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def start(self, routers: Sequence[Any] = ()) -> None:
+        """Start the workers, each with a copy of the fitted `routers`; no-op when disabled or started."""
+        if not self.enabled:
+            return
+        with self._lock:
+            if self._executor is not None:
+                return
+            self._routers = {type(r).__name__: r for r in routers} or self._routers
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.cfg.max_workers,
+                mp_context=multiprocessing.get_context(self.cfg.start_method),
+                initializer=_init_worker,
+                initargs=(self._routers, settings.vectordb.matrix_path),
+            )
+            executor = self._executor
+        for fut in [executor.submit(_ping) for _ in range(self.cfg.max_workers)]:
+            fut.result()
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _reset_after_fork(self) -> None:
+        # A forked child inherits the pool's handles but not its threads: start over on first use.
+        self._executor, self._batchers, self._lock = None, {}, threading.Lock()
+
+    def _pool(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self.start()
+        return self._executor
+
+    def _batcher(self, router_name: str) -> _Batcher:
+        batcher = self._batchers.get(router_name)
+        if batcher is None:
+            with self._lock:
+                batcher = self._batchers.get(router_name)
+                if batcher is None:
+                    batcher = self._batchers[router_name] = _Batcher(
+                        f"route.{router_name}",
+                        lambda texts: self._pool().submit(_route_batch, router_name, texts),
+                        self.cfg.max_workers, self.cfg.max_batch, self.cfg.batch_window_ms / 1000,
+                        self.cfg.max_pending)
+        return batcher
+
+    def _wait(self, stage: str, fut: Future, inline: Callable[[], Any]) -> Any:
+        try:
+            result = fut.result(timeout=self.cfg.task_timeout_seconds)
+        except (Exception, CancelledError) as e:
+            OFFLOAD_TASKS.labels(stage=stage, mode="fallback").inc()
+            self.logger.warning(f"Offloaded {stage} failed ({type(e).__name__}: {e}); running inline")
+            if not isinstance(e, FutureTimeout):
+                self.shutdown()  # e.g. a worker died: the next call starts a fresh pool
+            return inline()
+        OFFLOAD_TASKS.labels(stage=stage, mode="pool").inc()
+        return result
+
+    def _offloads(self, r: Any, chars: int) -> bool:
+        # Only routers shipped to the workers at start, and only inputs long enough to repay the IPC.
+        return self.enabled and type(r).__name__ in self._routers and chars >= self.cfg.min_route_chars
+
+    def route(self, r: Any, text: str) -> Any:
+        """`r.route(text)`, in the pool for CPU-bound routers (`cpu_bound = True`) and long texts."""
+        if not getattr(r, "cpu_bound", False):
+            return r.route(text)
+        if not self._offloads(r, len(text)):
+            OFFLOAD_TASKS.labels(stage="route", mode="inline").inc()
+            return r.route(text)
+        name = type(r).__name__
+        try:
+            fut = self._batcher(name).submit(text)
+        except queue.Full:
+            OFFLOAD_TASKS.labels(stage="route", mode="overflow").inc()
+            return r.route(text)
+        return self._wait("route", fut, lambda: r.route(text))
+
+    def route_batch(self, r: Any, texts: List[str]) -> List[Any]:
+        """`r.route_batch(texts)` as a single pool task for CPU-bound routers."""
+        if not (getattr(r, "cpu_bound", False) and texts and self._offloads(r, sum(map(len, texts)))):
+            return r.route_batch(texts)
+        OFFLOAD_BATCH.labels(stage="route_batch").observe(len(texts))
+        fut = self._pool().submit(_route_batch, type(r).__name__, texts)
+        return self._wait("route_batch", fut, lambda: r.route_batch(texts))
+
+    def top_k(self, matrix: np.ndarray, vector: Sequence[float], k: int) -> List[Tuple[int, float]]:
+        """KB matrix search; in the pool for matrices of at least `min_matrix_cells` values
+        memory-mapped from the configured matrix file."""
+        if not (self.enabled and matrix.size >= self.cfg.min_matrix_cells and isinstance(matrix, np.memmap)):
+            OFFLOAD_TASKS.labels(stage="top_k", mode="inline").inc()
+            return top_k(matrix, vector, k)
+        fut = self._pool().submit(_top_k_batch, [vector], k)
+        return self._wait("top_k", fut, lambda: [top_k(matrix, vector, k)])[0]
+
+
+OFFLOAD = Offload(settings.offload)
+os.register_at_fork(after_in_child=OFFLOAD._reset_after_fork)
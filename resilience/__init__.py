@@ -0,0 +1,9 @@
+from resilience.singleflight import SingleFlight, coalesce
+from resilience.circuit_breaker import CircuitBreaker, CircuitOpenError
+from resilience.admission import AdaptiveLimiter, AdmissionController, current_ticket
+from resilience.rate_limit import RateLimiter, RateLimitTimeout, TokenBucket
+from resilience.deadline import (
+    Deadline, DeadlineExceeded, allows_optional, cap_timeout, current_deadline, deadline_expired, deadline_scope,
+    sleep_before_retry,
+)
+from resilience.hedging import Hedger, configured_hedger, hedged
@@ -0,0 +1,162 @@
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, List, Optional
+
+from prometheus_client import Counter, Gauge
+
+ADMISSION_REQUESTS = Counter(
+    "admission_requests_total",
+    "Requests by admission outcome (admitted, degraded: some LLM stage took its fallback, shed: 503)",
+    ["name", "decision"],
+)
+ADMISSION_STAGES = Counter(
+    "admission_stage_total",
+    "LLM-bound stages by admission outcome (admitted, degraded)",
+    ["name", "stage", "decision"],
+)
+ADMISSION_LIMIT = Gauge("admission_concurrency_limit", "Current adaptive limit on concurrent LLM calls", ["name"])
+ADMISSION_IN_FLIGHT = Gauge("admission_llm_in_flight", "LLM calls currently admitted", ["name"])
+ADMISSION_QUEUE = Gauge("admission_requests_in_flight", "Requests currently being handled", ["name"])
+
+
+class AdaptiveLimiter:
+    """AIMD concurrency limit: +1 per limit's worth of fast successes while the limit is in use,
+    ×`backoff` on an error or a call slower than `latency_target`.
+    """
+
+    def __init__(self, name: str, initial: float = 16, min_limit: float = 1, max_limit: float = 256,
+                 latency_target: float = 2.0, backoff: float = 0.9):
+        self.name = name
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.latency_target = latency_target
+        self.backoff = backoff
+        self._limit = float(initial)
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        ADMISSION_LIMIT.labels(name=name).set(self._limit)
+
+    @property
+    def limit(self) -> float:
+        return self._limit
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def try_acquire(self) -> bool:
+        with self._lock:
+            if self._in_flight >= int(self._limit):
+                return False
+            self._in_flight += 1
+        ADMISSION_IN_FLIGHT.labels(name=self.name).inc()
+        return True
+
+    def release(self, latency: float, ok: bool = True) -> None:
+        with self._lock:
+            # Only grow when the limit was actually the constraint, not while mostly idle.
+            busy = self._in_flight >= self._limit / 2
+            self._in_flight -= 1
+            if not ok or latency > self.latency_target:
+                self._limit = max(self.min_limit, self._limit * self.backoff)
+            elif busy:
+                self._limit = min(self.max_limit, self._limit + 1.0 / self._limit)
+            limit = self._limit
+        ADMISSION_IN_FLIGHT.labels(name=self.name).dec()
+        ADMISSION_LIMIT.labels(name=self.name).set(limit)
+
+
+class Ticket:
+    """Admission state of one request; stages that took their non-LLM fallback are listed in `degraded`."""
+
+    def __init__(self):
+        self.degraded: List[str] = []
+
+
+class StageSlot:
+    """Truthy when the stage may call the LLM. LLM calls that return an error instead of raising
+    report it with `failed()`, so the adaptive limit sees it."""
+
+    def __init__(self, admitted: bool):
+        self.admitted = admitted
+        self.ok = True
+
+    def __bool__(self) -> bool:
+        return self.admitted
+
+    def failed(self) -> None:
+        self.ok = False
+
+
+_ticket: ContextVar[Optional[Ticket]] = ContextVar("admission_ticket", default=None)
+
+
+class AdmissionController:
+    """Requests beyond `max_in_flight` are shed; below that, LLM-bound stages run only while
+    requests in flight stay under `queue_depth_target` and the adaptive LLM limit has room,
+    and otherwise take their non-LLM fallback.
+    """
+
+    def __init__(self, name: str, limiter: AdaptiveLimiter, queue_depth_target: int = 64,
+                 max_in_flight: int = 256, retry_after: int = 1, enabled: bool = True):
+        self.name = name
+        self.enabled = enabled
+        self.limiter = limiter
+        self.queue_depth_target = queue_depth_target
+        self.max_in_flight = max_in_flight
+        self.retry_after = retry_after
+        self._in_flight = 0
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def request(self) -> Iterator[Optional[Ticket]]:
+        """Admit one request; yields None when it must be shed (answer 503 with Retry-After)."""
+        with self._lock:
+            shed = self.enabled and self._in_flight >= self.max_in_flight
+            if not shed:
+                self._in_flight += 1
+        if shed:
+            ADMISSION_REQUESTS.labels(name=self.name, decision="shed").inc()
+            yield None
+            return
+        ADMISSION_QUEUE.labels(name=self.name).inc()
+        ticket = Ticket()
+        token = _ticket.set(ticket)
+        try:
+            yield ticket
+        finally:
+            _ticket.reset(token)
+            with self._lock:
+                self._in_flight -= 1
+            ADMISSION_QUEUE.labels(name=self.name).dec()
+            ADMISSION_REQUESTS.labels(name=self.name, decision="degraded" if ticket.degraded else "admitted").inc()
+
+    @contextmanager
+    def stage(self, stage: str) -> Iterator[StageSlot]:
+        """Yields a truthy slot when this LLM-bound stage may call the LLM, a falsy one when it should fall back."""
+        if not self.enabled:
+            yield StageSlot(True)
+            return
+        admitted = self._in_flight < self.queue_depth_target and self.limiter.try_acquire()
+        ADMISSION_STAGES.labels(name=self.name, stage=stage,
+                                decision="admitted" if admitted else "degraded").inc()
+        if not admitted:
+            ticket = _ticket.get()
+            if ticket is not None:
+                ticket.degraded.append(stage)
+            yield StageSlot(False)
+            return
+        start = time.monotonic()
+        slot = StageSlot(True)
+        ok = False
+        try:
+            yield slot
+            ok = slot.ok
+        finally:
+            self.limiter.release(time.monotonic() - start, ok)
+
+
+def current_ticket() -> Optional[Ticket]:
+    return _ticket.get()
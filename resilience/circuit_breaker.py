@@ -0,0 +1,107 @@
+import threading
+import time
+from typing import Callable, Dict
+
+from prometheus_client import Counter, Gauge
+
+CIRCUIT_STATE = Gauge(
+    "circuit_breaker_state",
+    "Circuit breaker state per upstream (0=closed, 1=half_open, 2=open)",
+    ["name"],
+)
+CIRCUIT_REJECTED = Counter(
+    "circuit_breaker_rejected_total",
+    "Calls rejected without touching the upstream because its breaker was open",
+    ["name"],
+)
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an upstream whose breaker is open."""
+
+    def __init__(self, name: str):
+        super().__init__(f"circuit '{name}' is open")
+        self.name = name
+
+
+class CircuitBreaker:
+    """Closed → open after `failure_threshold` consecutive failures; open → half-open after
+    `reset_timeout` seconds, where up to `half_open_max_calls` probes decide whether to close again.
+
+    Callers check `allow()` before each upstream attempt and report the outcome with
+    `record_success()` / `record_failure()`, or `release()` when the attempt was never made.
+    """
+
+    CLOSED = "closed"
+    HALF_OPEN = "half_open"
+    OPEN = "open"
+    _GAUGE_VALUES: Dict[str, int] = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0,
+                 half_open_max_calls: int = 1, clock: Callable[[], float] = time.monotonic):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probes = 0
+        CIRCUIT_STATE.labels(name=name).set(0)
+
+    def _transition(self, state: str) -> None:
+        self._state = state
+        if state == self.OPEN:
+            self._opened_at = self._clock()
+        self._probes = 0
+        CIRCUIT_STATE.labels(name=self.name).set(self._GAUGE_VALUES[state])
+
+    def _refresh(self) -> None:
+        if self._state == self.OPEN and self._clock() - self._opened_at >= self.reset_timeout:
+            self._transition(self.HALF_OPEN)
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            self._refresh()
+            return self._state
+
+    def is_open(self) -> bool:
+        """True while calls would be rejected outright (does not use up a half-open probe)."""
+        return self.state == self.OPEN
+
+    def allow(self) -> bool:
+        with self._lock:
+            self._refresh()
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.HALF_OPEN and self._probes < self.half_open_max_calls:
+                self._probes += 1
+                return True
+        CIRCUIT_REJECTED.labels(name=self.name).inc()
+        return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            if self._state != self.CLOSED:
+                self._transition(self.CLOSED)
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._state == self.HALF_OPEN or (self._state == self.CLOSED and self._failures >= self.failure_threshold):
+                self._transition(self.OPEN)
+
+    def release(self) -> None:
+        """Hand back a half-open probe taken by `allow()` without counting an outcome."""
+        with self._lock:
+            if self._state == self.HALF_OPEN and self._probes > 0:
+                self._probes -= 1
+
+    def reset(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._transition(self.CLOSED)
@@ -0,0 +1,105 @@
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from prometheus_client import Counter
+
+DEADLINE_STAGES = Counter(
+    "deadline_stage_total",
+    "Stages cut short by the request deadline, by stage and action (skipped, truncated)",
+    ["stage", "action"],
+)
+
+
+class DeadlineExceeded(Exception):
+    """The request's time budget ran out before `stage` could (continue to) run."""
+
+    def __init__(self, stage: str):
+        super().__init__(f"request deadline exceeded in {stage}")
+        self.stage = stage
+
+
+class Deadline:
+    """A request's time budget; stages cap their timeouts and retries by `remaining()`.
+
+    Stages that are skipped or cut short are noted, for the response's Deadline tool call.
+    """
+
+    def __init__(self, budget: float, clock: Callable[[], float] = time.monotonic):
+        self.budget = budget
+        self._clock = clock
+        self.expires_at = clock() + budget
+        self.notes: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - self._clock())
+
+    def expired(self) -> bool:
+        return self._clock() >= self.expires_at
+
+    def note(self, stage: str, action: str) -> None:
+        DEADLINE_STAGES.labels(stage=stage, action=action).inc()
+        with self._lock:
+            self.notes.append({"stage": stage, "action": action, "remaining_ms": round(self.remaining() * 1000, 1)})
+
+
+_deadline: ContextVar[Optional[Deadline]] = ContextVar("request_deadline", default=None)
+
+
+@contextmanager
+def deadline_scope(budget: Optional[float]) -> Iterator[Optional[Deadline]]:
+    """Give the enclosed work (and threads started with its context) `budget` seconds; None: unbounded."""
+    if budget is None:
+        yield None
+        return
+    deadline = Deadline(budget)
+    token = _deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _deadline.reset(token)
+
+
+def current_deadline() -> Optional[Deadline]:
+    return _deadline.get()
+
+
+def deadline_expired() -> bool:
+    """True once the current request's budget is spent (a timeout then is ours, not the upstream's)."""
+    deadline = _deadline.get()
+    return deadline is not None and deadline.expired()
+
+
+def cap_timeout(timeout: float, stage: str) -> float:
+    """`timeout` limited to the remaining budget; raises DeadlineExceeded when none is left."""
+    deadline = _deadline.get()
+    if deadline is None:
+        return timeout
+    remaining = deadline.remaining()
+    if remaining <= 0:
+        deadline.note(stage, "truncated")
+        raise DeadlineExceeded(stage)
+    return min(timeout, remaining)
+
+
+def sleep_before_retry(delay: float, stage: str) -> bool:
+    """Back off `delay` seconds before a retry; returns False (and notes `stage` as truncated)
+    instead when the budget would be gone by then, so the caller stops retrying."""
+    deadline = _deadline.get()
+    if deadline is not None and deadline.remaining() <= delay:
+        deadline.note(stage, "truncated")
+        return False
+    time.sleep(delay)
+    return True
+
+
+def allows_optional(stage: str, min_remaining: float) -> bool:
+    """False (noting `stage` as skipped) when less than `min_remaining` seconds are left."""
+    deadline = _deadline.get()
+    if deadline is None or deadline.remaining() >= min_remaining:
+        return True
+    deadline.note(stage, "skipped")
+    return False
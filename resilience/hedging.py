@@ -0,0 +1,188 @@
+import contextvars
+import functools
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, TimeoutError as FutureTimeout, wait
+from typing import Any, Callable, Deque, List, Optional
+
+from prometheus_client import Counter, Gauge
+
+from resilience.deadline import current_deadline
+
+HEDGE_CALLS = Counter(
+    "hedge_calls_total",
+    "Hedgeable calls by outcome (fast: answered before the hedge delay, hedged, capped: over the hedge budget, "
+    "cold: too few latency samples yet, no_budget: the request deadline ends before the hedge delay)",
+    ["name", "outcome"],
+)
+HEDGE_WINS = Counter("hedge_wins_total", "Hedged calls by which attempt answered first", ["name", "winner"])
+HEDGE_DELAY = Gauge("hedge_delay_seconds", "Current hedge delay (tracked latency percentile)", ["name"])
+
+_pool: Optional[ThreadPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _executor(max_workers: int) -> ThreadPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="hedge")
+        return _pool
+
+
+def _forget_pool() -> None:
+    # A forked child inherits the pool without its threads; the next call starts a new one.
+    global _pool, _pool_lock
+    _pool, _pool_lock = None, threading.Lock()
+
+
+os.register_at_fork(after_in_child=_forget_pool)
+
+
+def _failed(future: Future) -> bool:
+    """An attempt that raised or returned a result with `err` set (the clients' error results)."""
+    return future.exception() is not None or bool(getattr(future.result(), "err", None))
+
+
+class LatencyTracker:
+    """Percentile of the last `window` latencies, recomputed every `refresh` samples."""
+
+    def __init__(self, percentile: float, window: int = 500, min_samples: int = 50, refresh: int = 16):
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.refresh = refresh
+        self._samples: Deque[float] = deque(maxlen=window)
+        self._since_refresh = 0
+        self._value: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def observe(self, latency: float) -> None:
+        with self._lock:
+            self._samples.append(latency)
+            self._since_refresh += 1
+            if len(self._samples) >= self.min_samples and (self._value is None or self._since_refresh >= self.refresh):
+                ordered = sorted(self._samples)
+                self._value = ordered[min(len(ordered) - 1, int(len(ordered) * self.percentile / 100))]
+                self._since_refresh = 0
+
+    def value(self) -> Optional[float]:
+        """None until `min_samples` latencies have been seen."""
+        return self._value
+
+
+class Hedger:
+    """Send a second attempt of an idempotent call when the first is slower than the tracked
+    `percentile` of recent first-attempt latencies, and return whichever answers first.
+
+    At most `max_hedge_percent` of the last `window` calls are hedged. Attempts run on a shared
+    thread pool, each in a copy of the caller's context; the loser is cancelled if it has not
+    started yet, otherwise it finishes in the background and its answer is dropped.
+    """
+
+    def __init__(self, name: str, percentile: float = 95.0, max_hedge_percent: float = 5.0,
+                 min_delay: float = 0.05, window: int = 500, min_samples: int = 50, max_workers: int = 64):
+        self.name = name
+        self.max_hedge_ratio = max_hedge_percent / 100.0
+        self.min_delay = min_delay
+        self.max_workers = max_workers
+        self.latency = LatencyTracker(percentile, window, min_samples)
+        self._recent: Deque[bool] = deque(maxlen=window)  # hedged or not, per call
+        self._recent_hedged = 0
+        self._lock = threading.Lock()
+
+    def delay(self) -> Optional[float]:
+        threshold = self.latency.value()
+        if threshold is None:
+            return None
+        return max(threshold, self.min_delay)
+
+    def _admit(self, hedge: bool) -> bool:
+        """Record one call; a hedge is admitted only while within the hedge budget."""
+        with self._lock:
+            if hedge and self._recent_hedged + 1 > self.max_hedge_ratio * (len(self._recent) + 1):
+                hedge = False
+            if len(self._recent) == self._recent.maxlen and self._recent[0]:
+                self._recent_hedged -= 1
+            self._recent.append(hedge)
+            self._recent_hedged += hedge
+            return hedge
+
+    def _submit(self, fn: Callable[..., Any], args: tuple, kwargs: dict) -> Future:
+        return _executor(self.max_workers).submit(contextvars.copy_context().run, fn, *args, **kwargs)
+
+    def call(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        delay = self.delay()
+        deadline = current_deadline()
+        if delay is None or (deadline is not None and deadline.remaining() <= delay):
+            self._admit(False)
+            HEDGE_CALLS.labels(name=self.name, outcome="cold" if delay is None else "no_budget").inc()
+            start = time.monotonic()
+            result = fn(*args, **kwargs)
+            self.latency.observe(time.monotonic() - start)
+            return result
+        HEDGE_DELAY.labels(name=self.name).set(delay)
+
+        start = time.monotonic()
+
+        def observe(f: Future) -> None:
+            # Every first attempt counts, including those overtaken by a hedge, so the percentile stays unbiased.
+            if not f.cancelled() and f.exception() is None:
+                self.latency.observe(time.monotonic() - start)
+
+        primary = self._submit(fn, args, kwargs)
+        primary.add_done_callback(observe)
+        try:
+            result = primary.result(timeout=delay)
+        except FutureTimeout:
+            pass
+        else:
+            self._admit(False)
+            HEDGE_CALLS.labels(name=self.name, outcome="fast").inc()
+            return result
+        if not self._admit(True):
+            HEDGE_CALLS.labels(name=self.name, outcome="capped").inc()
+            return primary.result()
+
+        HEDGE_CALLS.labels(name=self.name, outcome="hedged").inc()
+        hedge = self._submit(fn, args, kwargs)
+        attempts: List[Future] = [primary, hedge]
+        pending = set(attempts)
+        winner: Optional[Future] = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            winner = next((f for f in attempts if f in done and not _failed(f)), None)
+            if winner is not None:
+                break
+        for f in pending:
+            f.cancel()
+        if winner is None:
+            winner = primary  # both failed: surface the first attempt's error
+        HEDGE_WINS.labels(name=self.name, winner="primary" if winner is primary else "hedge").inc()
+        return winner.result()
+
+
+def configured_hedger(name: str, cfg: Any) -> Optional[Hedger]:
+    """Hedger for call `name` per a HedgingConfig, or None when hedging is off for it."""
+    if not cfg.enabled or name not in cfg.calls:
+        return None
+    return Hedger(name, cfg.percentile, cfg.max_hedge_percent, cfg.min_delay_ms / 1000, cfg.window,
+                  cfg.min_samples, cfg.max_workers)
+
+
+def hedged(hedger: Optional[Hedger]) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+    """Decorator: run calls through `hedger`; with None (hedging not enabled for the call) a no-op."""
+
+    def decorator(fn: Callable[..., Any]) -> Callable[..., Any]:
+        if hedger is None:
+            return fn
+
+        @functools.wraps(fn)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            return hedger.call(fn, *args, **kwargs)
+
+        wrapper.hedger = hedger
+        return wrapper
+
+    return decorator
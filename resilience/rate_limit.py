@@ -0,0 +1,183 @@
+import logging
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+from prometheus_client import Counter, Histogram
+
+RATE_LIMIT_ACQUIRED = Counter(
+    "rate_limit_acquire_total",
+    "Rate limiter acquisitions, by limiter, key and outcome (immediate, waited, timeout)",
+    ["name", "key", "outcome"],
+)
+RATE_LIMIT_WAIT = Histogram(
+    "rate_limit_wait_seconds",
+    "Time spent queued for rate-limit tokens",
+    ["name", "key"],
+    buckets=(0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+RATE_LIMIT_BACKEND_ERRORS = Counter(
+    "rate_limit_backend_errors_total",
+    "Shared (Redis) bucket errors that fell back to the in-process bucket",
+    ["name"],
+)
+
+
+class RateLimitTimeout(Exception):
+    """No tokens became available within the caller's wait budget."""
+
+
+class TokenBucket:
+    """In-process token bucket holding up to `capacity` tokens, refilled at `rate` per second."""
+
+    def __init__(self, capacity: float, rate: float, clock: Callable[[], float] = time.monotonic):
+        self.capacity = capacity
+        self.rate = rate
+        self._clock = clock
+        self._tokens = capacity
+        self._ts = clock()
+        self._lock = threading.Lock()
+
+    def try_take(self, n: float) -> float:
+        """Take `n` tokens and return 0, or take nothing and return the seconds until `n` are available."""
+        n = min(n, self.capacity)
+        with self._lock:
+            now = self._clock()
+            self._tokens = min(self.capacity, self._tokens + (now - self._ts) * self.rate)
+            self._ts = now
+            if self._tokens >= n:
+                self._tokens -= n
+                return 0.0
+            return (n - self._tokens) / self.rate
+
+    def refund(self, n: float) -> None:
+        """Return `n` tokens taken by `try_take` but not used."""
+        with self._lock:
+            self._tokens = min(self.capacity, self._tokens + min(n, self.capacity))
+
+
+# Refill and take atomically in Redis, using the server clock so workers agree on time.
+_TAKE_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local n = math.min(tonumber(ARGV[3]), capacity)
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local b = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(b[1]) or capacity
+local ts = tonumber(b[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local wait = 0
+if tokens >= n then tokens = tokens - n else wait = (n - tokens) / rate end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+return tostring(wait)
+"""
+_REFUND_SCRIPT = """
+local tokens = tonumber(redis.call('HGET', KEYS[1], 'tokens'))
+if tokens then
+  redis.call('HSET', KEYS[1], 'tokens', tostring(math.min(tonumber(ARGV[1]), tokens + tonumber(ARGV[2]))))
+end
+return 0
+"""
+
+
+class RedisTokenBucket:
+    """Token bucket shared by every worker through Redis.
+
+    After a Redis error, `fallback` (an in-process bucket) is used for `retry_after` seconds
+    before Redis is tried again.
+    """
+
+    def __init__(self, client, key: str, capacity: float, rate: float, fallback: TokenBucket, name: str = "",
+                 retry_after: float = 5.0, clock: Callable[[], float] = time.monotonic):
+        self.client = client
+        self.key = key
+        self.capacity = capacity
+        self.rate = rate
+        self.fallback = fallback
+        self.name = name
+        self.retry_after = retry_after
+        self._clock = clock
+        self._down_until = 0.0
+
+    def try_take(self, n: float) -> float:
+        if self._down_until and self._clock() < self._down_until:
+            return self.fallback.try_take(n)
+        try:
+            wait = float(self.client.eval(_TAKE_SCRIPT, 1, self.key, self.capacity, self.rate, n))
+        except Exception as e:
+            RATE_LIMIT_BACKEND_ERRORS.labels(name=self.name).inc()
+            if not self._down_until:
+                logging.getLogger("app").warning(
+                    f"Rate limit bucket {self.key} unavailable in Redis ({e}); using in-process bucket")
+            self._down_until = self._clock() + self.retry_after
+            return self.fallback.try_take(n)
+        self._down_until = 0.0
+        return wait
+
+    def refund(self, n: float) -> None:
+        if self._down_until and self._clock() < self._down_until:
+            self.fallback.refund(n)
+            return
+        try:
+            self.client.eval(_REFUND_SCRIPT, 1, self.key, self.capacity, min(n, self.capacity))
+        except Exception:
+            RATE_LIMIT_BACKEND_ERRORS.labels(name=self.name).inc()
+
+
+class RateLimiter:
+    """Per-key requests-per-minute and tokens-per-minute budgets; `acquire` queues until both allow.
+
+    `limits` maps a key (e.g. a model name) to (rpm, tpm); keys without limits are not throttled,
+    and 0 disables either budget. With a Redis `client` the buckets are shared across workers.
+    """
+
+    def __init__(self, name: str, limits: Dict[str, Tuple[int, int]], client=None, key_prefix: str = "ratelimit",
+                 clock: Callable[[], float] = time.monotonic, sleep: Callable[[float], None] = time.sleep):
+        self.name = name
+        self._sleep = sleep
+        self._clock = clock
+        self._buckets: Dict[str, Tuple[Optional[object], Optional[object]]] = {}
+        for key, (rpm, tpm) in limits.items():
+            self._buckets[key] = tuple(
+                self._bucket(client, f"{key_prefix}:{name}:{key}:{kind}", per_minute, clock) if per_minute else None
+                for kind, per_minute in (("rpm", rpm), ("tpm", tpm))
+            )
+
+    def _bucket(self, client, redis_key: str, per_minute: int, clock):
+        local = TokenBucket(per_minute, per_minute / 60.0, clock)
+        if client is None:
+            return local
+        return RedisTokenBucket(client, redis_key, per_minute, per_minute / 60.0, local, self.name, clock=clock)
+
+    def acquire(self, key: str, tokens: int, max_wait: float) -> float:
+        """Take one request and `tokens` tokens for `key`, waiting up to `max_wait` seconds.
+
+        Returns the time waited; raises RateLimitTimeout when the budget would be exceeded, after
+        handing back the request already taken.
+        """
+        buckets = self._buckets.get(key)
+        if buckets is None:
+            return 0.0
+        start = self._clock()
+        deadline = start + max_wait
+        taken = []
+        for bucket, n in zip(buckets, (1, tokens)):
+            if bucket is None:
+                continue
+            while True:
+                wait = bucket.try_take(n)
+                if wait <= 0:
+                    taken.append((bucket, n))
+                    break
+                if self._clock() + wait > deadline:
+                    for held, m in taken:
+                        held.refund(m)
+                    RATE_LIMIT_ACQUIRED.labels(name=self.name, key=key, outcome="timeout").inc()
+                    raise RateLimitTimeout(f"rate limit '{self.name}' for {key}: no capacity within {max_wait:.1f}s")
+                self._sleep(wait)
+        waited = self._clock() - start
+        RATE_LIMIT_ACQUIRED.labels(name=self.name, key=key, outcome="waited" if waited > 0 else "immediate").inc()
+        RATE_LIMIT_WAIT.labels(name=self.name, key=key).observe(waited)
+        return waited
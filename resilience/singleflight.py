@@ -0,0 +1,92 @@
+import functools
+import threading
+import weakref
+from typing import Any, Callable, Dict, Hashable, Optional
+
+from prometheus_client import Counter
+
+SINGLEFLIGHT_CALLS = Counter(
+    "singleflight_calls_total",
+    "Upstream calls seen by single-flight groups, by whether they ran or shared an in-flight result",
+    ["name", "result"],
+)
+
+# Every live group, for the in-flight entry gauges.
+GROUPS: "weakref.WeakSet[SingleFlight]" = weakref.WeakSet()
+
+
+class _Call:
+    __slots__ = ("done", "value", "exc")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value: Any = None
+        self.exc: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """Share one in-flight call among concurrent callers asking for the same key.
+
+    Only calls that overlap in time are collapsed; nothing is cached once the
+    leader returns.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        GROUPS.add(self)
+
+    def do(self, key: Hashable, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            SINGLEFLIGHT_CALLS.labels(name=self.name, result="shared").inc()
+            call.done.wait()
+            if call.exc is not None:
+                raise call.exc
+            return call.value
+
+        SINGLEFLIGHT_CALLS.labels(name=self.name, result="executed").inc()
+        try:
+            call.value = fn(*args, **kwargs)
+            return call.value
+        except BaseException as e:
+            call.exc = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
+
+
+def _freeze(value: Any) -> Hashable:
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    return value
+
+
+def coalesce(name: str) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+    """Method decorator: concurrent identical calls on the same class share one upstream call."""
+    group = SingleFlight(name)
+
+    def decorator(fn: Callable[..., Any]) -> Callable[..., Any]:
+        @functools.wraps(fn)
+        def wrapper(self, *args: Any, **kwargs: Any) -> Any:
+            key = (type(self), _freeze(args), _freeze(kwargs))
+            return group.do(key, fn, self, *args, **kwargs)
+
+        wrapper.singleflight = group
+        return wrapper
+
+    return decorator
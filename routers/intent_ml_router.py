@@ -1,4 +1,4 @@
-from typing import Any, Dict, Tuple
+from typing import Any, Dict, List, Tuple
 from routers import Intent
 
 try:
@@ -25,12 +25,14 @@ SEED_DATA = [
 
 
 class IntentMLRouter:
+    cpu_bound = True  # routed in the offload process pool when it is enabled
+
     def __init__(self):
         if not (TfidfVectorizer and LinearSVC and Pipeline):
             raise RuntimeError("scikit‑learn not available; install scikit‑learn or use ROUTER_MODE=naive/llm")
         self.pipe: Pipeline = Pipeline([
             ("tfidf", TfidfVectorizer(ngram_range=(1, 2), min_df=1)),
-            ("clf", DecisionTreeClassifier())
+            ("clf", DecisionTreeClassifier(random_state=0))  # seeded: the same answer on every fit
             # ("clf", LinearSVC())
         ])
         X = [x for x, y in SEED_DATA]
@@ -42,6 +44,13 @@ class IntentMLRouter:
         conf = max(self.pipe.predict_proba([text])[0])
         return str(pred), float(conf), {"model": type(self.pipe['clf']).__name__}
 
+    def route_batch(self, texts: List[str]) -> List[Tuple[Intent, float, Dict[str, Any]]]:
+        # One vectorize/predict pass for the whole batch; predict_proba's argmax is the predicted class.
+        probas = self.pipe.predict_proba(texts)
+        classes = self.pipe.classes_
+        meta = {"model": type(self.pipe['clf']).__name__}
+        return [(str(classes[p.argmax()]), float(p.max()), dict(meta)) for p in probas]
+
 
 if __name__ == '__main__':
     ml_router = IntentMLRouter()
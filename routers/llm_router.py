@@ -9,16 +9,20 @@ from llm.openai_client import OpenAIClient, IntentResult
 from routers import Intent, INTENT_LIST
 from config.settings import settings
 from prompts import PROMPTS
+from resilience import coalesce
 
 cfg = settings.openai
 
 
 class LLMRouter:
+    uses_llm = True  # admission control swaps in the fallback router when LLM capacity is saturated
+
     def __init__(self):
         self.client = OpenAIClient()
         self.model = cfg.chat_model
         self.temperature = cfg.temperature
 
+    @coalesce("router.route")
     def route(self, text: str) -> IntentResult:
         intent_result = self.client.route(text)
         if not intent_result.err:
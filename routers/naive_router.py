@@ -9,6 +9,6 @@ class NaiveRouter:
         t = text.lower()
         if any(k in t for k in ["cancel", "refund this order", "call off", "undo my order"]):
             return "order_cancellation", 1.0, {"matched": "cancel-keyword"}
-        if any(k in t for k in ["track", "where is", "status of", "eta"]):
+        if any(k in t for k in ["track", "where is", "where are", "status of", "eta"]):
             return "order_tracking", 1.0, {"matched": "track-keyword"}
         return "product_qa", 0.5, {"matched": "fallback"}
@@ -0,0 +1,105 @@
+import importlib
+
+import pytest
+from fastapi.testclient import TestClient
+
+import agent
+from llm.openai_client import LLM_ADMISSION
+from resilience import AdaptiveLimiter, AdmissionController
+
+
+@pytest.fixture
+def mod(monkeypatch):
+    monkeypatch.delenv("REDIS_URL", raising=False)
+    mod = importlib.import_module("app")
+    mod.store._mem.clear()
+    return mod
+
+
+def test_limiter_aimd():
+    limiter = AdaptiveLimiter("test", initial=4, min_limit=1, max_limit=8, latency_target=1.0, backoff=0.5)
+    assert all(limiter.try_acquire() for _ in range(4))
+    assert not limiter.try_acquire()
+    limiter.release(latency=0.1)  # busy and fast: additive increase
+    assert limiter.limit == pytest.approx(4.25)
+    limiter.release(latency=5.0)  # slow: multiplicative decrease
+    assert limiter.limit == pytest.approx(2.125)
+    limiter.release(latency=0.1, ok=False)
+    assert limiter.limit == pytest.approx(1.0625)
+
+    idle = AdaptiveLimiter("test", initial=8)
+    assert idle.try_acquire()
+    idle.release(latency=0.1)  # one call in flight out of 8: no growth without evidence
+    assert idle.limit == 8 and idle.in_flight == 0
+
+
+def test_stages_degrade_when_saturated_and_requests_shed_at_hard_limit():
+    controller = AdmissionController("test", AdaptiveLimiter("test", initial=1), queue_depth_target=2, max_in_flight=2)
+    with controller.request() as first, controller.request() as second:
+        assert first is not None and second is not None
+        with controller.request() as third:
+            assert third is None
+        with controller.stage("router") as admitted:
+            assert not admitted  # two requests in flight: at the queue-depth target
+    assert second.degraded == ["router"] and first.degraded == []
+    with controller.request() as ticket:
+        with controller.stage("router") as admitted, controller.stage("resolver") as admitted_too:
+            assert admitted and not admitted_too  # the LLM limit of 1 is taken
+    assert ticket.degraded == ["resolver"]
+
+
+def test_returned_llm_errors_shrink_the_limit(monkeypatch):
+    limiter = AdaptiveLimiter("test", initial=4, min_limit=1, backoff=0.5)
+    monkeypatch.setattr(LLM_ADMISSION, "limiter", limiter)
+    monkeypatch.setattr(LLM_ADMISSION, "enabled", True)
+    monkeypatch.setattr(agent.OpenAIClient, "available", staticmethod(lambda: True))
+    monkeypatch.setattr(agent.OpenAIClient, "resolve_order_id", lambda self, m, s: agent.ResolvedOrder(err="boom"))
+    assert agent.resolve_with_admission("cancel it", {}).err == "boom"
+    assert limiter.limit == pytest.approx(2.0)
+
+
+class LLMBound:
+    uses_llm = True
+
+    def route(self, text):
+        raise AssertionError("degraded: the LLM router must not be called")
+
+
+def test_breaker_rejections_do_not_shrink_the_limit(monkeypatch):
+    from llm.openai_client import OPENAI_BREAKER
+    from resilience import CircuitBreaker
+
+    limiter = AdaptiveLimiter("test", initial=4)
+    monkeypatch.setattr(LLM_ADMISSION, "limiter", limiter)
+    monkeypatch.setattr(LLM_ADMISSION, "enabled", True)
+    monkeypatch.setattr(OPENAI_BREAKER, "_state", CircuitBreaker.OPEN)
+    monkeypatch.setattr(OPENAI_BREAKER, "_opened_at", OPENAI_BREAKER._clock())
+    name, result = agent.route_message(LLMBound(), "Where is ORD-1234?")  # straight to the fallback
+    assert name == "NaiveRouter" and result.intent == "order_tracking"
+    monkeypatch.setattr(agent.OpenAIClient, "available", staticmethod(lambda: True))
+    monkeypatch.setattr(agent.OpenAIClient, "resolve_order_id",
+                        lambda self, m, s: agent.ResolvedOrder(err="circuit 'openai' is open"))
+    agent.resolve_with_admission("cancel it", {})
+    assert limiter.limit == 4
+
+
+def test_degraded_turn_uses_fallback_router(mod, monkeypatch):
+    monkeypatch.setattr(LLM_ADMISSION, "queue_depth_target", 0)
+    agent.ensure_components()
+    monkeypatch.setattr(agent, "router", LLMBound())  # whatever router the environment configures
+    monkeypatch.setattr(agent.OpenAIClient, "available", staticmethod(lambda: True))
+    payload = TestClient(mod.app).post("/chat", json={"session_id": "adm", "message": "Where is ORD-1234?"}).json()
+    tools = {tc["tool"]: tc for tc in payload["tool_calls"]}
+    assert tools["Router"]["input"]["mode"] == "NaiveRouter"
+    assert tools["Admission"]["result"]["degraded"] == ["router"]
+    assert "LLMUsage" not in tools
+    assert payload["agent"] == "OrderTrackingAgent"
+
+
+def test_hard_limit_returns_503_with_retry_after(mod, monkeypatch):
+    monkeypatch.setattr(LLM_ADMISSION, "max_in_flight", 0)
+    resp = TestClient(mod.app).post("/chat", json={"session_id": "adm-shed", "message": "Where is ORD-1234?"})
+    assert resp.status_code == 503
+    assert resp.headers["Retry-After"] == str(LLM_ADMISSION.retry_after)
+    assert resp.json()["error"] == "overloaded"
+    assert mod.store.get("adm-shed")["history"] == []
@@ -0,0 +1,44 @@
+import json
+import os
+
+from benchmarks import datagen
+from benchmarks.run import compare, main
+
+
+def test_datagen_is_deterministic_and_queries_hit():
+    rows = datagen.faq_rows(50)
+    assert rows == datagen.faq_rows(50)
+    qs = datagen.queries(rows, n=10)
+    assert sum(any(r["q"] in q for r in rows) for q in qs) >= 5
+    assert len(datagen.session_state(3)["history"]) == 6
+
+
+def test_embeddings_are_the_same_in_every_process():
+    import subprocess
+    import sys
+
+    code = "from benchmarks import datagen; print(datagen.embedding('return policy')[:3])"
+    runs = {subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True,
+                           env={**os.environ, "PYTHONHASHSEED": seed}).stdout for seed in ("1", "2")}
+    assert runs == {f"{datagen.embedding('return policy')[:3]}\n"}
+
+
+def test_compare_flags_regressions_past_threshold():
+    base = {"results": {"a": {"median_us": 10.0}, "b": {"median_us": 10.0}}}
+    cur = {"results": {"a": {"median_us": 12.0}, "b": {"median_us": 13.0}, "new": {"median_us": 1.0}}}
+    rows = {r["name"]: r for r in compare(cur, base, threshold=0.25)}
+    assert set(rows) == {"a", "b"}
+    assert not rows["a"]["regressed"] and rows["b"]["regressed"]
+
+
+def test_main_exits_nonzero_on_regression(tmp_path):
+    baseline = tmp_path / "baseline.json"
+    argv = ["--only", "router", "--filter", "naive", "--min-time", "0.001", "--repeat", "2",
+            "--out", str(tmp_path / "out.json")]
+    assert main(argv + ["--save-baseline", str(baseline)]) == 0
+    # Shrink the baseline so the current run is "slower" than allowed.
+    report = json.loads(baseline.read_text())
+    for result in report["results"].values():
+        result["median_us"] /= 1000
+    baseline.write_text(json.dumps(report))
+    assert main(argv + ["--baseline", str(baseline), "--threshold", "0.1"]) == 1
@@ -169,3 +169,164 @@ def _wrap_cancellation_handle_with_resolution(orig_handle):
                 message = f"{message} (ORD context: {self.state['last_order_id']})"
         return orig_handle(self, request_id, session_id, message)
     return _wrapped
+
+
+def test_tracking_uses_speculative_prefetch(client):
+    """
+    An explicit ORD-XXXX starts the order lookup while routing; the tracking agent
+    should consume that result rather than leaving it unused.
+    """
+    import agent as agent_mod
+
+    def _count(outcome):
+        return agent_mod.PREFETCH_COUNTER.labels(call="track_order", outcome=outcome)._value.get()
+
+    used, unused = _count("used"), _count("unused")
+    data = _post_chat(client, "s9", "Track ORD-4567")
+    assert data["agent"] == "OrderTrackingAgent"
+    assert _count("used") == used + 1
+    assert _count("unused") == unused
+
+
+def test_cancel_order_fast_reports_not_found_in_one_call():
+    """
+    The fast cancellation path returns a rich result; the base-class fallback and the
+    local mock must agree on not_found / cancelled and carry the order details.
+    """
+    from api.order_api_local import OrderAPILocalClient
+    from base import OrderAPIBase
+
+    local = OrderAPILocalClient()
+    assert local.cancel_order_fast("ORD-9999").status == "not_found"
+    fast = local.cancel_order_fast("ORD-4567")
+    assert fast.status == "cancelled" and fast.order["orderId"] == "ORD-4567"
+
+    # Base-class fallback: get_order + cancel_order
+    fallback = OrderAPIBase.cancel_order_fast(local, "ORD-1234")
+    assert fallback.status == "ineligible" and fallback.order["orderId"] == "ORD-1234"
+
+
+def test_tracking_multiple_orders_in_one_turn(client, monkeypatch):
+    """
+    Several IDs in one message: each is tracked once (duplicates dropped) and the
+    answer aggregates them, with one tool call per order.
+    """
+    import agent
+    from routers.naive_router import NaiveRouter
+
+    agent.ensure_components()
+    monkeypatch.setattr(agent, "router", NaiveRouter())  # "Where are ..." is tracking whatever router is configured
+    data = _post_chat(client, "s10", "Where are ORD-1234, ORD-4567, ORD-9999 and ORD-1234?")
+    assert data["agent"] == "OrderTrackingAgent"
+    tracked = [tc["input"]["orderId"] for tc in data["tool_calls"] if tc["tool"] == "OrderTrackingAPI"]
+    assert tracked == ["ORD-1234", "ORD-4567", "ORD-9999"]
+    assert "ORD-1234: shipped" in data["response"]
+    assert "ORD-4567: processing" in data["response"]
+    assert "ORD-9999: I couldn't find" in data["response"]
+
+
+def test_chat_stream_emits_stages_then_final(client):
+    """
+    /chat/stream sends one SSE event per finished stage and ends with the ChatResponse payload.
+    """
+    with client.stream("POST", "/chat/stream", json={"session_id": "s11", "message": "Track ORD-1234"}) as r:
+        assert r.status_code == 200
+        assert r.headers["content-type"].startswith("text/event-stream")
+        body = "".join(r.iter_text())
+
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+
+    names = [name for name, _ in events]
+    assert names[0] == "router"
+    assert "tool_call" in names
+    assert names[-1] == "final"
+    final = events[-1][1]
+    assert final["agent"] == "OrderTrackingAgent"
+    assert "ORD-1234" in final["response"]
+
+
+def test_chat_batch_keeps_order_and_session_turns(client):
+    """
+    /chat/batch returns one result per item in request order, with per-item timings,
+    and turns of the same session see each other's state.
+    """
+    items = [
+        {"session_id": "b1", "message": "Track ORD-1234"},
+        {"session_id": "b2", "message": "Tell me about your return policy"},
+        {"session_id": "b1", "message": "Track ORD-4567"},
+    ]
+    r = client.post("/chat/batch", json={"items": items})
+    assert r.status_code == 200, r.text
+    results = r.json()["results"]
+    assert [res["index"] for res in results] == [0, 1, 2]
+    assert [res["response"]["agent"] for res in results] == ["OrderTrackingAgent", "ProductQAAgent", "OrderTrackingAgent"]
+    assert all(res["status"] == 200 and res["latency_ms"] >= 0 for res in results)
+
+    import app as mod
+    history = mod.store.get("b1")["history"]
+    assert [h["content"] for h in history if h["role"] == "user"] == ["Track ORD-1234", "Track ORD-4567"]
+
+
+def test_batch_routing_is_left_to_each_turn_without_a_batch_path(monkeypatch):
+    """
+    Routers without route_batch (LLMRouter) are not called up front, one item after another,
+    outside the items' deadlines; each turn routes its own message.
+    """
+    import agent
+
+    class OneAtATime:
+        def route(self, text):
+            raise AssertionError("must not be routed up front")
+
+    monkeypatch.setattr(agent, "router", OneAtATime())
+    assert agent.route_batch(["Track ORD-1234", "return policy"]) == [None, None]
+
+
+def test_chat_websocket_keeps_session_and_persists_on_close(client, fresh_app, monkeypatch):
+    """
+    /chat/ws loads the session once, answers each frame with a ChatResponse payload,
+    and writes the session back when the connection closes rather than every turn.
+    """
+    saved = []
+    orig_set = fresh_app.store.set
+    monkeypatch.setattr(fresh_app.store, "set", lambda sid, state: (saved.append(sid), orig_set(sid, state)))
+
+    with client.websocket_connect("/chat/ws?session_id=ws1") as ws:
+        ws.send_json({"message": "Track ORD-1234"})
+        first = ws.receive_json()
+        assert first["agent"] == "OrderTrackingAgent"
+        ws.send_json({"message": "Tell me about your return policy"})
+        assert ws.receive_json()["agent"] == "ProductQAAgent"
+        ws.send_json({"oops": True})
+        assert "error" in ws.receive_json()
+        assert saved == []
+
+    assert saved == ["ws1"]
+    history = fresh_app.store.get("ws1")["history"]
+    assert [h["role"] for h in history] == ["user", "assistant", "user", "assistant"]
+
+
+def test_debug_header_returns_stage_spans(client):
+    """
+    With the debug header set, /chat returns OpenTelemetry-shaped spans for each stage,
+    all in one trace, and each stage is observed in chat_stage_seconds.
+    """
+    from observability.tracing import STAGE_LATENCY
+
+    before = STAGE_LATENCY.labels(stage="router.route", outcome="ok")._sum.get()
+    r = client.post("/chat", json={"session_id": "s12", "message": "Track ORD-1234"},
+                    headers={"X-Debug-Trace": "1"})
+    assert r.status_code == 200
+    spans = r.json()["spans"]
+    names = {s["name"] for s in spans}
+    assert {"session_store.get", "chat.turn", "router.route", "order_api.track_order", "session_store.set"} <= names
+    assert len({s["traceId"] for s in spans}) == 1
+    turn = next(s for s in spans if s["name"] == "chat.turn")
+    assert next(s for s in spans if s["name"] == "router.route")["parentSpanId"] == turn["spanId"]
+    assert STAGE_LATENCY.labels(stage="router.route", outcome="ok")._sum.get() > before
+
+    # without the header the payload is unchanged
+    assert "spans" not in _post_chat(client, "s12", "Track ORD-1234")
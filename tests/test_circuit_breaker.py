@@ -0,0 +1,78 @@
+import pytest
+
+from resilience.circuit_breaker import CircuitBreaker, CIRCUIT_STATE
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def _gauge(name):
+    return CIRCUIT_STATE.labels(name=name)._value.get()
+
+
+def test_opens_after_threshold_and_rejects():
+    clock = FakeClock()
+    cb = CircuitBreaker("test.open", failure_threshold=3, reset_timeout=10, clock=clock)
+    for _ in range(3):
+        assert cb.allow()
+        cb.record_failure()
+    assert cb.state == CircuitBreaker.OPEN
+    assert _gauge("test.open") == 2
+    assert not cb.allow()
+
+
+def test_half_open_probe_closes_or_reopens():
+    clock = FakeClock()
+    cb = CircuitBreaker("test.probe", failure_threshold=1, reset_timeout=10, clock=clock)
+    cb.record_failure()
+    assert cb.is_open()
+
+    clock.now = 10
+    assert cb.state == CircuitBreaker.HALF_OPEN
+    assert cb.allow()
+    # only one probe at a time while half-open
+    assert not cb.allow()
+    cb.record_failure()
+    assert cb.state == CircuitBreaker.OPEN
+
+    clock.now = 20
+    assert cb.allow()
+    cb.record_success()
+    assert cb.state == CircuitBreaker.CLOSED
+    assert _gauge("test.probe") == 0
+
+
+def test_released_probe_can_be_retaken():
+    clock = FakeClock()
+    cb = CircuitBreaker("test.release", failure_threshold=1, reset_timeout=10, clock=clock)
+    cb.record_failure()
+    clock.now = 10
+    assert cb.allow() and not cb.allow()
+    cb.release()
+    assert cb.state == CircuitBreaker.HALF_OPEN
+    assert cb.allow()
+
+
+def test_llm_router_falls_back_immediately_when_open(monkeypatch):
+    from llm.openai_client import OPENAI_BREAKER, OpenAIClient
+    from routers.llm_router import LLMRouter
+
+    def _unexpected(**kwargs):
+        pytest.fail("OpenAI must not be called while the breaker is open")
+
+    router = LLMRouter()
+    monkeypatch.setattr(router.client.client.chat.completions, "create", _unexpected)
+    monkeypatch.setattr(OPENAI_BREAKER, "_state", CircuitBreaker.OPEN)
+    monkeypatch.setattr(OPENAI_BREAKER, "_opened_at", OPENAI_BREAKER._clock())
+    try:
+        assert not OpenAIClient.available()
+        result = router.route("please cancel ORD-1234")
+        assert result.intent == "order_cancellation"
+        assert "circuit" in result.err
+    finally:
+        OPENAI_BREAKER.reset()
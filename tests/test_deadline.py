@@ -0,0 +1,103 @@
+import importlib
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+import agent
+from api import order_api_beeceptor
+from api.order_api_beeceptor import OrderAPIBeeceptorClient
+from resilience import (
+    DeadlineExceeded, allows_optional, cap_timeout, current_deadline, deadline_scope, sleep_before_retry,
+)
+from routers.naive_router import NaiveRouter
+
+
+@pytest.fixture
+def mod(monkeypatch):
+    monkeypatch.delenv("REDIS_URL", raising=False)
+    mod = importlib.import_module("app")
+    mod.store._mem.clear()
+    return mod
+
+
+def test_stages_are_capped_by_the_remaining_budget():
+    assert cap_timeout(30.0, "openai") == 30.0  # no deadline: unchanged
+    with deadline_scope(2.0) as deadline:
+        assert current_deadline() is deadline
+        assert 1.0 < cap_timeout(30.0, "openai") <= 2.0
+        assert cap_timeout(0.5, "openai") == 0.5
+        assert not sleep_before_retry(5.0, "openai.route")
+        assert not allows_optional("resolver", 3.0)
+        assert allows_optional("router", 1.0)
+    assert [(n["stage"], n["action"]) for n in deadline.notes] == [("openai.route", "truncated"),
+                                                                   ("resolver", "skipped")]
+    with deadline_scope(0.0):
+        with pytest.raises(DeadlineExceeded):
+            cap_timeout(30.0, "order_api")
+
+
+def test_order_api_retries_stop_at_the_deadline(monkeypatch):
+    calls = []
+
+    def server_error(request):
+        calls.append(request)
+        return httpx.Response(500)
+
+    monkeypatch.setattr(order_api_beeceptor.cfg, "max_retries", 3)
+    monkeypatch.setattr(order_api_beeceptor.cfg, "backoff_factor", 1.0)
+    monkeypatch.setattr(order_api_beeceptor.ORDER_API_BREAKER, "failure_threshold", 100)
+    client = OrderAPIBeeceptorClient()
+    client.client = httpx.Client(base_url=client.base, transport=httpx.MockTransport(server_error))
+    with deadline_scope(0.5) as deadline:
+        assert client._retry_request("GET", "/orders/ORD-1234") is None
+    assert len(calls) == 1  # the 1s backoff would outlast the budget
+    assert deadline.notes[0]["stage"] == "order_api" and deadline.notes[0]["action"] == "truncated"
+    with deadline_scope(0.0), pytest.raises(DeadlineExceeded):
+        client._retry_request("GET", "/orders/ORD-1234")
+    assert len(calls) == 1
+
+
+def test_deadline_hands_back_the_half_open_probe(monkeypatch):
+    from llm.openai_client import OPENAI_BREAKER, OpenAIClient
+    from resilience import CircuitBreaker
+
+    def cut_off(**kwargs):
+        raise TimeoutError("cut off by the capped timeout")
+
+    monkeypatch.setattr(OPENAI_BREAKER, "_state", CircuitBreaker.HALF_OPEN)
+    monkeypatch.setattr(OPENAI_BREAKER, "_probes", 0)
+    assert OPENAI_BREAKER.allow()
+    with deadline_scope(0.0), pytest.raises(DeadlineExceeded):  # spent before the call
+        OpenAIClient._guarded(cut_off, model="m")
+    assert OPENAI_BREAKER.allow()  # the probe was handed back
+    monkeypatch.setattr("llm.openai_client.deadline_expired", lambda: True)
+    with pytest.raises(DeadlineExceeded):  # spent during the call
+        OpenAIClient._guarded(cut_off, model="m")
+    assert OPENAI_BREAKER.state == CircuitBreaker.HALF_OPEN and OPENAI_BREAKER.allow()
+    OPENAI_BREAKER.reset()
+
+
+def test_short_deadline_skips_optional_llm_stages(mod, monkeypatch):
+    monkeypatch.setattr(agent, "_fallback_router", NaiveRouter())
+    monkeypatch.setattr(agent.OpenAIClient, "available", staticmethod(lambda: True))  # breaker state of earlier tests
+    payload = TestClient(mod.app).post("/chat", json={"session_id": "dl", "message": "Where is it now?"},
+                                       headers={"X-Request-Timeout": "1"}).json()
+    tools = {tc["tool"]: tc for tc in payload["tool_calls"]}
+    assert tools["Deadline"]["input"]["budget_seconds"] == 1.0
+    skipped = {n["stage"] for n in tools["Deadline"]["result"]["skipped"]}
+    assert "resolver" in skipped
+    assert "LLMContextResolver" not in tools
+    assert payload["agent"] == "OrderTrackingAgent"
+
+
+def test_deadline_header_is_clamped(mod):
+    from starlette.requests import Request
+
+    def request(value):
+        return Request({"type": "http", "headers": [(b"x-request-timeout", value.encode())]})
+
+    assert mod.requested_deadline(request("2.5")) == 2.5
+    assert mod.requested_deadline(request("9999")) == mod.cfg.deadline.max_seconds
+    assert mod.requested_deadline(request("soon")) is None
+    assert mod.requested_deadline(request("-1")) is None
@@ -0,0 +1,91 @@
+import threading
+import time
+
+import pytest
+
+from llm.openai_client import IntentResult
+from resilience import Hedger, deadline_scope, hedged
+from resilience.hedging import HEDGE_CALLS, HEDGE_WINS
+
+
+def warm(hedger, latency=0.01, n=5):
+    for _ in range(n):
+        hedger.latency.observe(latency)
+    return hedger
+
+
+def attempts(*behaviours):
+    """A call whose n-th attempt sleeps and then returns or raises per behaviours[n]."""
+    lock = threading.Lock()
+    seen = []
+
+    def call():
+        with lock:
+            n = len(seen)
+            seen.append(n)
+        delay, outcome = behaviours[n]
+        time.sleep(delay)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    call.seen = seen
+    return call
+
+
+def count(counter, **labels):
+    return counter.labels(**labels)._value.get()
+
+
+def test_slow_first_attempt_is_hedged_and_the_faster_answer_wins():
+    hedger = warm(Hedger("t.win", max_hedge_percent=100, min_delay=0.01, min_samples=5))
+    wins = count(HEDGE_WINS, name="t.win", winner="hedge")
+    call = attempts((0.5, "slow"), (0.0, "fast"))
+    start = time.monotonic()
+    assert hedger.call(call) == "fast"
+    assert time.monotonic() - start < 0.4
+    assert call.seen == [0, 1]
+    assert count(HEDGE_WINS, name="t.win", winner="hedge") == wins + 1
+
+
+def test_no_hedge_when_cold_fast_or_over_budget():
+    cold = Hedger("t.cold", min_samples=5)
+    assert cold.call(attempts((0.0, "a"))) == "a" and cold.delay() is None
+
+    hedger = warm(Hedger("t.cap", max_hedge_percent=0, min_delay=0.01, min_samples=5))
+    capped = count(HEDGE_CALLS, name="t.cap", outcome="capped")
+    call = attempts((0.05, "primary"))
+    assert hedger.call(call) == "primary" and call.seen == [0]
+    assert count(HEDGE_CALLS, name="t.cap", outcome="capped") == capped + 1
+
+    fast = warm(Hedger("t.fast", max_hedge_percent=100, min_delay=0.2, min_samples=5))
+    call = attempts((0.0, "primary"))
+    assert fast.call(call) == "primary" and call.seen == [0]
+
+    with deadline_scope(0.05):  # the deadline ends before the hedge delay: just wait for the first attempt
+        call = attempts((0.02, "primary"))
+        assert fast.call(call) == "primary" and call.seen == [0]
+
+
+def test_hedge_budget_is_a_share_of_recent_calls():
+    hedger = Hedger("t.share", max_hedge_percent=10, window=100)
+    assert sum(hedger._admit(True) for _ in range(100)) == 10
+
+
+def test_failed_attempts_lose_and_both_failing_raises_the_first_error():
+    hedger = warm(Hedger("t.err", max_hedge_percent=100, min_delay=0.01, min_samples=5))
+    ok = IntentResult(intent="order_tracking")
+    call = attempts((0.1, ok), (0.0, IntentResult(err="rate limited")))
+    assert hedger.call(call) == ok
+
+    call = attempts((0.05, RuntimeError("first")), (0.0, RuntimeError("second")))
+    with pytest.raises(RuntimeError, match="first"):
+        hedger.call(call)
+
+
+def test_decorator_is_a_no_op_without_a_hedger():
+    def fn():
+        return 1
+
+    assert hedged(None)(fn) is fn
+    assert hedged(Hedger("t.deco"))(fn).hedger.name == "t.deco"
@@ -0,0 +1,42 @@
+from types import SimpleNamespace
+
+from config.settings import settings
+from llm.openai_client import OPENAI_BREAKER, OpenAIClient
+from observability.llm_usage import LLM_RETRIES, LLM_TOKENS, intent_scope, usage_ledger
+
+
+def _completion(content, prompt_tokens, completion_tokens):
+    return SimpleNamespace(
+        choices=[SimpleNamespace(message=SimpleNamespace(content=content))],
+        usage=SimpleNamespace(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens),
+    )
+
+
+def test_route_records_tokens_retries_and_cost(monkeypatch):
+    OPENAI_BREAKER.reset()
+    client = OpenAIClient()
+    replies = iter([RuntimeError("flaky"), _completion('{"intent": "order_tracking"}', 120, 8)])
+
+    def fake_create(**kwargs):
+        reply = next(replies)
+        if isinstance(reply, Exception):
+            raise reply
+        return reply
+
+    monkeypatch.setattr(client.client.chat.completions, "create", fake_create)
+    monkeypatch.setattr("resilience.deadline.time.sleep", lambda s: None)
+    monkeypatch.setattr(settings.openai, "max_retries", 3)
+    labels = {"call_site": "route", "model": settings.openai.chat_model, "intent": "order_tracking"}
+    prompt_before = LLM_TOKENS.labels(kind="prompt", **labels)._value.get()
+    retries_before = LLM_RETRIES.labels(**labels)._value.get()
+
+    with usage_ledger() as ledger, intent_scope():
+        result = client.route("where is ORD-1234")
+
+    assert result.intent == "order_tracking"
+    assert LLM_TOKENS.labels(kind="prompt", **labels)._value.get() == prompt_before + 120
+    assert LLM_RETRIES.labels(**labels)._value.get() == retries_before + 1
+    (call,) = ledger
+    assert call["outcome"] == "ok" and call["retries"] == 1
+    assert call["prompt_tokens"] == 120 and call["completion_tokens"] == 8
+    assert call["cost_usd"] > 0
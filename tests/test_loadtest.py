@@ -0,0 +1,40 @@
+from fastapi.testclient import TestClient
+from openai import OpenAI
+
+from loadtest.run import percentile
+from loadtest.stubs import LatencySpec, StubBehavior, create_openai_stub, create_order_api_stub
+
+
+def _no_latency():
+    return StubBehavior(LatencySpec(kind="fixed", median_ms=0))
+
+
+def test_openai_stub_speaks_the_sdk_shapes():
+    client = OpenAI(api_key="sk-test", base_url="http://testserver/v1", max_retries=0,
+                    http_client=TestClient(create_openai_stub(_no_latency())))
+
+    chat = client.chat.completions.create(model="m", messages=[{"role": "user", "content": "Message: cancel ORD-1234"}])
+    assert chat.choices[0].message.content == '{"intent": "order_cancellation"}'
+    assert chat.usage.prompt_tokens > 0
+
+    resp = client.responses.create(model="m", input="history mentions ORD-1234; cancel it")
+    assert '"ORD-1234"' in resp.output[0].content[0].text
+
+    emb = client.embeddings.create(model="m", input=["a", "a", "b"])
+    assert emb.data[0].embedding == emb.data[1].embedding != emb.data[2].embedding
+
+
+def test_order_api_stub_and_error_injection():
+    ok = TestClient(create_order_api_stub(_no_latency()))
+    assert ok.get("/orders/ORD-1000/track").json()["status"] == "processing"
+    assert ok.post("/orders/ORD-0001/cancel").status_code == 404
+
+    failing = TestClient(create_order_api_stub(StubBehavior(LatencySpec(kind="fixed", median_ms=0), error_rate=1.0)))
+    assert failing.get("/orders/ORD-1000").status_code == 500
+
+
+def test_percentile_nearest_rank():
+    values = sorted(float(v) for v in range(1, 101))
+    assert percentile(values, 50) == 50.0
+    assert percentile(values, 99) == 99.0
+    assert percentile([], 99) == 0.0
@@ -0,0 +1,41 @@
+import json
+import logging
+import queue
+
+from observability.log_pipeline import LOG_DROPPED, JsonFormatter, SamplingQueueHandler
+
+
+def _logger(name, handler):
+    logger = logging.getLogger(name)
+    logger.handlers = [handler]
+    logger.setLevel(logging.DEBUG)
+    logger.propagate = False
+    return logger
+
+
+def test_full_queue_drops_and_counts_instead_of_blocking():
+    q = queue.Queue(maxsize=1)
+    logger = _logger("test.log.full", SamplingQueueHandler(q))
+    dropped = LOG_DROPPED.labels(level="INFO", reason="queue_full")._value.get()
+
+    logger.info("first")
+    logger.info("second")
+
+    assert q.qsize() == 1
+    assert LOG_DROPPED.labels(level="INFO", reason="queue_full")._value.get() == dropped + 1
+
+
+def test_sampling_is_per_level_and_records_encode_off_thread():
+    q = queue.Queue()
+    logger = _logger("test.log.sampled", SamplingQueueHandler(q, {"debug": 0.0}))
+
+    logger.debug("noisy %s", 1)
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        logger.exception("failed %s", "op", extra={"extra_data": {"request_id": "r1"}})
+
+    assert q.qsize() == 1
+    line = json.loads(JsonFormatter().format(q.get_nowait()))
+    assert line["msg"] == "failed op" and line["request_id"] == "r1"
+    assert "ValueError: boom" in line["exc"]
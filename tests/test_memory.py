@@ -0,0 +1,65 @@
+import importlib
+import sys
+
+import pytest
+from fastapi.testclient import TestClient
+
+from config.settings import settings
+from observability.memory import MemoryCollector, approx_size
+
+
+@pytest.fixture
+def mod(monkeypatch):
+    monkeypatch.delenv("REDIS_URL", raising=False)
+    return importlib.import_module("app")
+
+
+@pytest.fixture
+def client(mod):
+    return TestClient(mod.app)
+
+
+def test_approx_size_counts_nested_data_and_extrapolates_samples():
+    rows = [{"q": f"question {i}", "a": "x" * 100} for i in range(5000)]
+    exact = approx_size(rows, sample_items=10**6)
+    sampled = approx_size(rows, sample_items=100)
+    assert exact > 5000 * sys.getsizeof("x" * 100)
+    assert 0.8 < sampled / exact < 1.2
+
+
+def test_collector_caches_between_scrapes():
+    data = {"a": [1, 2, 3]}
+    collector = MemoryCollector(min_interval=60)
+    collector.track("data", lambda: data)
+    collector.track_entries("data", lambda: len(data))
+    first = collector.snapshot()
+    data["b"] = "y" * 10_000
+    assert collector.snapshot() is first
+    assert collector.snapshot(force=True)["component_bytes"]["data"] > first["component_bytes"]["data"]
+    assert collector.snapshot()["cache_entries"]["data"] == 2
+
+
+def test_metrics_expose_memory_gauges(client, mod):
+    client.post("/chat", json={"session_id": "mem", "message": "Where is ORD-1234?"})
+    mod.memory_collector.snapshot(force=True)
+    text = client.get("/metrics").text
+    assert 'app_memory_component_bytes{component="sessions"}' in text
+    assert 'app_memory_component_bytes{component="kb"}' in text
+    assert 'app_cache_entries{cache="sessions"}' in text
+
+
+def test_memory_admin_endpoints(client, mod, monkeypatch):
+    assert client.get("/admin/memory").status_code == 404
+    monkeypatch.setattr(settings.memory, "admin_enabled", True)
+    monkeypatch.setattr(settings.admin, "allowed_callers", ["testclient"])
+    try:
+        assert "sessions" in client.get("/admin/memory").json()["component_bytes"]
+        first = client.post("/admin/memory/snapshots").json()
+        assert first["tracing"]
+        hoard = [bytearray(1024) for _ in range(2000)]  # noqa: F841  kept alive across the diff
+        top = client.get("/admin/memory/diff", params={"since": first["id"], "limit": 5}).json()["top"]
+        assert any("test_memory.py" in site["where"] and site["size_diff"] >= 2_000_000 for site in top)
+        assert client.get("/admin/memory/diff", params={"since": 999}).status_code == 404
+    finally:
+        status = client.delete("/admin/memory/snapshots").json()
+    assert not status["tracing"] and status["snapshots"] == []
@@ -0,0 +1,103 @@
+import queue
+import threading
+from concurrent.futures import Future
+
+import numpy as np
+import pytest
+
+from config.settings import OffloadConfig, settings
+from kb.matrix import normalize, top_k
+from offload import OFFLOAD_TASKS, Offload, _Batcher
+
+
+@pytest.fixture
+def offload():
+    o = Offload(OffloadConfig(enabled=True, max_workers=1, min_matrix_cells=0, min_route_chars=0))
+    yield o
+    o.shutdown()
+
+
+def count(stage, mode):
+    return OFFLOAD_TASKS.labels(stage=stage, mode=mode)._value.get()
+
+
+def test_routing_in_the_pool_matches_inline(offload):
+    router = pytest.importorskip("routers.intent_ml_router").IntentMLRouter()
+    pooled = count("route", "pool")
+    offload.start([router])
+    # Ambiguous texts too: the workers use the parent's fitted model, not a fresh fit of their own.
+    texts = ["please cancel ord-1234", "where is my package", "return policy", "hello", "my refund status",
+             "Where is ORD-1234?", "cancel it", "headphones eta"]
+    assert [offload.route(router, t)[0] for t in texts] == [router.route(t)[0] for t in texts]
+    assert [r[0] for r in offload.route_batch(router, texts)] == [r[0] for r in router.route_batch(texts)]
+    assert count("route", "pool") == pooled + len(texts)
+
+
+def test_memory_mapped_matrix_search_runs_in_the_pool(offload, tmp_path, monkeypatch):
+    rng = np.random.default_rng(0)
+    matrix = normalize(rng.normal(size=(50, 8)))
+    path = tmp_path / "faq.npy"
+    np.save(path, matrix)
+    monkeypatch.setattr(settings.vectordb, "matrix_path", str(path))
+    mapped = np.load(path, mmap_mode="r")
+    query = rng.normal(size=8)
+    pooled, inline = count("top_k", "pool"), count("top_k", "inline")
+    result = offload.top_k(mapped, query, 3)
+    assert [i for i, _ in result] == [i for i, _ in top_k(matrix, query, 3)]
+    offload.top_k(matrix, query, 3)  # in memory, not a shared file: inline
+    assert count("top_k", "pool") == pooled + 1 and count("top_k", "inline") == inline + 1
+
+
+def test_batcher_batches_while_workers_are_busy_and_bounds_the_backlog():
+    started, release = threading.Event(), threading.Event()
+    batches = []
+
+    def run_batch(items):
+        batches.append(items)
+        fut = Future()
+
+        def finish():
+            release.wait(5)
+            fut.set_result([i * 10 for i in items])
+
+        started.set()
+        threading.Thread(target=finish, daemon=True).start()
+        return fut
+
+    batcher = _Batcher("test", run_batch, slots=1, max_batch=8, window=0.0, max_pending=3)
+    first = batcher.submit(1)
+    assert started.wait(5)  # the only slot is taken by the first item
+    rest = [batcher.submit(i) for i in (2, 3, 4)]
+    with pytest.raises(queue.Full):
+        batcher.submit(5)
+    release.set()
+    assert first.result(5) == 10 and [f.result(5) for f in rest] == [20, 30, 40]
+    assert batches == [[1], [2, 3, 4]]
+
+
+def test_disabled_offload_runs_inline():
+    o = Offload(OffloadConfig(enabled=False))
+
+    class Router:
+        cpu_bound = True
+
+        def route(self, text):
+            return "product_qa", 1.0, {}
+
+    inline = count("route", "inline")
+    assert o.route(Router(), "hi")[0] == "product_qa"
+    assert count("route", "inline") == inline + 1 and o._executor is None
+
+
+def test_short_messages_are_routed_inline(offload):
+    class Router:
+        cpu_bound = True
+
+        def route(self, text):
+            return "product_qa", 1.0, {}
+
+    offload.cfg = OffloadConfig(enabled=True, max_workers=1, min_route_chars=100)
+    offload._routers = {"Router": Router()}
+    inline = count("route", "inline")
+    assert offload.route(Router(), "where is my order")[0] == "product_qa"
+    assert count("route", "inline") == inline + 1 and offload._executor is None
@@ -0,0 +1,90 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+import agent
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_forked_worker_gets_a_working_prefetch_pool():
+    agent._prefetch_pool.submit(lambda: None).result()  # the parent's pool has a live thread
+    pid = os.fork()
+    if pid == 0:
+        try:
+            ok = agent._prefetch_pool.submit(lambda: 42).result(timeout=5) == 42
+        except BaseException:
+            ok = False
+        os._exit(0 if ok else 1)
+    _, status = os.waitpid(pid, 0)
+    assert os.waitstatus_to_exitcode(status) == 0
+
+
+def test_forked_worker_opens_its_own_http_clients():
+    from api.order_api_beeceptor import OrderAPIBeeceptorClient
+    from llm.openai_client import OpenAIClient
+
+    llm, orders = OpenAIClient(), OrderAPIBeeceptorClient()
+    parent = (id(llm.client), id(orders.client))
+    pid = os.fork()
+    if pid == 0:
+        os._exit(0 if id(llm.client) != parent[0] and id(orders.client) != parent[1] else 1)
+    _, status = os.waitpid(pid, 0)
+    assert os.waitstatus_to_exitcode(status) == 0
+    assert (id(llm.client), id(orders.client)) == parent
+
+
+def test_preload_requires_the_kb_matrix():
+    from pydantic import ValidationError
+
+    from config.settings import Settings, settings
+
+    with pytest.raises(ValidationError, match="matrix_path"):
+        Settings(**{**settings.model_dump(), "preload": {"enabled": True}})
+    vectordb = {**settings.vectordb.model_dump(), "matrix_path": "faq.npy"}
+    assert Settings(**{**settings.model_dump(), "preload": {"enabled": True}, "vectordb": vectordb}).preload.enabled
+
+
+def _run(code: str, env: dict) -> str:
+    out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=env, capture_output=True, text=True, timeout=60)
+    assert out.returncode == 0, out.stderr
+    return out.stdout
+
+
+def test_metrics_are_aggregated_across_workers(tmp_path):
+    env = {**os.environ, "PROMETHEUS_MULTIPROC_DIR": str(tmp_path)}
+    env.pop("REDIS_URL", None)
+    worker = "import app; app.init_metrics(); app.REQUEST_COUNTER.labels(agent='mp', status='200').inc()"
+    _run(worker, env)
+    _run(worker, env)
+    scrape = ("from fastapi.testclient import TestClient; import app; "
+              "print(TestClient(app.app).get('/metrics').text)")
+    lines = _run(scrape, env).splitlines()
+    assert 'chat_requests_total{agent="mp",status="200"} 2.0' in lines
+
+
+def test_kb_matrix_is_memory_mapped_and_reused(tmp_path, monkeypatch):
+    pytest.importorskip("chromadb")
+    np = pytest.importorskip("numpy")
+    from kb import chroma_impl
+
+    calls = []
+
+    class Embedder:
+        def embed(self, texts):
+            calls.append(len(texts))
+            return [[float(len(t)), 1.0] for t in texts]
+
+    monkeypatch.setattr(chroma_impl.cfg, "matrix_path", str(tmp_path / "faq.npy"))
+    kb = chroma_impl.ChromaKnowledgeBase.__new__(chroma_impl.ChromaKnowledgeBase)
+    kb.qa = [{"q": "return policy", "a": "30 days"}, {"q": "shipping times", "a": "3-5 days"}]
+    kb.embedder = Embedder()
+    kb.logger = chroma_impl.logging.getLogger("app")
+    first = kb._load_matrix(chroma_impl.cfg.matrix_path)
+    again = kb._load_matrix(chroma_impl.cfg.matrix_path)
+    assert isinstance(again, np.memmap) and calls == [2]
+    assert np.allclose(np.linalg.norm(first, axis=1), 1.0)
+    kb.matrix = again
+    assert kb._matrix_hits([14.0, 1.0])[0][1] == "3-5 days"
@@ -0,0 +1,80 @@
+import importlib
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from config.settings import settings
+from observability.profiling import StackSampler
+
+CHAT = {"session_id": "prof", "message": "Where is ORD-1234?"}
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.delenv("REDIS_URL", raising=False)
+    mod = importlib.import_module("app")
+    return TestClient(mod.app)
+
+
+@pytest.fixture
+def profiling_on(monkeypatch):
+    monkeypatch.setattr(settings.profiling, "enabled", True)
+    monkeypatch.setattr(settings.admin, "allowed_callers", ["testclient"])
+
+
+def test_profiling_is_off_by_default(client):
+    assert client.get("/admin/profile", params={"seconds": 0.1}).status_code == 404
+    resp = client.post("/chat", json=CHAT, headers={"X-Profile": "1"})
+    assert resp.status_code == 200 and "profile" not in resp.json()
+
+
+def test_x_profile_header_returns_a_profile(client, profiling_on):
+    prof = client.post("/chat", json=CHAT, headers={"X-Profile": "1"}).json()["profile"]
+    assert prof["mode"] == "cprofile" and "handle_chat" in prof["stats"]
+    prof = client.post("/chat", json=CHAT, headers={"X-Profile": "sample"}).json()["profile"]
+    assert prof["mode"] == "sample" and prof["samples"] > 0
+
+
+def test_profiling_requires_an_allowed_caller(client, monkeypatch):
+    monkeypatch.setattr(settings.profiling, "enabled", True)
+    assert client.get("/admin/profile", params={"seconds": 0.1}).status_code == 403
+    assert "profile" not in client.post("/chat", json=CHAT, headers={"X-Profile": "1"}).json()
+    monkeypatch.setattr(settings.admin, "token", "s3cret")
+    resp = client.get("/admin/profile", params={"seconds": 0.1}, headers={"X-Admin-Token": "s3cret"})
+    assert resp.status_code == 200
+
+
+def test_admin_profile_returns_collapsed_stacks(client, profiling_on):
+    stop = threading.Event()
+
+    def busy_loop():
+        while not stop.is_set():
+            sum(range(1000))
+
+    worker = threading.Thread(target=busy_loop, name="busy")
+    worker.start()
+    try:
+        resp = client.get("/admin/profile", params={"seconds": 0.2, "interval_ms": 2})
+    finally:
+        stop.set()
+        worker.join()
+    assert resp.status_code == 200 and int(resp.headers["X-Profile-Samples"]) > 0
+    busy = [line for line in resp.text.splitlines() if line.startswith("busy;")]
+    assert busy and any("busy_loop (test_profiling.py" in line for line in busy)
+    assert client.get("/admin/profile", params={"seconds": 10_000}).status_code == 422
+
+
+def test_stack_sampler_limits_to_given_threads():
+    sampler = StackSampler(0.001, thread_ids=[threading.get_ident()]).start()
+    time.sleep(0.05)
+    sampler.stop()
+    assert sampler.samples > 0
+    assert all(stack.startswith(threading.current_thread().name + ";") for stack in sampler.stacks)
+
+
+def test_stack_sampler_samples_runs_shorter_than_the_interval():
+    sampler = StackSampler(60.0, thread_ids=[threading.get_ident()]).start()
+    sampler.stop()
+    assert sampler.samples == 1
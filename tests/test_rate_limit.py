@@ -0,0 +1,120 @@
+import pytest
+
+import llm.openai_client as openai_client
+from config.settings import settings
+from llm.tokens import MESSAGE_OVERHEAD, estimate_request_tokens, estimate_tokens
+from prompts import PROMPTS
+from resilience import RateLimiter, RateLimitTimeout, TokenBucket
+from resilience.rate_limit import RedisTokenBucket
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+def test_token_bucket_refills_at_rate():
+    clock = FakeClock()
+    bucket = TokenBucket(capacity=60, rate=1.0, clock=clock)
+    assert bucket.try_take(60) == 0
+    assert bucket.try_take(10) == pytest.approx(10.0)
+    clock.now += 10
+    assert bucket.try_take(10) == 0
+    assert bucket.try_take(1000) == pytest.approx(60.0)  # clamped to capacity
+
+
+def test_limiter_queues_for_rpm_and_tpm_then_times_out():
+    clock = FakeClock()
+    limiter = RateLimiter("t", {"m": (2, 120)}, clock=clock, sleep=clock.sleep)
+    assert limiter.acquire("m", 10, max_wait=60) == 0
+    assert limiter.acquire("m", 10, max_wait=60) == 0
+    assert limiter.acquire("m", 10, max_wait=60) == pytest.approx(30.0)  # 2 rpm: one request per 30s
+    with pytest.raises(RateLimitTimeout):
+        limiter.acquire("m", 10, max_wait=1)
+    assert limiter.acquire("unlisted-model", 10**9, max_wait=0) == 0
+
+    tpm_only = RateLimiter("t", {"m": (0, 120)}, clock=clock, sleep=clock.sleep)
+    assert tpm_only.acquire("m", 100, max_wait=60) == 0
+    assert tpm_only.acquire("m", 100, max_wait=60) == pytest.approx(40.0)  # 20 left, 2 tokens/s
+
+
+def test_timed_out_acquire_hands_back_the_request():
+    clock = FakeClock()
+    limiter = RateLimiter("t", {"m": (2, 60)}, clock=clock, sleep=clock.sleep)
+    assert limiter.acquire("m", 60, max_wait=0) == 0  # one request left, no tokens
+    with pytest.raises(RateLimitTimeout):
+        limiter.acquire("m", 10, max_wait=1)  # takes the request, then waits 10s for tokens
+    clock.now += 10
+    assert limiter.acquire("m", 10, max_wait=0) == 0  # the request taken above was handed back
+
+
+class _Redis:
+    def __init__(self, replies):
+        self.replies = list(replies)
+        self.calls = 0
+
+    def eval(self, script, numkeys, *args):
+        self.calls += 1
+        reply = self.replies.pop(0)
+        if isinstance(reply, Exception):
+            raise reply
+        return reply
+
+
+def test_redis_bucket_falls_back_to_local_and_retries_later():
+    clock = FakeClock()
+    client = _Redis([b"0", ConnectionError("down"), b"2.5"])
+    bucket = RedisTokenBucket(client, "k", capacity=2, rate=1.0, fallback=TokenBucket(2, 1.0, clock),
+                              retry_after=5, clock=clock)
+    assert bucket.try_take(1) == 0
+    assert bucket.try_take(1) == 0  # Redis error: served by the local bucket
+    assert bucket.try_take(1) == 0 and client.calls == 2  # still cooling down: Redis not asked
+    assert bucket.try_take(1) > 0
+    clock.now += 5
+    assert bucket.try_take(1) == 2.5 and client.calls == 3
+
+
+def test_request_token_estimates_cover_formatted_prompts():
+    prompt = PROMPTS["router_prompt"].format(text="Where is my order ORD-1234?")
+    chat = estimate_request_tokens({"model": "m", "messages": [{"role": "user", "content": prompt}]})
+    assert chat == estimate_tokens(prompt) + MESSAGE_OVERHEAD and chat > 20
+    assert estimate_request_tokens({"model": "m", "input": ["a b", "c d e"]}) == estimate_tokens("a b") + estimate_tokens("c d e")
+
+
+def test_guarded_attempts_take_rate_limit_budget(monkeypatch):
+    taken = []
+
+    class Recorder:
+        def acquire(self, key, tokens, max_wait):
+            taken.append((key, tokens))
+            return 0.0
+
+    monkeypatch.setattr(openai_client, "OPENAI_RATE_LIMITER", Recorder())
+    kwargs = {"model": settings.openai.chat_model, "messages": [{"role": "user", "content": "hello there"}]}
+    assert openai_client.OpenAIClient._guarded(lambda **kw: "ok", **kwargs) == "ok"
+    assert taken == [(settings.openai.chat_model,
+                      estimate_request_tokens(kwargs) + settings.openai.rate_limit_completion_reserve)]
+
+
+def test_rate_limit_timeout_hands_back_the_half_open_probe(monkeypatch):
+    from resilience import CircuitBreaker
+
+    class Exhausted:
+        def acquire(self, key, tokens, max_wait):
+            raise RateLimitTimeout("no capacity")
+
+    breaker = openai_client.OPENAI_BREAKER
+    monkeypatch.setattr(openai_client, "OPENAI_RATE_LIMITER", Exhausted())
+    monkeypatch.setattr(breaker, "_state", CircuitBreaker.HALF_OPEN)
+    monkeypatch.setattr(breaker, "_probes", 0)
+    assert breaker.allow()
+    with pytest.raises(RateLimitTimeout):
+        openai_client.OpenAIClient._guarded(lambda **kw: "ok", model=settings.openai.chat_model)
+    assert breaker.allow()
+    breaker.reset()
@@ -0,0 +1,45 @@
+import json
+
+from config.settings import settings
+from llm.resolver_prompt import RESOLVER_PROMPT_TOKENS, build_resolver_prompt, compact_history
+from llm.tokens import estimate_tokens
+
+HISTORY = [
+    {"role": "user", "content": "Where is my order ORD-1234?"},
+    {"role": "assistant", "agent": "OrderTrackingAgent",
+     "content": "Order ORD-1234 shipped on Monday.\n  It should arrive   in two days. Anything else?"},
+    {"role": "user", "content": "What is your return policy?"},
+    {"role": "assistant", "agent": "ProductQAAgent", "content": "You can return items within 30 days. " * 20},
+    {"role": "user", "content": "thanks"},
+    {"role": "assistant", "agent": "ProductQAAgent", "content": "Happy to help!"},
+    {"role": "user", "content": "Cancel it please"},
+]
+
+
+def test_history_keeps_order_ids_recent_user_turns_and_trims_the_rest():
+    lines = compact_history(HISTORY, "Cancel it please", turns=10, user_turns=2, max_chars=60)
+    assert lines == [
+        "user: Where is my order ORD-1234?",
+        "assistant: Order ORD-1234 shipped on Monday.",
+        "user: What is your return policy?",
+        "user: thanks",
+        "assistant: Happy to help!",
+    ]
+
+
+def test_prompt_fits_the_budget_dropping_turns_without_order_ids_first(monkeypatch):
+    monkeypatch.setattr(settings.openai, "resolver_user_turns", 3)
+    state = {"history": HISTORY, "last_order_id": "ORD-1234"}
+    unlimited, _ = build_resolver_prompt("Cancel it please", state, settings.openai)
+    full = estimate_tokens(json.dumps(HISTORY[-5:], indent=2))
+    tokens = estimate_tokens(unlimited) - 10
+    monkeypatch.setattr(settings.openai, "resolver_prompt_token_budget", tokens)
+    compact = RESOLVER_PROMPT_TOKENS.labels(kind="compact")._sum.get()
+    sized = RESOLVER_PROMPT_TOKENS.labels(kind="full")._sum.get()
+    monkeypatch.setattr(settings.openai, "resolver_full_prompt_sample_rate", 0.0)
+    prompt, estimate = build_resolver_prompt("Cancel it please", state, settings.openai)
+    assert RESOLVER_PROMPT_TOKENS.labels(kind="full")._sum.get() == sized  # not sampled: not rendered
+    assert estimate <= tokens < full
+    assert "assistant: Order ORD-1234 shipped on Monday." in prompt
+    assert "user: What is your return policy?" not in prompt and "Cancel it please" in prompt
+    assert RESOLVER_PROMPT_TOKENS.labels(kind="compact")._sum.get() == compact + estimate
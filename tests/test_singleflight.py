@@ -0,0 +1,58 @@
+import threading
+import time
+
+import pytest
+
+from resilience.singleflight import SingleFlight, coalesce
+
+
+def test_concurrent_identical_calls_share_one_execution():
+    group = SingleFlight("test.shared")
+    calls = []
+    release = threading.Event()
+
+    def slow(x):
+        calls.append(x)
+        release.wait(2)
+        return {"value": x}
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(group.do("k", slow, 1))) for _ in range(5)]
+    for t in threads:
+        t.start()
+    # let the followers queue up behind the leader before releasing it
+    time.sleep(0.1)
+    release.set()
+    for t in threads:
+        t.join()
+
+    assert calls == [1]
+    assert len(results) == 5 and all(r is results[0] for r in results)
+    assert group.in_flight() == 0
+
+
+def test_errors_propagate_to_all_waiters_and_are_not_cached():
+    group = SingleFlight("test.error")
+
+    def boom():
+        raise RuntimeError("upstream down")
+
+    with pytest.raises(RuntimeError):
+        group.do("k", boom)
+    assert group.do("k", lambda: "ok") == "ok"
+
+
+def test_coalesce_keys_on_arguments():
+    class Client:
+        def __init__(self):
+            self.calls = 0
+
+        @coalesce("test.method")
+        def fetch(self, texts):
+            self.calls += 1
+            return list(texts)
+
+    c = Client()
+    assert c.fetch(["a", "b"]) == ["a", "b"]
+    assert c.fetch(["c"]) == ["c"]
+    assert c.calls == 2
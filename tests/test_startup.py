@@ -0,0 +1,55 @@
+import importlib
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+import agent
+from observability.startup import Readiness
+
+
+@pytest.fixture
+def mod(monkeypatch):
+    monkeypatch.delenv("REDIS_URL", raising=False)
+    mod = importlib.import_module("app")
+    readiness = Readiness()
+    monkeypatch.setattr(mod, "STARTUP", readiness)
+    monkeypatch.setattr(agent, "STARTUP", readiness)
+    return mod
+
+
+def test_readyz_turns_ready_after_background_warmup(mod, monkeypatch):
+    release = threading.Event()
+    original = agent.warm_up
+
+    def slow_warm_up():
+        release.wait(5)
+        original()
+
+    monkeypatch.setattr(agent, "warm_up", slow_warm_up)
+    monkeypatch.setattr(agent, "router", None)  # built again by this warmup
+    with TestClient(mod.app) as client:
+        assert client.get("/healthz").text == "ok"
+        assert client.get("/readyz").status_code == 503
+        release.set()
+        for _ in range(100):
+            resp = client.get("/readyz")
+            if resp.status_code == 200:
+                break
+            time.sleep(0.02)
+    assert resp.status_code == 200
+    assert {"kb", "order_api", "router", "prefetch_pool", "total"} <= set(resp.json()["phases"])
+
+
+def test_failed_warmup_stays_unready(mod, monkeypatch):
+    monkeypatch.setattr(mod.cfg.startup, "background", False)
+
+    def broken():
+        raise RuntimeError("no model")
+
+    monkeypatch.setattr(agent, "warm_up", broken)
+    with TestClient(mod.app) as client:
+        resp = client.get("/readyz")
+    assert resp.status_code == 503
+    assert resp.json()["error"] == "RuntimeError: no model"
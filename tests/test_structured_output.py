@@ -0,0 +1,60 @@
+from types import SimpleNamespace
+
+import pytest
+
+from config.settings import settings
+from llm.openai_client import OPENAI_BREAKER, OpenAIClient, ResolvedOrder
+from llm.structured import LLM_STRUCTURED_OUTPUT, StructuredOutputError, parse_structured
+from llm.tokens import estimate_tokens
+from observability.llm_usage import usage_ledger
+
+
+def outcome(call_site, name):
+    return LLM_STRUCTURED_OUTPUT.labels(call_site=call_site, outcome=name)._value.get()
+
+
+@pytest.mark.parametrize("raw", [
+    '{"id": "ORD-1234", "confidence": 0.9, "reasoning": "named"}',
+    '```json\n{"id": "ORD-1234", "confidence": 0.9, "reasoning": "named",}\n```',
+    "Sure! {'id': 'ORD-1234', 'confidence': 0.9, 'reasoning': 'named'}",
+    '{"id": "ORD-1234", "confidence": 0.9, "reasoning": "the user na',
+])
+def test_almost_valid_replies_are_repaired_locally(raw):
+    result = parse_structured(raw, ResolvedOrder, "test")
+    assert result.id == "ORD-1234" and result.confidence == 0.9
+
+
+def test_unusable_replies_are_counted_and_raise():
+    failed = outcome("test", "failed")
+    for raw in ("", "no idea", '{"confidence": "high"}'):
+        with pytest.raises(StructuredOutputError):
+            parse_structured(raw, ResolvedOrder, "test")
+    assert outcome("test", "failed") == failed + 3
+
+
+def test_resolver_uses_a_schema_and_retries_bad_output_without_backoff(monkeypatch):
+    OPENAI_BREAKER.reset()
+    client = OpenAIClient()
+    replies = iter(["I think it is the last order", '{"id": "ORD-1234", "confidence": 0.8, "reasoning": "x"}'])
+    requests = []
+
+    def fake_create(**kwargs):
+        requests.append(kwargs)
+        text = next(replies)
+        return SimpleNamespace(output=[SimpleNamespace(content=[SimpleNamespace(text=text)])], usage=None)
+
+    def no_sleep(seconds):
+        raise AssertionError("parse failures are retried immediately")
+
+    monkeypatch.setattr(client.client.responses, "create", fake_create)
+    monkeypatch.setattr("resilience.deadline.time.sleep", no_sleep)
+    monkeypatch.setattr(settings.openai, "max_retries", 3)
+    failed = outcome("resolve_order_id", "failed")
+
+    with usage_ledger() as ledger:
+        result = client.resolve_order_id("cancel it", {"history": [], "last_order_id": "ORD-1234"})
+
+    assert result.id == "ORD-1234" and result.err is None
+    assert ledger[0]["estimated_prompt_tokens"] == estimate_tokens(requests[0]["input"], settings.openai.chat_model)
+    assert requests[0]["text"]["format"]["type"] == "json_schema"
+    assert outcome("resolve_order_id", "failed") == failed + 1
@@ -0,0 +1,77 @@
+import importlib
+
+import pytest
+from fastapi.testclient import TestClient
+
+from config.settings import RecorderConfig
+from loadtest.replay import decision, diff, load_records, recorded_decision, replay_records
+from models import OrderCancellationResult
+from observability.traffic_recorder import Cassette, ReplayMiss, TrafficRecorder, replaying, scrub, taped
+
+
+class _Upstream:
+    def __init__(self):
+        self.calls = 0
+
+    @taped("test.cancel", OrderCancellationResult)
+    def cancel(self, order_id):
+        self.calls += 1
+        return OrderCancellationResult.success(status="cancelled", refunded="yes")
+
+
+def test_scrub_masks_pii_but_keeps_order_ids_and_dates():
+    out = scrub({"message": "mail bob@example.com or +1 (415) 555-0100, card 4111 1111 1111 1111 for ORD-1234",
+                 "eta": "2025-01-01", "email": "x", "nested": [{"Name": "Bob"}]},
+                frozenset({"email", "name"}))
+    assert out["message"] == "mail <email> or <phone>, card <card> for ORD-1234"
+    assert out["eta"] == "2025-01-01"
+    assert out["email"] == "<redacted>" and out["nested"] == [{"Name": "<redacted>"}]
+
+
+def test_taped_records_then_replays_without_calling_upstream(tmp_path):
+    recorder = TrafficRecorder(RecorderConfig(enabled=True, sample_rate=1.0, path=str(tmp_path / "t.jsonl")))
+    upstream = _Upstream()
+    with recorder.recording("s1") as tape:
+        upstream.cancel("ORD-1")
+    assert [e["call"] for e in tape.entries] == ["test.cancel"]
+
+    cassette = Cassette(tape.entries)
+    with replaying(cassette):
+        assert upstream.cancel("ORD-1") == OrderCancellationResult.success(status="cancelled", refunded="yes")
+        with pytest.raises(ReplayMiss):
+            upstream.cancel("ORD-2")
+    assert upstream.calls == 1
+    assert cassette.stats() == {"hits": 1, "misses": 1, "unused": 0}
+
+
+def test_sampling_is_per_session():
+    recorder = TrafficRecorder(RecorderConfig(enabled=True, sample_rate=0.5))
+    sampled = [recorder.sampled(f"s{i}") for i in range(1000)]
+    assert 350 < sum(sampled) < 650
+    assert sampled == [recorder.sampled(f"s{i}") for i in range(1000)]
+    assert not TrafficRecorder(RecorderConfig(enabled=False, sample_rate=1.0)).sampled("s1")
+
+
+def test_recorded_turns_replay_to_the_same_decisions(monkeypatch, tmp_path):
+    monkeypatch.delenv("REDIS_URL", raising=False)
+    mod = importlib.import_module("app")
+    mod.store._mem.clear()
+    path = tmp_path / "traffic.jsonl"
+    monkeypatch.setattr(mod, "recorder", TrafficRecorder(RecorderConfig(enabled=True, sample_rate=1.0, path=str(path))))
+    client = TestClient(mod.app)
+    messages = ["Where is ORD-1234?", "Please cancel ORD-4567", "Tell me about the return policy, I'm bob@example.com"]
+    live = [decision(200, client.post("/chat", json={"session_id": "rec", "message": m}).json()) for m in messages]
+
+    records = load_records(str(path))
+    assert len(records) == 3
+    assert "<email>" in records[2]["message"] and "bob@example.com" not in path.read_text()
+    assert records[0]["upstream"][0]["call"].startswith("order_api.")
+
+    monkeypatch.setattr(mod, "recorder", TrafficRecorder(RecorderConfig()))
+    mod.store._mem.clear()
+    results = replay_records(records)
+    assert [r["decision"] for r in results[:2]] == live[:2]
+    assert all(r["upstream"]["misses"] == 0 for r in results)
+    recorded = [{"session_id": r["session_id"], "message": r["message"], "decision": recorded_decision(r)}
+                for r in records]
+    assert diff(recorded, results, examples=5)["changed"] == 0
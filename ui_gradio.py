@@ -1,20 +1,49 @@
 # ui_gradio.py
 import os
+import json
 import uuid
 import requests
 import gradio as gr
 
 
 API_URL = os.getenv("API_URL", "http://localhost:8000/chat")
+STREAM_API_URL = os.getenv("STREAM_API_URL", f"{API_URL}/stream")
+
+# Progress line shown while a stage is still running, keyed by SSE event name
+STAGE_LABELS = {
+    "router": lambda d: f"routed → `{d['result'].get('intent')}`",
+    "resolver": lambda d: f"resolved order → `{d['result'].get('resolved_order_id')}`",
+    "tool_call": lambda d: f"called `{d['tool']}`",
+}
 
 
 def new_session_id():
     return str(uuid.uuid4())
 
 
+def format_reply(data: dict) -> str:
+    # ChatResponse schema: response, agent, tool_calls, handover, ...
+    text = data.get("response", "")
+    agent = data.get("agent", "assistant")
+    handover = data.get("handover", "")
+    # Show which agent handled it (optional)
+    return f"{text}\n\n---\n_agent: **{agent}**  ·  handover: `{handover}`_"
+
+
+def iter_sse(resp: requests.Response):
+    """Yield (event, data) pairs from a text/event-stream response."""
+    event = None
+    for line in resp.iter_lines(decode_unicode=True):
+        if line.startswith("event: "):
+            event = line[len("event: "):]
+        elif line.startswith("data: ") and event:
+            yield event, json.loads(line[len("data: "):])
+            event = None
+
+
 def call_backend(message: str, history: list, session_id: str):
     """
-    Gradio callback.
+    Gradio callback (a generator, so the reply renders progressively).
     - message: latest user message
     - history: list of [user, assistant] turns
     - session_id: stable id so your multi-agent memory works
@@ -27,23 +56,28 @@ def call_backend(message: str, history: list, session_id: str):
         "message": message,
     }
 
+    history.append((message, "…"))
+    progress = []
+    tokens = ""
     try:
-        resp = requests.post(API_URL, json=payload, timeout=30)
-        resp.raise_for_status()
-        data = resp.json()
+        with requests.post(STREAM_API_URL, json=payload, timeout=30, stream=True) as resp:
+            resp.raise_for_status()
+            for event, data in iter_sse(resp):
+                if event == "final":
+                    history[-1] = (message, format_reply(data))
+                elif event == "error":
+                    history[-1] = (message, f"❗ Backend error: {data.get('error', data.get('response'))}")
+                elif event == "token":
+                    tokens += data.get("text", "")
+                    history[-1] = (message, tokens)
+                elif event in STAGE_LABELS:
+                    progress.append(STAGE_LABELS[event](data))
+                    history[-1] = (message, "\n".join(f"_{p}_" for p in progress) + "\n\n…")
+                # Clear input, return updated history & same session_id
+                yield "", history, session_id
     except Exception as e:
-        bot_text = f"❗ Backend error: {e}"
-    else:
-        # ChatResponse schema: response, agent, tool_calls, handover, ...
-        text = data.get("response", "")
-        agent = data.get("agent", "assistant")
-        handover = data.get("handover", "")
-        # Show which agent handled it (optional)
-        bot_text = f"{text}\n\n---\n_agent: **{agent}**  ·  handover: `{handover}`_"
-
-    history.append((message, bot_text))
-    # Clear input, return updated history & same session_id
-    return "", history, session_id
+        history[-1] = (message, f"❗ Backend error: {e}")
+    yield "", history, session_id
 
 
 with gr.Blocks() as demo: